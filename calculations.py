@@ -1,4 +1,5 @@
 import math
+from functools import lru_cache
 from ballistics import BALLISTIC_DATA
 
 def interpolate(x, x1, y1, x2, y2):
@@ -117,6 +118,19 @@ def find_valid_solutions(faction, ammo, distance, elev_diff):
                 break
     return valid_solutions
 
+@lru_cache(maxsize=None)
+def get_charge_range_limits(faction, ammo):
+    """
+    Returns a tuple of (charge, min_range, max_range) for every charge of an
+    ammo type, sorted by charge. Empty if the faction or ammo is unknown.
+    """
+    ammo_data = BALLISTIC_DATA.get(faction, {}).get(ammo, {})
+    limits = []
+    for charge, charge_data in sorted(ammo_data.items()):
+        ranges = charge_data['ranges']
+        limits.append((charge, min(ranges), max(ranges)))
+    return tuple(limits)
+
 def check_target_on_mortar_fo_axis(mortar_coords, fo_coords, target_coords, lane_width=100):
     """
     Checks if the target is within a 'lane' between the mortar and the FO,
@@ -2,15 +2,40 @@ import os
 import sys
 import json
 import shutil
+import copy
+import hashlib
+import threading
+from collections import namedtuple
 from tkinter import messagebox
+from PIL import Image
 from utils import resource_path
+from persistence import WatchedJsonFile, stat_mtime
+from map_loader import get_preview_path
+
+# How often the shared config folder is checked for changes made elsewhere
+CONFIG_POLL_INTERVAL_MS = 3000
+MAP_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+# Metadata of a map file; `sha1` is None until get_map_hash has computed it
+MapInfo = namedtuple("MapInfo", "name path mtime file_size width height has_preview sha1")
 
 class ConfigManager:
     def __init__(self):
         self.maps_dir = resource_path('maps')
         self.config_path = resource_path('maps_config.json')
         self.log_file_path = resource_path('fire_missions.json')
+        self.log_db_path = resource_path('fire_missions.sqlite3')
+        self.autosave_path = resource_path('session_autosave.json')
         self.maps_config = {}
+        self.config_file = WatchedJsonFile(self.config_path)
+        # The maps directory is listed again only when its mtime changes, which
+        # adding, removing or renaming a map does; map metadata is kept per file
+        # and checked against the file's mtime when asked for
+        self._map_list = None
+        self._maps_dir_mtime = None
+        self._map_info = {} # map name -> MapInfo
+        # get_map_hash runs on the map loader thread, so _map_info is only touched under this lock
+        self._map_info_lock = threading.Lock()
         self._initialize()
 
 
@@ -18,9 +43,8 @@ class ConfigManager:
         if not os.path.exists(self.maps_dir):
             os.makedirs(self.maps_dir)
         
-        if os.path.exists(self.config_path):
-            with open(self.config_path, 'r') as f:
-                self.maps_config = json.load(f)
+        if self.config_file.exists():
+            self.maps_config = self.config_file.load()
         else:
             self.maps_config = {
                 "Zarichne.png": { "x_max": 4607, "y_max": 4607 },
@@ -29,14 +53,84 @@ class ConfigManager:
             self.save_config()
 
     def get_map_list(self):
-        return [f for f in os.listdir(self.maps_dir) if f.lower().endswith(('.png', '.jpg', '.jpeg'))]
+        mtime = stat_mtime(self.maps_dir)
+        if self._map_list is None or mtime != self._maps_dir_mtime:
+            self._map_list = [f for f in os.listdir(self.maps_dir) if f.lower().endswith(MAP_EXTENSIONS)]
+            self._maps_dir_mtime = mtime
+            with self._map_info_lock:
+                for map_name in self._map_info.keys() - set(self._map_list):
+                    del self._map_info[map_name]
+        return list(self._map_list)
+
+    def get_map_info(self, map_name):
+        """Returns the MapInfo of a map file, or None if it does not exist. Costs one stat while the file is unchanged."""
+        path = os.path.join(self.maps_dir, map_name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            with self._map_info_lock:
+                self._map_info.pop(map_name, None)
+            return None
+        with self._map_info_lock:
+            info = self._map_info.get(map_name)
+        if info is None or info.mtime != stat.st_mtime_ns or info.file_size != stat.st_size:
+            try:
+                with Image.open(path) as image: # Reads the header only
+                    width, height = image.size
+            except OSError:
+                width = height = None
+            info = MapInfo(map_name, path, stat.st_mtime_ns, stat.st_size, width, height, False, None)
+        preview_mtime = stat_mtime(get_preview_path(path))
+        info = info._replace(has_preview=preview_mtime is not None and preview_mtime >= info.mtime)
+        with self._map_info_lock:
+            self._map_info[map_name] = info
+        return info
+
+    def get_map_hash(self, map_name):
+        """
+        Returns the SHA-1 of a map file, e.g. to check that machines sharing a
+        config folder see the same map. It is computed once per file version;
+        the map loader thread calls this right after decoding the map.
+        """
+        info = self.get_map_info(map_name)
+        if info is None:
+            return None
+        if info.sha1 is None:
+            digest = hashlib.sha1()
+            with open(info.path, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(chunk)
+            info = info._replace(sha1=digest.hexdigest())
+            with self._map_info_lock:
+                # Keep the hash only if nobody saw a newer version of the file meanwhile
+                current = self._map_info.get(map_name)
+                if current is not None and (current.mtime, current.file_size) == (info.mtime, info.file_size):
+                    self._map_info[map_name] = current._replace(sha1=info.sha1)
+        return info.sha1
+
+    def poll(self):
+        """
+        Checks the shared config for changes made elsewhere and reloads them.
+        Returns the set of what changed: "maps" (the list of map files) and/or "config".
+        """
+        changes = set()
+        if self._map_list is not None and stat_mtime(self.maps_dir) != self._maps_dir_mtime:
+            self.get_map_list()
+            changes.add("maps")
+        if self.config_file.changed():
+            try:
+                self.maps_config = self.config_file.load()
+                changes.add("config")
+            except (OSError, ValueError):
+                pass # Caught mid-write by another machine; the next poll retries
+        return changes
 
     def get_map_config(self, map_name):
         return self.maps_config.get(map_name, {})
 
     def save_config(self):
-        with open(self.config_path, 'w') as f:
-            json.dump(self.maps_config, f, indent=4)
+        # Written on the write-behind thread, so hand it a copy that later edits cannot touch
+        self.config_file.save(copy.deepcopy(self.maps_config))
 
     def get_danger_close_distance(self):
         return self.maps_config.get("danger_close_distance", 100)
@@ -45,6 +139,20 @@ class ConfigManager:
         self.maps_config["danger_close_distance"] = distance
         self.save_config()
 
+    def get_map_cache_budget_mb(self):
+        return self.maps_config.get("map_cache_budget_mb", 256)
+
+    def set_map_cache_budget_mb(self, budget_mb):
+        self.maps_config["map_cache_budget_mb"] = budget_mb
+        self.save_config()
+
+    def get_log_backend(self):
+        return self.maps_config.get("log_backend", "json")
+
+    def set_log_backend(self, backend):
+        self.maps_config["log_backend"] = backend
+        self.save_config()
+
     def add_new_map(self, file_path, x_max, y_max):
         map_filename = os.path.basename(file_path)
         dest_path = os.path.join(self.maps_dir, map_filename)
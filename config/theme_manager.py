@@ -1,19 +1,117 @@
-import json
 import os
+import copy
 from tkinter import messagebox
 from utils import resource_path
+from persistence import WatchedJsonFile
+
+# ttk theme used when a palette's own is not available on this platform (e.g. 'vista' outside Windows)
+FALLBACK_TTK_THEME = "default"
+
+_TRP_DETAILS_LAYOUT = [('TLabelframe.border', {'sticky': 'nswe', 'border': '1', 'children': [('TLabelframe.padding', {'sticky': 'nswe', 'children': [('TLabelframe.label', {'sticky': 'nw'}), ('TLabelframe.contents', {'sticky': 'nswe'})]})]})]
+
+
+def _dark_palette():
+    bg, fg, frame_bg, entry_bg, button_bg, border = "#1E1E1E", "#00FF00", "#252526", "#3C3C3C", "#3C3C3C", "#3C3C3C"
+    return {
+        "ttk_theme": "default",
+        # Colors of plain tk widgets and item tags, read by the views' apply_theme
+        "colors": {
+            "window_bg": bg, "canvas_bg": frame_bg, "status_fg": "#FF5555", "admin_fg": fg,
+            "log_trp_batch_bg": "#3a3a3a", "trp_out_of_range_fg": "red", "trp_valid_fg": fg,
+        },
+        "layouts": {"TRPDetails.TLabelFrame": _TRP_DETAILS_LAYOUT},
+        "styles": {
+            ".": {"background": bg, "foreground": fg},
+            "TFrame": {"background": bg},
+            "TLabel": {"background": bg, "foreground": fg, "font": ("Consolas", 10)},
+            "TLabelFrame": {"background": frame_bg, "bordercolor": border, "relief": "solid"},
+            "TLabelFrame.Label": {"background": frame_bg, "foreground": fg, "font": ("Consolas", 10, "bold")},
+            "TButton": {"background": button_bg, "foreground": fg, "font": ("Consolas", 10), "borderwidth": 1},
+            "TCombobox": {"selectbackground": entry_bg, "fieldbackground": entry_bg, "background": button_bg, "foreground": fg},
+            "TEntry": {"fieldbackground": entry_bg, "foreground": fg, "insertcolor": fg},
+            "Treeview": {"background": entry_bg, "foreground": fg, "fieldbackground": entry_bg},
+            "Treeview.Heading": {"background": frame_bg, "foreground": fg},
+            "TNotebook": {"background": bg, "borderwidth": 0},
+            "TNotebook.Tab": {"background": frame_bg, "foreground": fg, "padding": [5, 2]},
+            "TCheckbutton": {"background": frame_bg, "foreground": fg, "font": ("Consolas", 10)},
+            "Highlight.TFrame": {"background": bg, "relief": "solid", "borderwidth": 1, "bordercolor": "white"},
+            "Highlight.TLabel": {"background": bg, "foreground": fg, "font": ("Consolas", 10)},
+            "Highlight.Bold.TLabel": {"background": bg, "foreground": fg, "font": ("Consolas", 10, "bold")},
+            "Highlight.BigBold.TLabel": {"background": bg, "foreground": fg, "font": ("Consolas", 12, "bold")},
+            "QuickFire.TLabel": {"background": frame_bg, "foreground": "red", "font": ("Consolas", 14, "bold")},
+            "DangerClose.TLabel": {"background": frame_bg, "foreground": "red", "font": ("Consolas", 18, "bold")},
+            "Tooltip.TLabel": {"background": "black", "foreground": "green", "bordercolor": "red"},
+            "TRPDetails.TLabelFrame": {"background": frame_bg, "bordercolor": border, "relief": "solid"},
+            "TRPDetails.TLabelFrame.Label": {"background": frame_bg, "foreground": fg, "font": ("Consolas", 10, "bold")},
+            "TRPDetails.TLabel": {"background": frame_bg, "foreground": fg, "font": ("Consolas", 10)},
+        },
+        "maps": {
+            "TButton": {"background": [('active', '#6E6E6E')]},
+            "TCombobox": {"fieldbackground": [('readonly', entry_bg)], "selectbackground": [('readonly', entry_bg)], "selectforeground": [('readonly', fg)]},
+            "Treeview": {"background": [("selected", "#4a4a4a")], "foreground": [("selected", "white")]},
+            "TNotebook.Tab": {"background": [("selected", bg)], "foreground": [("selected", fg)]},
+            "TCheckbutton": {"background": [('active', '#6E6E6E')], "foreground": [('active', fg)]},
+        },
+        "options": {
+            '*TCombobox*Listbox.background': entry_bg,
+            '*TCombobox*Listbox.foreground': fg,
+            '*TCombobox*Listbox.selectBackground': button_bg,
+            '*TCombobox*Listbox.selectForeground': fg,
+        },
+    }
+
+
+def _light_palette():
+    # The native theme is left as it is apart from the app's own styles
+    bg = "SystemButtonFace"
+    return {
+        "ttk_theme": "vista",
+        "colors": {
+            "window_bg": bg, "canvas_bg": "white", "status_fg": "red", "admin_fg": "green",
+            "log_trp_batch_bg": "#e0e0e0", "trp_out_of_range_fg": "red", "trp_valid_fg": "green",
+        },
+        "layouts": {"TRPDetails.TLabelFrame": _TRP_DETAILS_LAYOUT},
+        "styles": {
+            "Tooltip.TLabel": {"background": "white", "foreground": "black", "bordercolor": "red"},
+            "TRPDetails.TLabelFrame": {"background": bg, "bordercolor": bg, "relief": "solid"},
+            "TRPDetails.TLabelFrame.Label": {"background": bg, "foreground": "black", "font": ("Consolas", 10, "bold")},
+            "TRPDetails.TLabel": {"background": bg, "foreground": "black", "font": ("Consolas", 10)},
+        },
+        "maps": {},
+        "options": {
+            '*TCombobox*Listbox.background': "white",
+            '*TCombobox*Listbox.foreground': "black",
+            '*TCombobox*Listbox.selectBackground': "blue",
+            '*TCombobox*Listbox.selectForeground': "white",
+        },
+    }
+
+
+# Theme palettes as data: the ttk theme to use, its style settings, and the colors of plain tk widgets
+PALETTES = {
+    "dark": _dark_palette(),
+    "light": _light_palette(),
+}
+
 
 class ThemeManager:
     def __init__(self, app):
         self.app = app
         self.theme_config = {}
         self.theme_config_path = resource_path('theme_config.json')
+        self.theme_config_file = WatchedJsonFile(self.theme_config_path)
+        self.palette_name = None
+        # ttk keeps style settings per ttk theme, so a theme already configured for
+        # a palette is only switched to. Maps ttk theme -> palette configured in it.
+        self._styled_themes = {}
+        # Styles that look the same in every palette (per-gun colors), and the ttk themes they are configured in
+        self._shared_styles = {}
+        self._shared_styled_themes = {}
         self._initialize_theme()
 
     def _initialize_theme(self):
-        if os.path.exists(self.theme_config_path):
-            with open(self.theme_config_path, 'r') as f:
-                self.theme_config = json.load(f)
+        if self.theme_config_file.exists():
+            self.theme_config = self.theme_config_file.load()
         else:
             self.theme_config = {
                 "title": "Arma Reforger Mortar Calculator",
@@ -23,8 +121,18 @@ class ThemeManager:
             self.save_theme_config()
 
     def save_theme_config(self):
-        with open(self.theme_config_path, 'w') as f:
-            json.dump(self.theme_config, f, indent=4)
+        self.theme_config_file.save(copy.deepcopy(self.theme_config))
+
+    def poll(self):
+        """Reloads theme_config.json if it was changed elsewhere. Returns True if it was."""
+        if not self.theme_config_file.changed():
+            return False
+        try:
+            self.theme_config = self.theme_config_file.load()
+        except (OSError, ValueError):
+            return False # Caught mid-write by another machine; the next poll retries
+        self.app.title(self.theme_config.get("title", "Arma Reforger Mortar Calculator"))
+        return True
 
     def apply_theme(self):
         self.app.title(self.theme_config.get("title", "Arma Reforger Mortar Calculator"))
@@ -39,6 +147,59 @@ class ThemeManager:
         # The color palette feature can be added later if desired.
         self.app.toggle_theme()
 
+    @property
+    def colors(self):
+        """Colors of plain tk widgets in the current palette."""
+        return PALETTES[self.palette_name]["colors"]
+
+    def use_palette(self, name):
+        """
+        Switches to a palette in one pass, without intermediate redraws.
+        Styles are only configured the first time a ttk theme is used for
+        the palette; after that, switching is a theme_use.
+        """
+        palette = PALETTES[name]
+        style = self.app.style
+        ttk_theme = palette["ttk_theme"]
+        if ttk_theme not in style.theme_names():
+            ttk_theme = FALLBACK_TTK_THEME
+        style.theme_use(ttk_theme)
+        if self._styled_themes.get(ttk_theme) != name:
+            for style_name, layout in palette["layouts"].items():
+                style.layout(style_name, layout)
+            for style_name, options in palette["styles"].items():
+                style.configure(style_name, **options)
+            for style_name, options in palette["maps"].items():
+                style.map(style_name, **options)
+            self._styled_themes[ttk_theme] = name
+        styled = self._shared_styled_themes.setdefault(ttk_theme, set())
+        for style_name in self._shared_styles.keys() - styled:
+            self._configure_shared_style(style_name)
+        for pattern, value in palette["options"].items():
+            self.app.option_add(pattern, value)
+        self.palette_name = name
+
+    def register_style(self, style_name, configure=None, map=None):
+        """
+        Defines a style that looks the same in every palette, like the per-gun colors.
+        It is configured in the current ttk theme now and in others when they are switched to.
+        """
+        definition = (configure or {}, map or {})
+        if self._shared_styles.get(style_name) == definition:
+            return
+        self._shared_styles[style_name] = definition
+        for styled in self._shared_styled_themes.values():
+            styled.discard(style_name)
+        self._configure_shared_style(style_name)
+
+    def _configure_shared_style(self, style_name):
+        configure, map = self._shared_styles[style_name]
+        if configure:
+            self.app.style.configure(style_name, **configure)
+        if map:
+            self.app.style.map(style_name, **map)
+        self._shared_styled_themes.setdefault(self.app.style.theme_use(), set()).add(style_name)
+
     # def set_title(self, title):
     #     self.theme_config["title"] = title
     #     self.save_theme_config()
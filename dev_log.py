@@ -1,19 +1,124 @@
+import logging
+import logging.handlers
 import os
-import traceback
+import queue
+import threading
+from collections import deque
 from datetime import datetime
 from utils import resource_path
 
+# Rotating developer log file inside the log directory
+DEV_LOG_FILE_NAME = "dev_log.txt"
+# The log file is rotated at this size, keeping DEV_LOG_BACKUP_COUNT older files
+DEV_LOG_MAX_BYTES = 1024 * 1024
+DEV_LOG_BACKUP_COUNT = 5
+# Recent events kept in memory for the settings tab, whether or not the file log is enabled
+RING_BUFFER_SIZE = 1000
+
+LOG_FORMAT = "%(asctime)s %(levelname)-7s [%(threadName)s] %(category)s: %(message)s"
+
+
+class RingBufferHandler(logging.Handler):
+    """Keeps the formatted text of the last `capacity` records."""
+    def __init__(self, capacity=RING_BUFFER_SIZE):
+        super().__init__()
+        self._lines = deque(maxlen=capacity)
+
+    def emit(self, record):
+        try:
+            self._lines.append(self.format(record))
+        except Exception:
+            self.handleError(record)
+
+    def lines(self):
+        with self.lock:
+            return list(self._lines)
+
+    def clear(self):
+        with self.lock:
+            self._lines.clear()
+
+
 class DevLog:
+    """
+    Developer log of tasks, timings and errors, safe to use from any thread.
+
+    Every event goes to an in-memory ring buffer. While `enabled`, events are
+    also handed to a queue and written by a background thread to a
+    size-rotated file, so logging never waits on the disk. Reports
+    (write_report) are still separate files, since they are asked for
+    explicitly and their path is shown to the user.
+    """
     def __init__(self):
         self.log_dir = resource_path("Mortar Calculator Logs")
         if not os.path.exists(self.log_dir):
             os.makedirs(self.log_dir)
+        self.log_file_path = os.path.join(self.log_dir, DEV_LOG_FILE_NAME)
+
+        formatter = logging.Formatter(LOG_FORMAT)
+        self.ring_buffer = RingBufferHandler()
+        self.ring_buffer.setFormatter(formatter)
+
+        self.logger = logging.getLogger("mortar_calculator.dev")
+        self.logger.setLevel(logging.DEBUG)
+        self.logger.propagate = False
+        self.logger.addHandler(self.ring_buffer)
+
+        file_handler = logging.handlers.RotatingFileHandler(
+            self.log_file_path, maxBytes=DEV_LOG_MAX_BYTES, backupCount=DEV_LOG_BACKUP_COUNT, encoding="utf-8", delay=True)
+        file_handler.setFormatter(formatter)
+        self._queue = queue.SimpleQueue()
+        # The record (including its traceback) is formatted by the thread that logs it, then written by the listener
+        self._queue_handler = logging.handlers.QueueHandler(self._queue)
+        self._listener = logging.handlers.QueueListener(self._queue, file_handler)
+        self._listener_started = False
+        self._lock = threading.Lock()
+        self.enabled = False
+
+    def set_enabled(self, enabled):
+        """Starts or stops writing events to the log file."""
+        with self._lock:
+            if enabled == self.enabled:
+                return
+            self.enabled = enabled
+            if enabled:
+                if not self._listener_started:
+                    self._listener.start()
+                    self._listener_started = True
+                self.logger.addHandler(self._queue_handler)
+            else:
+                self.logger.removeHandler(self._queue_handler)
+
+    def event(self, category, message, *args, level=logging.INFO):
+        """Records an event; `category` groups events, e.g. "task", "timing", "map", "import"."""
+        self.logger.log(level, message, *args, extra={"category": category})
 
     def write_log(self, error):
-        """Writes the full traceback of an error to a timestamped log file."""
+        """Records an error with its full traceback."""
+        self.logger.error("%s: %s", type(error).__name__, error,
+                          exc_info=(type(error), error, error.__traceback__), extra={"category": "error"})
+
+    def write_report(self, name, text):
+        """Writes a plain-text diagnostics report to a timestamped log file."""
         timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-        log_file_path = os.path.join(self.log_dir, f"error_log_{timestamp}.txt")
-        
+        log_file_path = os.path.join(self.log_dir, f"{name}_{timestamp}.txt")
+
         with open(log_file_path, "w") as f:
-            f.write(f"--- Error Log: {timestamp} ---\n\n")
-            traceback.print_exc(file=f)
\ No newline at end of file
+            f.write(f"--- {name}: {timestamp} ---\n\n")
+            f.write(text)
+        self.event("report", "%s written to %s", name, log_file_path)
+        return log_file_path
+
+    def recent_events(self):
+        """Returns the formatted events in the ring buffer, oldest first."""
+        return self.ring_buffer.lines()
+
+    def close(self):
+        """Writes out queued events and stops the writer thread."""
+        with self._lock:
+            self.logger.removeHandler(self._queue_handler)
+            if self._listener_started:
+                self._listener.stop()
+                self._listener_started = False
+            for handler in self._listener.handlers:
+                handler.close()
@@ -0,0 +1,78 @@
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Target render time for one map redraw (30 FPS)
+FRAME_BUDGET_MS = 33.3
+# Upper bucket edges (ms) of the histogram written to reports
+HISTOGRAM_EDGES_MS = (2, 4, 8, 16, 33, 50, 100, 250)
+
+
+class FrameTimer:
+    """
+    Collects wall-clock timings for named render stages in rolling windows
+    and summarizes them as percentiles and a bucketed histogram.
+    Timing is a no-op while `enabled` is False, so it can stay wired into
+    the render path permanently.
+    """
+    def __init__(self, window=500):
+        self.enabled = False
+        self.window = window
+        self._samples = {} # stage name -> deque of durations in ms
+
+    @contextmanager
+    def stage(self, name):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - start) * 1000)
+
+    def record(self, name, duration_ms):
+        samples = self._samples.get(name)
+        if samples is None:
+            samples = self._samples[name] = deque(maxlen=self.window)
+        samples.append(duration_ms)
+
+    def reset(self):
+        self._samples.clear()
+
+    def stages(self):
+        return list(self._samples)
+
+    def percentiles(self, name):
+        """Returns (p50, p95, p99, max) in ms for a stage, or None without samples."""
+        samples = self._samples.get(name)
+        if not samples:
+            return None
+        ordered = sorted(samples)
+        def pick(fraction):
+            return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+        return pick(0.50), pick(0.95), pick(0.99), ordered[-1]
+
+    def histogram(self, name):
+        """Returns the sample count per bucket of HISTOGRAM_EDGES_MS, plus an overflow bucket."""
+        counts = [0] * (len(HISTOGRAM_EDGES_MS) + 1)
+        for duration in self._samples.get(name, ()):
+            bucket = 0
+            while bucket < len(HISTOGRAM_EDGES_MS) and duration >= HISTOGRAM_EDGES_MS[bucket]:
+                bucket += 1
+            counts[bucket] += 1
+        return counts
+
+    def format_report(self):
+        """Formats all stages as a plain-text table for the developer log."""
+        lines = [f"Frame budget: {FRAME_BUDGET_MS:.1f} ms", ""]
+        lines.append(f"{'stage':<12}{'n':>6}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}")
+        for name in self.stages():
+            p50, p95, p99, worst = self.percentiles(name)
+            lines.append(f"{name:<12}{len(self._samples[name]):>6}{p50:>9.2f}{p95:>9.2f}{p99:>9.2f}{worst:>9.2f}")
+        lines.append("")
+        bucket_labels = [f"<{edge}" for edge in HISTOGRAM_EDGES_MS] + [f">={HISTOGRAM_EDGES_MS[-1]}"]
+        lines.append(f"{'histogram':<12}" + "".join(f"{label:>7}" for label in bucket_labels))
+        for name in self.stages():
+            lines.append(f"{name:<12}" + "".join(f"{count:>7}" for count in self.histogram(name)))
+        return "\n".join(lines)
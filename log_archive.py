@@ -0,0 +1,143 @@
+import json
+import os
+import struct
+import zlib
+
+# File extension of mission archives
+ARCHIVE_EXTENSION = ".mcarc"
+MAGIC = b"MCARC"
+FORMAT_VERSION = 1
+# What an archive holds: mission log entries, TRP records, or a session (state in the header, log entries as records)
+KIND_MISSION_LOG = "mission_log"
+KIND_TRP_LIST = "trp_list"
+KIND_SESSION = "session"
+# Records per compressed frame
+FRAME_SIZE = 1000
+
+_HEADER = struct.Struct("<5sHI") # magic, format version, header JSON length
+_FRAME = struct.Struct("<II")    # record count, compressed length
+
+
+class ArchiveWriter:
+    """
+    Streams records into a compressed mission archive.
+
+    Layout: a fixed header (magic, format version) followed by a small JSON
+    header with the archive kind and metadata, then a sequence of frames.
+    Each frame holds up to FRAME_SIZE records as compact JSON, compressed
+    with zlib, and a frame with zero records ends the file. The repeated
+    keys of log entries compress extremely well, and because each frame is
+    self-contained both writing and reading only ever hold one frame in
+    memory. The archive is written to a temp file and renamed into place
+    on close, so an interrupted export never leaves a partial file behind.
+    """
+    def __init__(self, path, kind, meta=None, frame_size=FRAME_SIZE):
+        self.path = path
+        self.frame_size = frame_size
+        self.record_count = 0
+        self._tmp_path = path + ".tmp"
+        self._file = open(self._tmp_path, "wb")
+        self._frame = []
+        header = json.dumps({"kind": kind, "meta": meta or {}}, separators=(",", ":")).encode("utf-8")
+        self._file.write(_HEADER.pack(MAGIC, FORMAT_VERSION, len(header)))
+        self._file.write(header)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def write(self, record):
+        self._frame.append(record)
+        if len(self._frame) >= self.frame_size:
+            self._flush_frame()
+
+    def write_many(self, records):
+        for record in records:
+            self.write(record)
+
+    def close(self):
+        self._flush_frame()
+        self._file.write(_FRAME.pack(0, 0))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        self._file.close()
+        os.remove(self._tmp_path)
+
+    def _flush_frame(self):
+        if not self._frame:
+            return
+        data = zlib.compress(json.dumps(self._frame, separators=(",", ":")).encode("utf-8"))
+        self._file.write(_FRAME.pack(len(self._frame), len(data)))
+        self._file.write(data)
+        self.record_count += len(self._frame)
+        self._frame = []
+
+
+class ArchiveReader:
+    """
+    Reads a mission archive written by ArchiveWriter. The header is parsed on
+    open (`kind`, `meta`, `version`), iterating yields the records one frame
+    at a time. Raises ValueError for files that are not mission archives or
+    come from a newer format version.
+    """
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        try:
+            magic, self.version, header_length = _HEADER.unpack(self._read_exact(_HEADER.size))
+            if magic != MAGIC:
+                raise ValueError("不是任务存档文件")
+            if self.version > FORMAT_VERSION:
+                raise ValueError(f"存档格式版本 {self.version} 过新，请更新程序")
+            header = json.loads(self._read_exact(header_length).decode("utf-8"))
+        except Exception:
+            self._file.close()
+            raise
+        self.kind = header["kind"]
+        self.meta = header.get("meta", {})
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+    def __iter__(self):
+        while True:
+            count, length = _FRAME.unpack(self._read_exact(_FRAME.size))
+            if count == 0:
+                return
+            yield from json.loads(zlib.decompress(self._read_exact(length)).decode("utf-8"))
+
+    def close(self):
+        self._file.close()
+
+    def _read_exact(self, size):
+        data = self._file.read(size)
+        if len(data) != size:
+            raise ValueError("存档文件不完整")
+        return data
+
+
+def is_archive(path):
+    """Returns True if the file starts with the mission archive magic bytes."""
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def write_archive(path, kind, records, meta=None):
+    """Writes all `records` to a new archive at `path`. Returns the record count."""
+    with ArchiveWriter(path, kind, meta) as writer:
+        writer.write_many(records)
+    return writer.record_count
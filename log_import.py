@@ -0,0 +1,220 @@
+import json
+import traceback
+from utils import format_grid_10_digit
+from log_store import normalize_log_entry
+from log_archive import ArchiveReader, is_archive
+
+# Bytes read per chunk while scanning a JSON array
+CHUNK_SIZE = 1024 * 1024
+# Validated rows handed to the Tk thread per batch
+BATCH_SIZE = 500
+# A decode error this close to the end of the buffer may just be an element cut off by the chunk boundary
+TRUNCATION_TAIL = 16
+
+
+def iter_json_records(path, chunk_size=CHUNK_SIZE):
+    """
+    Yields (row_number, record, error) for every record in a mission log file
+    without loading the whole file. Mission archives are read frame by frame,
+    JSON Lines files line by line, and a JSON array (the mission log format)
+    is decoded element by element from fixed-size chunks. `error` is set
+    instead of `record` for a row that cannot be parsed. A broken JSON array
+    cannot be resynchronized, so the element it breaks in is reported and
+    reading stops there.
+    """
+    if is_archive(path):
+        with ArchiveReader(path) as reader:
+            for row_number, record in enumerate(reader, 1):
+                yield row_number, record, None
+        return
+
+    with open(path, "r", encoding="utf-8") as f:
+        head = f.read(chunk_size)
+        if head.lstrip().startswith("["):
+            yield from _iter_json_array(f, head, chunk_size)
+            return
+
+        buffer = head
+        row_number = 0
+        while True:
+            lines = buffer.split("\n")
+            buffer = lines.pop()
+            chunk = f.read(chunk_size)
+            if not chunk:
+                lines.append(buffer)
+            for line in lines:
+                if not line.strip():
+                    continue
+                row_number += 1
+                try:
+                    yield row_number, json.loads(line), None
+                except json.JSONDecodeError as e:
+                    yield row_number, None, f"JSON格式错误: {e.msg}"
+            if not chunk:
+                return
+            buffer += chunk
+
+
+def _iter_json_array(f, buffer, chunk_size):
+    decoder = json.JSONDecoder()
+    pos = buffer.index("[") + 1
+    row_number = 0
+    eof = False
+    while True:
+        # Skip whitespace and the separators between elements
+        while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+            pos += 1
+        if pos < len(buffer) and buffer[pos] == "]":
+            return
+        if pos >= len(buffer):
+            if eof:
+                yield row_number + 1, None, "文件意外结束，缺少 ']'"
+                return
+            buffer, pos = buffer[pos:] + f.read(chunk_size), 0
+            eof = pos >= len(buffer)
+            continue
+
+        try:
+            record, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError as e:
+            # The decoder ran into the end of the buffer, unless the error is further back.
+            # An unterminated string is reported at its start, but always runs to the end.
+            truncated = e.pos >= len(buffer) - TRUNCATION_TAIL or e.msg.startswith("Unterminated string")
+            if eof or not truncated:
+                yield row_number + 1, None, f"JSON格式错误: {e.msg}，其后的条目无法读取"
+                return
+            # The element continues in the next chunk
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + chunk, 0
+            continue
+        row_number += 1
+        yield row_number, record, None
+        pos = end
+
+
+def validate_log_entry(entry):
+    """Returns (entry, None) for a usable mission log entry, otherwise (None, reason)."""
+    if not isinstance(entry, dict):
+        return None, "不是JSON对象"
+    if entry.get("type") == "TRP_BATCH_RESULT":
+        if not isinstance(entry.get("data"), dict):
+            return None, "TRP批量结果缺少数据"
+        return normalize_log_entry(entry), None
+    if not any(entry.get(key) for key in ("target_name", "calculated_target_grid", "target_grid_str")):
+        return None, "缺少目标名称和网格"
+    if not isinstance(entry.get("mortars", []), list):
+        return None, "迫击炮数据无效"
+    return normalize_log_entry(entry), None
+
+
+def validate_trp_entry(entry):
+    """
+    Extracts a TRP from a mission log entry or an exported TRP record.
+    Returns ({'grid', 'elev', 'name', 'status'}, None), or (None, reason) if
+    the entry has no usable grid. A missing name is left as None for the
+    caller to number.
+    """
+    if not isinstance(entry, dict):
+        return None, "不是JSON对象"
+
+    # Determine initial status based on log entry type
+    initial_status = "Loaded"
+    if entry.get("type") == "TRP":
+        # A record of an exported TRP list
+        grid = str(entry.get("grid", "")).replace(" ", "")
+        elev_str = str(entry.get("elev", ""))
+        name = entry.get("name") or None
+        initial_status = entry.get("status", "Loaded")
+    elif entry.get("type") == "TRP_BATCH_RESULT":
+        trp_result = entry.get("data", {})
+        grid = str(trp_result.get("original_trp_grid", trp_result.get("Target Grid", ""))).replace(" ", "")
+        elev_str = str(trp_result.get("Target Elevation", "")).replace(" m", "")
+        name = trp_result.get("TRP Name", "")
+        initial_status = trp_result.get("Status", "Loaded") # Use status from batch result
+    else:
+        # Existing mission log entry
+        grid_raw = entry.get("original_trp_grid") # Prioritize original_trp_grid
+        if grid_raw is None:
+            grid_raw = entry.get("calculated_target_grid")
+            if grid_raw is None:
+                grid_raw = entry.get("target_grid_str", "")
+        grid = str(grid_raw).replace(" ", "")
+
+        elev_raw = entry.get("target_elev")
+        if elev_raw is None:
+            elev_raw = entry.get("fo_elev", 100)
+        elev_str = str(elev_raw).replace(" m", "")
+
+        name = entry.get("target_name") or entry.get("fo_id") or None
+
+    if not grid:
+        return None, f"缺少网格数据 ({name or '未命名'})"
+
+    try:
+        elev = float(elev_str)
+    except ValueError:
+        elev = 100
+
+    return {"grid": format_grid_10_digit(grid), "elev": elev, "name": name, "status": initial_status}, None
+
+
+VALIDATORS = {
+    'log': validate_log_entry,
+    'merge': validate_log_entry,
+    'trp': validate_trp_entry,
+}
+
+
+def log_import_thread(task_queue, result_queue, app):
+    """
+    Background thread that reads and validates mission log files.
+    For each task ({'token', 'kind', 'path'}, kind being 'log', 'merge' or 'trp') it
+    posts 'batch' results of up to BATCH_SIZE validated items, then a single
+    'done' result listing every skipped row as (row_number, reason), or an
+    'error' result if the file cannot be read at all.
+    """
+    while True:
+        task = task_queue.get(block=True)
+        if task is None:  # Sentinel value to exit the thread
+            break
+
+        token, kind = task['token'], task['kind']
+        validate = VALIDATORS[kind]
+        batch = []
+        skipped = []
+        total = 0
+        try:
+            for row_number, record, error in iter_json_records(task['path']):
+                total += 1
+                if error is None:
+                    record, error = validate(record)
+                if error is not None:
+                    skipped.append((row_number, error))
+                    continue
+                batch.append(record)
+                if len(batch) >= BATCH_SIZE:
+                    _post(result_queue, app, 'batch', token, kind, items=batch)
+                    batch = []
+            if batch:
+                _post(result_queue, app, 'batch', token, kind, items=batch)
+            _post(result_queue, app, 'done', token, kind, total=total, skipped=skipped, path=task['path'])
+        except Exception as e:
+            traceback.print_exc()
+            _post(result_queue, app, 'error', token, kind, error=e, path=task['path'])
+        finally:
+            task_queue.task_done()
+
+
+def format_skipped_report(path, total, skipped):
+    """Formats the skipped rows of an import as plain text for the developer log."""
+    lines = [f"File: {path}", f"Rows read: {total}", f"Rows skipped: {len(skipped)}", ""]
+    lines.extend(f"Row {row_number}: {reason}" for row_number, reason in skipped)
+    return "\n".join(lines)
+
+
+def _post(result_queue, app, status, token, kind, **extra):
+    result = {'status': status, 'token': token, 'kind': kind}
+    result.update(extra)
+    result_queue.put(result)
+    app.event_generate("<<LogImportProgress>>")
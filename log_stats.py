@@ -0,0 +1,159 @@
+import math
+import re
+from array import array
+
+# Width (m) of one bucket of the range distribution
+RANGE_BUCKET_SIZE = 250
+# Label used for entries without a forward observer or ammo type
+UNKNOWN_LABEL = "(未知)"
+
+_NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+
+
+class LogStats:
+    """
+    Column-oriented copy of the mission log with live aggregates.
+
+    Every entry is reduced to one slot in each column (FO, ammo, guns tasked,
+    range, correction magnitude, guns), and the aggregates (missions per
+    FO, guns tasked per ammo type, mean correction per gun, range histogram)
+    are kept as running counters. Appending, deleting or replacing an entry
+    only adds or subtracts that entry's own values, so the numbers are
+    current after every change without rescanning the log.
+
+    After `defer` the columns are only computed when the numbers are first
+    read, so loading a log does not have to decode every entry up front.
+    """
+    def __init__(self):
+        self.clear()
+
+    def __len__(self):
+        self._build_deferred()
+        return len(self.gun_tasks)
+
+    def clear(self):
+        self._deferred = None # the log whose columns are still to be computed
+        self.fo_ids = []
+        self.ammo = []
+        self.gun_tasks = array("i")
+        self.ranges = array("d")       # NaN if the entry has no range
+        self.corrections = array("d")  # magnitude of the L/R and A/D correction (m)
+        self.guns = []                 # tuple of gun callsigns per entry
+        self.missions_per_fo = {}
+        self.gun_tasks_per_ammo = {}
+        self.range_histogram = {}      # bucket start (m) -> missions
+        self._correction_per_gun = {}  # callsign -> [sum, count]
+
+    def rebuild(self, entries):
+        """Recomputes all columns, for when the whole log has been replaced."""
+        self.clear()
+        for entry in entries:
+            self.append(entry)
+
+    def defer(self, entries):
+        """
+        Like rebuild, but computed when first read. Until then `entries` must
+        be the live log, changed in place, and append/delete/replace do nothing.
+        """
+        self.clear()
+        self._deferred = entries
+
+    def _build_deferred(self):
+        if self._deferred is not None:
+            self.rebuild(self._deferred)
+
+    def append(self, entry):
+        if self._deferred is not None:
+            return
+        fo_id, ammo, gun_tasks, range_m, correction, guns = _extract(entry)
+        self.fo_ids.append(fo_id)
+        self.ammo.append(ammo)
+        self.gun_tasks.append(gun_tasks)
+        self.ranges.append(range_m)
+        self.corrections.append(correction)
+        self.guns.append(guns)
+        self._count(len(self.gun_tasks) - 1, 1)
+
+    def delete(self, index):
+        if self._deferred is not None:
+            return
+        self._count(index, -1)
+        del self.fo_ids[index]
+        del self.ammo[index]
+        del self.gun_tasks[index]
+        del self.ranges[index]
+        del self.corrections[index]
+        del self.guns[index]
+
+    def replace(self, index, entry):
+        if self._deferred is not None:
+            return
+        self._count(index, -1)
+        (self.fo_ids[index], self.ammo[index], self.gun_tasks[index],
+         self.ranges[index], self.corrections[index], self.guns[index]) = _extract(entry)
+        self._count(index, 1)
+
+    def mean_correction_per_gun(self):
+        """Returns {callsign: mean correction magnitude (m)}."""
+        self._build_deferred()
+        return {gun: total / count for gun, (total, count) in self._correction_per_gun.items() if count}
+
+    def summary(self):
+        """Returns the aggregates as (section, [(label, value), ...]) pairs, ready for display or export."""
+        self._build_deferred()
+        return [
+            ("每个前观的任务数", sorted(self.missions_per_fo.items(), key=lambda item: (-item[1], item[0]))),
+            ("每种弹药的炮次", sorted(self.gun_tasks_per_ammo.items(), key=lambda item: (-item[1], item[0]))),
+            ("每门炮的平均修正量 (米)", sorted((gun, round(mean, 1)) for gun, mean in self.mean_correction_per_gun().items())),
+            ("射程分布 (米)", [(f"{start}-{start + RANGE_BUCKET_SIZE}", count) for start, count in sorted(self.range_histogram.items())]),
+        ]
+
+    def _count(self, index, sign):
+        _add(self.missions_per_fo, self.fo_ids[index], sign)
+        _add(self.gun_tasks_per_ammo, self.ammo[index], sign * self.gun_tasks[index])
+        range_m = self.ranges[index]
+        if not math.isnan(range_m):
+            _add(self.range_histogram, int(range_m // RANGE_BUCKET_SIZE) * RANGE_BUCKET_SIZE, sign)
+        correction = self.corrections[index]
+        if not math.isnan(correction):
+            for gun in self.guns[index]:
+                totals = self._correction_per_gun.setdefault(gun, [0.0, 0])
+                totals[0] += sign * correction
+                totals[1] += sign
+                if not totals[1]:
+                    del self._correction_per_gun[gun]
+
+
+def _add(counter, key, amount):
+    value = counter.get(key, 0) + amount
+    if value:
+        counter[key] = value
+    else:
+        counter.pop(key, None)
+
+
+def _extract(entry):
+    """Returns (fo_id, ammo, gun_tasks, range_m, correction, guns) of a log entry."""
+    if entry.get("type") == "TRP_BATCH_RESULT":
+        data = entry.get("data", {})
+        # A TRP batch result is one computed solution, not an observed mission
+        return UNKNOWN_LABEL, data.get("Ammo") or UNKNOWN_LABEL, 1, _parse_number(data.get("Mortar-Target Distance")), math.nan, ()
+
+    mortars = entry.get("mortars", [])
+    # Every gun of the mission fires on the target. Entries carry no round count,
+    # so a mission counts once per gun tasked
+    guns = tuple(mortar.get("callsign") or f"炮 {i}" for i, mortar in enumerate(mortars, 1))
+    try:
+        correction = math.hypot(float(entry.get("corr_lr", 0) or 0), float(entry.get("corr_ad", 0) or 0))
+    except (TypeError, ValueError):
+        correction = math.nan
+    return (entry.get("fo_id") or UNKNOWN_LABEL, entry.get("ammo") or UNKNOWN_LABEL, len(mortars) or 1,
+            _parse_number(entry.get("mortar_to_target_dist")), correction, guns)
+
+
+def _parse_number(value):
+    """Parses numbers stored as display strings such as '1234 m'. Returns NaN if there is none."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = _NUMBER.search(str(value or ""))
+    return float(match.group()) if match else math.nan
@@ -0,0 +1,634 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from collections import namedtuple
+
+from calculations import parse_grid
+from persistence import write_behind, write_json_atomic
+
+# Journal records are fsynced after this many records, or after FSYNC_INTERVAL_S at the latest
+FSYNC_BATCH_SIZE = 64
+FSYNC_INTERVAL_S = 1.0
+# Once the journal holds this many records it is folded into the snapshot in the background
+COMPACT_THRESHOLD = 500
+# A grid typed into the log filter matches targets within this many meters
+GRID_SEARCH_RADIUS = 50
+
+
+class JsonLogStore:
+    """
+    Persists the mission log as a JSON snapshot plus an append-only journal.
+
+    The snapshot is the classic `fire_missions.json` list (indent=4), so it
+    can still be imported, exported and read by older versions. Every change
+    after the snapshot is appended as one JSON line to the journal:
+
+        {"op": "add", "entry": {...}}
+        {"op": "del", "index": 3}      tombstone, index at the time of deletion
+        {"op": "set", "index": 3, "entry": {...}}
+        {"op": "clear"}
+        {"op": "base", "sha1": "..."}  ends a parked journal, see below
+
+    Loading replays the journal over the snapshot. Appends are flushed at once
+    but fsynced in batches. Once the journal grows past COMPACT_THRESHOLD
+    records it is parked and a fresh one started, while the shared
+    write-behind writer rewrites the snapshot; the parked journal is removed
+    once the snapshot is on disk. A parked journal ends with the SHA-1 of the
+    snapshot file it applies to, so after a crash it is replayed only if that
+    snapshot is still the one on disk. Full snapshot saves (replace_all) hold new
+    journal records in memory until their snapshot has landed, so the journal
+    on disk always applies to the snapshot on disk.
+
+    If a snapshot write fails, the journal is put back so that it applies to
+    the snapshot still on disk, and `on_error` is called on the write-behind
+    thread. After a failed full save the held records no longer apply to
+    anything on disk: they are dropped and `needs_full_save` is set until the
+    next replace_all.
+    """
+    def __init__(self, snapshot_path):
+        self.snapshot_path = snapshot_path
+        self.journal_path = os.path.splitext(snapshot_path)[0] + ".journal.jsonl"
+        # The journal being compacted is parked here until the new snapshot is on disk
+        self.compacting_journal_path = self.journal_path + ".compacting"
+        self._lock = threading.Lock()
+        self._journal = None
+        self._journal_records = 0
+        self._unsynced_records = 0
+        self._fsync_timer = None
+        self._snapshot_pending = False
+        self._generation = 0 # identifies the newest queued snapshot write
+        self._snapshot_digest = None # SHA-1 of the snapshot file on disk
+        self._held_records = None # records waiting for a pending replace_all snapshot
+        self.needs_full_save = False
+        self.on_error = None
+
+    def load(self):
+        """Reads the snapshot, replays the journal over it and returns the entries."""
+        if not os.path.exists(self.snapshot_path):
+            # Create the file if it does not exist
+            self._write_snapshot([])
+        with open(self.snapshot_path, "rb") as f:
+            data = f.read()
+        self._snapshot_digest = hashlib.sha1(data).hexdigest()
+        try:
+            entries = json.loads(data.decode("utf-8"))
+            if not isinstance(entries, list):
+                entries = []
+        except (ValueError, TypeError):
+            entries = []
+
+        if os.path.exists(self.compacting_journal_path):
+            # A compaction was interrupted. Its journal only still counts if the
+            # new snapshot never made it to disk (the snapshot is written after parking).
+            base = self._journal_base(self.compacting_journal_path)
+            if base is None:
+                # Parked by an older version without the digest, fall back to the file times
+                replay = os.path.getmtime(self.compacting_journal_path) >= os.path.getmtime(self.snapshot_path)
+            else:
+                replay = base == self._snapshot_digest
+            if replay:
+                self._replay(self.compacting_journal_path, entries)
+                self._write_snapshot(entries)
+            os.remove(self.compacting_journal_path)
+
+        self._journal_records, torn = self._replay(self.journal_path, entries)
+        if torn:
+            # Appending after a torn line would hide every later record, fold what survived into the snapshot
+            self._write_snapshot(entries)
+            self._reset_journal()
+        else:
+            self._journal = open(self.journal_path, "a", encoding="utf-8")
+        return entries
+
+    def append(self, entry):
+        self._write_records([{"op": "add", "entry": entry}])
+
+    def append_many(self, entries):
+        self._write_records([{"op": "add", "entry": entry} for entry in entries])
+
+    def delete(self, index):
+        self._write_records([{"op": "del", "index": index}])
+
+    def replace(self, index, entry):
+        self._write_records([{"op": "set", "index": index, "entry": entry}])
+
+    def clear(self):
+        self._write_records([{"op": "clear"}])
+
+    def replace_all(self, entries):
+        """Saves `entries` as the new snapshot in the background and starts an empty journal."""
+        with self._lock:
+            self._close_journal()
+            if not self._snapshot_pending:
+                # Keep the current journal until the new snapshot is on disk
+                if os.path.exists(self.journal_path):
+                    self._park_journal()
+            elif os.path.exists(self.journal_path):
+                # The parked journal already covers the snapshot on disk, this one only
+                # applies to the pending snapshot that the new one supersedes
+                os.remove(self.journal_path)
+            self._held_records = []
+            self._journal_records = 0
+            self.needs_full_save = False
+            self._queue_snapshot(list(entries))
+
+    def needs_compaction(self):
+        return self._journal_records >= COMPACT_THRESHOLD
+
+    def compact(self, entries):
+        """Folds the journal into the snapshot on the write-behind thread."""
+        with self._lock:
+            if self._snapshot_pending:
+                return
+            self._close_journal()
+            self._park_journal()
+            self._journal = open(self.journal_path, "a", encoding="utf-8")
+            self._journal_records = 0
+            self._queue_snapshot(list(entries))
+
+    def close(self):
+        """Waits for pending snapshot writes and fsyncs the journal."""
+        write_behind.flush()
+        with self._lock:
+            self._close_journal()
+
+    def search(self, query, entries):
+        """Returns the indices of the entries matching `query`, see _parse_query."""
+        return search_entries(query, entries)
+
+    def _queue_snapshot(self, entries):
+        self._snapshot_pending = True
+        self._generation += 1
+        generation = self._generation
+        write_behind.save_json(self.snapshot_path, entries,
+                               on_written=lambda: self._snapshot_written(generation),
+                               on_error=lambda error: self._snapshot_failed(generation, error))
+
+    def _snapshot_written(self, generation):
+        # Runs on the write-behind thread
+        with self._lock:
+            self._snapshot_digest = _file_digest(self.snapshot_path)
+            # Every queued snapshot contains what the parked journal holds
+            if os.path.exists(self.compacting_journal_path):
+                os.remove(self.compacting_journal_path)
+            if generation != self._generation:
+                return # A newer snapshot is queued, it finishes the job
+            if self._held_records is not None:
+                self._journal = open(self.journal_path, "w", encoding="utf-8")
+                self._journal.write("".join(json.dumps(record, separators=(",", ":")) + "\n" for record in self._held_records))
+                self._journal.flush()
+                self._journal_records = len(self._held_records)
+                self._held_records = None
+            self._snapshot_pending = False
+
+    def _snapshot_failed(self, generation, error):
+        # Runs on the write-behind thread
+        with self._lock:
+            if generation != self._generation:
+                return # A newer snapshot is queued, its outcome counts
+            try:
+                self._restore_journal()
+            except OSError:
+                # Nothing usable on disk to append to, wait for the next full save
+                self._journal = None
+                self._held_records = None
+                self.needs_full_save = True
+            self._snapshot_pending = False
+        if self.on_error is not None:
+            self.on_error(error)
+
+    def _restore_journal(self):
+        """Rebuilds the journal for the snapshot still on disk after a failed snapshot write."""
+        self._close_journal()
+        paths = [self.compacting_journal_path]
+        if self._held_records is None:
+            # A compaction: the new journal continues the parked one
+            paths.append(self.journal_path)
+        else:
+            # A full save: the held records belong to the snapshot that was not written
+            self._held_records = None
+            self.needs_full_save = True
+        text = ""
+        for path in paths:
+            if os.path.exists(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    text += f.read()
+        tmp_path = self.journal_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.journal_path)
+        if os.path.exists(self.compacting_journal_path):
+            os.remove(self.compacting_journal_path)
+        self._journal = open(self.journal_path, "a", encoding="utf-8")
+        self._journal_records = text.count("\n")
+
+    def _write_records(self, records):
+        if not records:
+            return
+        with self._lock:
+            if self.needs_full_save:
+                return # The next replace_all saves the whole log
+            if self._held_records is not None:
+                self._held_records.extend(records)
+                return
+            self._journal.write("".join(json.dumps(record, separators=(",", ":")) + "\n" for record in records))
+            self._journal.flush()
+            self._journal_records += len(records)
+            self._unsynced_records += len(records)
+            if self._unsynced_records >= FSYNC_BATCH_SIZE:
+                self._fsync_locked()
+            elif self._fsync_timer is None:
+                self._fsync_timer = threading.Timer(FSYNC_INTERVAL_S, self._fsync)
+                self._fsync_timer.daemon = True
+                self._fsync_timer.start()
+
+    def _fsync(self):
+        with self._lock:
+            self._fsync_locked()
+
+    def _fsync_locked(self):
+        if self._fsync_timer is not None:
+            self._fsync_timer.cancel()
+            self._fsync_timer = None
+        if self._journal is not None and self._unsynced_records:
+            os.fsync(self._journal.fileno())
+        self._unsynced_records = 0
+
+    def _close_journal(self):
+        if self._journal is not None:
+            self._fsync_locked()
+            self._journal.close()
+            self._journal = None
+
+    def _reset_journal(self):
+        self._close_journal()
+        self._journal = open(self.journal_path, "w", encoding="utf-8")
+        self._journal_records = 0
+
+    def _park_journal(self):
+        """Moves the closed journal aside, ending it with the digest of the snapshot it applies to."""
+        with open(self.journal_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"op": "base", "sha1": self._snapshot_digest}, separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(self.journal_path, self.compacting_journal_path)
+
+    def _write_snapshot(self, entries):
+        write_json_atomic(self.snapshot_path, entries)
+        self._snapshot_digest = _file_digest(self.snapshot_path)
+
+    @staticmethod
+    def _journal_base(path):
+        """Returns the snapshot digest a parked journal ends with, or None if it has none."""
+        with open(path, "r", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        try:
+            record = json.loads(lines[-1]) if lines else {}
+        except json.JSONDecodeError:
+            return None
+        return record.get("sha1") if record.get("op") == "base" else None
+
+    @staticmethod
+    def _replay(path, entries):
+        """
+        Applies the journal at `path` to `entries` in place.
+        Returns (record count, whether the journal ended in a torn line).
+        """
+        if not os.path.exists(path):
+            return 0, False
+        count = 0
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    return count, True # A torn final line from a crash mid-append
+                op = record.get("op")
+                if op == "add":
+                    entries.append(record["entry"])
+                elif op == "del":
+                    if 0 <= record["index"] < len(entries):
+                        del entries[record["index"]]
+                elif op == "set":
+                    if 0 <= record["index"] < len(entries):
+                        entries[record["index"]] = record["entry"]
+                elif op == "clear":
+                    entries.clear()
+                elif op == "base":
+                    continue
+                count += 1
+        return count, False
+
+
+# An SQLite log row that has not been decoded yet, see LazyLogEntries
+StoredEntry = namedtuple("StoredEntry", "row_id kind target_name easting northing")
+
+
+class LazyLogEntries(list):
+    """
+    The mission log as loaded by SqliteLogStore. Its items start out as
+    StoredEntry rows holding only the indexed columns; reading an item (by
+    index, slice or iteration) decodes its JSON from the database and keeps
+    the dict in its place, so a launch only decodes the rows that are shown.
+    Use iter_undecoded to look at the items without decoding them.
+    """
+    def __init__(self, items, store):
+        super().__init__(items)
+        self._store = store
+        self._undecoded = len(self) > 0
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        item = super().__getitem__(index)
+        if isinstance(item, StoredEntry):
+            item = self._store.decode(item.row_id)
+            super().__setitem__(index, item)
+        return item
+
+    def __iter__(self):
+        if self._undecoded:
+            self.decode_all()
+        return super().__iter__()
+
+    def decode_all(self):
+        """Decodes every row still undecoded with a single query."""
+        stored = [(i, item.row_id) for i, item in enumerate(iter_undecoded(self)) if isinstance(item, StoredEntry)]
+        if stored:
+            entries = self._store.decode_many(row_id for _, row_id in stored)
+            for i, row_id in stored:
+                super().__setitem__(i, entries[row_id])
+        self._undecoded = False
+
+
+def iter_undecoded(entries):
+    """Iterates a mission log without decoding it: yields entry dicts and, for a LazyLogEntries, StoredEntry rows."""
+    return list.__iter__(entries)
+
+
+class SqliteLogStore:
+    """
+    Keeps the mission log in an SQLite database instead of a JSON file.
+
+    Each entry is stored as its JSON text plus indexed columns (target name,
+    target easting/northing, FO ID, ammo, timestamp, entry type), so filtering
+    the log is an index lookup instead of a scan. Rows are ordered by their
+    id, which mirrors the order of the in-memory log. Loading reads only the
+    columns needed for the map and returns a LazyLogEntries. On first use an
+    existing JSON log is imported, and the JSON format stays the import/export
+    format.
+    """
+    def __init__(self, db_path, import_path=None):
+        self.db_path = db_path
+        self.import_path = import_path
+        self._conn = None
+        self._row_ids = [] # row id of every entry, parallel to the in-memory log
+        self.needs_full_save = False # Writes are synchronous, a failure raises to the caller
+        self.on_error = None
+
+    def load(self):
+        self._conn = sqlite3.connect(self.db_path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS missions ("
+                "id INTEGER PRIMARY KEY, target_name TEXT, easting REAL, northing REAL, "
+                "fo_id TEXT, ammo TEXT, timestamp TEXT, data TEXT NOT NULL, kind TEXT)"
+            )
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(missions)")}
+            if "kind" not in columns:
+                # Databases from before the kind column: fill it in once from the stored JSON
+                self._conn.execute("ALTER TABLE missions ADD COLUMN kind TEXT")
+                rows = self._conn.execute("SELECT id, data FROM missions").fetchall()
+                self._conn.executemany("UPDATE missions SET kind = ? WHERE id = ?",
+                                       [(json.loads(data).get("type"), row_id) for row_id, data in rows])
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_missions_target_name ON missions (target_name COLLATE NOCASE)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_missions_grid ON missions (easting, northing)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_missions_fo_id ON missions (fo_id COLLATE NOCASE)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_missions_ammo ON missions (ammo COLLATE NOCASE)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_missions_timestamp ON missions (timestamp)")
+
+        rows = self._conn.execute("SELECT id, kind, target_name, easting, northing FROM missions ORDER BY id").fetchall()
+        if not rows and self.import_path and os.path.exists(self.import_path):
+            json_store = JsonLogStore(self.import_path)
+            entries = json_store.load()
+            json_store.close()
+            self.append_many(entries)
+            return entries
+
+        self._row_ids = [row[0] for row in rows]
+        return LazyLogEntries([StoredEntry(*row) for row in rows], self)
+
+    def decode(self, row_id):
+        data, = self._conn.execute("SELECT data FROM missions WHERE id = ?", (row_id,)).fetchone()
+        return json.loads(data)
+
+    def decode_many(self, row_ids):
+        """Returns {row id: entry} for `row_ids`."""
+        wanted = set(row_ids)
+        return {row_id: json.loads(data) for row_id, data in self._conn.execute("SELECT id, data FROM missions")
+                if row_id in wanted}
+
+    def append(self, entry):
+        self.append_many([entry])
+
+    def append_many(self, entries):
+        with self._conn:
+            for entry in entries:
+                cursor = self._conn.execute(
+                    "INSERT INTO missions (target_name, easting, northing, fo_id, ammo, timestamp, data, kind) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (*_index_columns(entry), json.dumps(entry), entry.get("type"))
+                )
+                self._row_ids.append(cursor.lastrowid)
+
+    def delete(self, index):
+        with self._conn:
+            self._conn.execute("DELETE FROM missions WHERE id = ?", (self._row_ids.pop(index),))
+
+    def replace(self, index, entry):
+        with self._conn:
+            self._conn.execute(
+                "UPDATE missions SET target_name = ?, easting = ?, northing = ?, fo_id = ?, ammo = ?, timestamp = ?, data = ?, kind = ? "
+                "WHERE id = ?",
+                (*_index_columns(entry), json.dumps(entry), entry.get("type"), self._row_ids[index])
+            )
+
+    def clear(self):
+        with self._conn:
+            self._conn.execute("DELETE FROM missions")
+        self._row_ids = []
+
+    def replace_all(self, entries):
+        entries = list(entries) # Decodes rows of a LazyLogEntries before they are deleted
+        self.clear()
+        self.append_many(entries)
+
+    def needs_compaction(self):
+        return False # SQLite keeps its own file tidy
+
+    def compact(self, entries):
+        pass
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def search(self, query, entries):
+        """Returns the indices of the entries matching `query`, see _parse_query."""
+        grid, text = _parse_query(query)
+        if grid is not None:
+            easting, northing = grid
+            rows = self._conn.execute(
+                "SELECT id FROM missions WHERE easting BETWEEN ? AND ? AND northing BETWEEN ? AND ?",
+                (easting - GRID_SEARCH_RADIUS, easting + GRID_SEARCH_RADIUS,
+                 northing - GRID_SEARCH_RADIUS, northing + GRID_SEARCH_RADIUS)
+            ).fetchall()
+        else:
+            # Prefix LIKE patterns can be answered from the NOCASE indexes
+            pattern = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            rows = self._conn.execute(
+                "SELECT id FROM missions WHERE target_name LIKE ? ESCAPE '\\' "
+                "OR fo_id LIKE ? ESCAPE '\\' OR ammo LIKE ? ESCAPE '\\'",
+                (pattern, pattern, pattern)
+            ).fetchall()
+        matching_ids = {row_id for row_id, in rows}
+        return [i for i, row_id in enumerate(self._row_ids) if row_id in matching_ids]
+
+
+def _file_digest(path):
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha1(f.read()).hexdigest()
+    except OSError:
+        return None # Parked journals without a digest are judged by their file times
+
+
+def create_log_store(config_manager):
+    """Returns the mission log store selected by the 'log_backend' setting."""
+    if config_manager.get_log_backend() == "sqlite":
+        return SqliteLogStore(config_manager.log_db_path, import_path=config_manager.log_file_path)
+    return JsonLogStore(config_manager.log_file_path)
+
+
+def normalize_log_entry(entry):
+    """
+    Stores the target position of a mission log entry as numbers, parsed once
+    from its grid and elevation strings: 'target_easting', 'target_northing'
+    and 'target_elevation' (None where unknown). Entries that already carry
+    them are left alone. Returns the entry.
+    """
+    if "target_easting" in entry:
+        return entry
+    if entry.get("type") == "TRP_BATCH_RESULT":
+        data = entry.get("data", {})
+        grid_str, elev_raw = data.get("Target Grid", ""), data.get("Target Elevation")
+    else:
+        grid_str, elev_raw = entry.get("calculated_target_grid", ""), entry.get("target_elev")
+    try:
+        easting, northing = parse_grid(str(grid_str))
+    except (ValueError, TypeError):
+        easting, northing = None, None
+    try:
+        elevation = float(str(elev_raw).replace(" m", "")) if elev_raw is not None else None
+    except ValueError:
+        elevation = None
+    entry["target_easting"] = easting
+    entry["target_northing"] = northing
+    entry["target_elevation"] = elevation
+    return entry
+
+
+def log_entry_hash(entry):
+    """
+    Returns a hash of what a mission log entry describes: target grid and
+    elevation, ammo, mortar positions and corrections. Names, FO details and
+    timestamps are left out, so the same mission logged by two FDCs under
+    different names hashes the same.
+    """
+    normalize_log_entry(entry)
+    if entry.get("type") == "TRP_BATCH_RESULT":
+        data = entry.get("data", {})
+        canonical = {
+            "type": "TRP_BATCH_RESULT",
+            "grid": (entry["target_easting"], entry["target_northing"]) if entry["target_easting"] is not None else str(data.get("Target Grid", "")),
+            "elevation": entry["target_elevation"],
+            "ammo": data.get("Ammo", ""),
+        }
+    else:
+        canonical = {
+            "grid": (entry["target_easting"], entry["target_northing"]) if entry["target_easting"] is not None else str(entry.get("calculated_target_grid", "")),
+            "elevation": entry["target_elevation"],
+            "ammo": (entry.get("faction", ""), entry.get("ammo", "")),
+            "mortars": [(str(mortar.get("grid", "")).replace(" ", ""), _canonical_number(mortar.get("elev")), mortar.get("callsign", ""))
+                        for mortar in entry.get("mortars", []) if isinstance(mortar, dict)],
+            "corrections": (_canonical_number(entry.get("corr_lr")), _canonical_number(entry.get("corr_ad"))),
+        }
+    return hashlib.sha1(json.dumps(canonical, sort_keys=True, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+
+def log_entry_target(entry):
+    """
+    Returns (target name, easting, northing) of a log entry or StoredEntry,
+    or None for TRP batch results and entries without a valid grid.
+    """
+    if isinstance(entry, StoredEntry):
+        kind, name, easting, northing = entry.kind, entry.target_name, entry.easting, entry.northing
+    else:
+        normalize_log_entry(entry)
+        kind, name, easting, northing = entry.get("type"), entry.get("target_name", ""), entry["target_easting"], entry["target_northing"]
+    if kind == "TRP_BATCH_RESULT" or easting is None:
+        return None
+    return name, easting, northing
+
+
+def _canonical_number(value):
+    # 100, 100.0 and "100" describe the same value
+    try:
+        return round(float(value), 2)
+    except (TypeError, ValueError):
+        return str(value)
+
+
+def _index_columns(entry):
+    """Returns (target_name, easting, northing, fo_id, ammo, timestamp) for an entry."""
+    normalize_log_entry(entry)
+    if entry.get("type") == "TRP_BATCH_RESULT":
+        data = entry.get("data", {})
+        name, fo_id, ammo = data.get("TRP Name", ""), "", data.get("Ammo", "")
+    else:
+        name, fo_id, ammo = entry.get("target_name", ""), entry.get("fo_id", ""), entry.get("ammo", "")
+    return name, entry["target_easting"], entry["target_northing"], fo_id, ammo, entry.get("timestamp")
+
+
+def _parse_query(query):
+    """
+    Splits a log filter query into (grid, text). A query that parses as a grid
+    matches targets within GRID_SEARCH_RADIUS of it, anything else is matched
+    as a case-insensitive prefix of the target name, FO ID or ammo.
+    """
+    query = query.strip()
+    try:
+        return parse_grid(query), None
+    except (ValueError, TypeError):
+        return None, query.lower()
+
+
+def search_entries(query, entries):
+    """Returns the indices of the entries matching `query` by scanning them in memory."""
+    grid, text = _parse_query(query)
+    return [i for i, entry in enumerate(entries) if _matches_query(entry, grid, text)]
+
+
+def _matches_query(entry, grid, text):
+    name, easting, northing, fo_id, ammo, _ = _index_columns(entry)
+    if grid is not None:
+        return (easting is not None and abs(easting - grid[0]) <= GRID_SEARCH_RADIUS
+                and abs(northing - grid[1]) <= GRID_SEARCH_RADIUS)
+    return any(str(value).lower().startswith(text) for value in (name, fo_id, ammo))
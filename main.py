@@ -1,11 +1,19 @@
+import sys
+from startup_profile import StartupProfile
+
+# Created before the other imports so that --profile-startup times them too
+startup_profile = StartupProfile.from_argv(sys.argv)
+
 import tkinter as tk
+import copy
 import json
+import logging
 import os
 import queue
 import threading
 from tkinter import ttk, messagebox, filedialog, simpledialog
-from PIL import Image, ImageTk
 import math
+from datetime import datetime
 
 from ballistics import BALLISTIC_DATA, MILS_PER_REVOLUTION
 from calculations import (
@@ -17,15 +25,28 @@ from calculations import (
     calculate_new_fo_data,
 )
 from mission_log import MissionLog
-from config.config_manager import ConfigManager
+from config.config_manager import CONFIG_POLL_INTERVAL_MS, ConfigManager
 from config.theme_manager import ThemeManager
 from state_manager import StateManager
 from ui.map_view import MapView
-from ui.settings_view import SettingsView
-from ui.fire_mission_planner_view import FireMissionPlannerView, ListSelectDialog # Import ListSelectDialog
-from ui.trp_view import TRPView
+from ui.solution_panel import SolutionPanel
 from worker import worker_thread
+from map_loader import MapCache, map_loader_thread
+from log_import import log_import_thread, format_skipped_report
+from log_archive import ARCHIVE_EXTENSION, KIND_MISSION_LOG, KIND_SESSION, ArchiveReader, write_archive
 from dev_log import DevLog
+from persistence import AUTOSAVE_INTERVAL_MS, SessionAutosave, write_behind
+from spatial_index import GridIndex, SNAP_RADIUS_PX
+from state_model import build_calculation_task, to_float
+from state_history import HISTORY_DELAY_MS, StateHistory, snapshot_values, take_snapshot
+
+# Largest gun count offered in the mortar count selector
+MAX_MORTARS = 12
+# Per-gun colors for input locks, solution tabs and map pins, cycled beyond MAX_MORTARS
+MORTAR_COLORS = [
+    "blue", "green", "purple", "orange", "teal", "brown",
+    "magenta", "olive", "navy", "maroon", "darkcyan", "darkslategray",
+]
 
 class CustomDialog(tk.Toplevel):
     def __init__(self, parent, title, message, is_dark_mode):
@@ -77,13 +98,20 @@ class MortarCalculatorApp(tk.Tk):
         self.is_dark_mode = False
         
         self.state = StateManager()
-        self.mortar_input_widgets = []
-        self.mortar_colors = ["blue", "green", "purple", "orange"]
+        self.mortar_input_widgets = [] # entry widgets of each pooled gun row
+        self.mortar_row_frames = []
+        self.shown_mortar_rows = 0
+        self.mortar_colors = MORTAR_COLORS
+        self.solution_panels = [] # pooled SolutionPanel of each gun, see _show_solution_panels
 
         self.style = ttk.Style(self)
         self.config_manager = ConfigManager()
         self.theme_manager = ThemeManager(self)
         self.dev_log = DevLog()
+        # Events always go to the in-memory ring buffer, the checkbox adds the rotating log file
+        self.state.dev_log_enabled.trace_add("write", lambda *args: self.dev_log.set_enabled(self.state.dev_log_enabled.get()))
+        # Logged and TRP targets by map position, kept up to date by the mission log and TRP list
+        self.target_index = GridIndex()
         
         self.setup_ui() # Setup UI first to create widgets
         
@@ -93,30 +121,65 @@ class MortarCalculatorApp(tk.Tk):
         self.after(100, self.post_init_load)
         self.on_targeting_mode_change() # Set initial view
 
+        # Undo/redo of the mission inputs, one step per burst of edits
+        self.history = StateHistory()
+        self.history.record(take_snapshot(self.state.model))
+        self._history_after_id = None
+        self._restoring_history = False
+        self.inputs_revision = 0 # Bumped on every input change, for the session autosave
+        self.state.subscribe_all(self.on_state_changed)
+
+        def planner():
+            return getattr(self, 'fire_mission_planner_view', None)
+
+        # Crash recovery: changed parts of the session are written in the background every few seconds
+        self.autosave = SessionAutosave(self.config_manager.autosave_path, {
+            "session": (lambda: (self.inputs_revision, self.mission_log.target_name_var.get()), self.get_session_snapshot),
+            "solutions": (lambda: (self.state.last_solutions, self.state.last_coords),
+                          lambda: copy.deepcopy({"last_solutions": self.state.last_solutions, "last_coords": self.state.last_coords})),
+            "map_view": (lambda: tuple(self.state.map_view), lambda: list(self.state.map_view)),
+            # None while the planner tab has not been built
+            "planner": (lambda: planner() and planner().revision, lambda: planner() and planner().get_plan()),
+        })
+        self._autosave_after_id = None
+        self._config_poll_after_id = None
+
         # Setup worker thread and queues
         self.task_queue = queue.Queue()
         self.result_queue = queue.Queue()
         self.worker = threading.Thread(target=worker_thread, args=(self.task_queue, self.result_queue, self), daemon=True)
         self.worker.start()
+
+        # Setup map loader thread so map decoding never blocks the UI
+        self.map_task_queue = queue.Queue()
+        self.map_result_queue = queue.Queue()
+        self.map_load_token = 0
+        self.map_cache = MapCache(self.config_manager.get_map_cache_budget_mb() * 1024 * 1024)
+        self.map_loader = threading.Thread(target=map_loader_thread, args=(self.map_task_queue, self.map_result_queue, self), daemon=True)
+        self.map_loader.start()
+
+        # Setup log import thread so large log files are read and validated off the UI thread
+        self.import_task_queue = queue.Queue()
+        self.import_result_queue = queue.Queue()
+        self.import_token = 0
+        self.import_backup = None
+        self.merge_stats = None
+        self.log_importer = threading.Thread(target=log_import_thread, args=(self.import_task_queue, self.import_result_queue, self), daemon=True)
+        self.log_importer.start()
  
         # Bind custom event for worker thread communication
         self.bind("<<CalculationFinished>>", self.on_calculation_finished)
+        self.bind("<<MapLoaded>>", self.on_map_loaded)
+        self.bind("<<LogImportProgress>>", self.on_log_import_progress)
  
         self.bind('<Control-Return>', lambda event: self.calculate_all())
         self.bind('<Control-n>', lambda event: self.new_mission())
         self.bind('<Control-l>', lambda event: self.load_log_from_file())
+        self.bind('<Control-z>', self.undo)
+        self.bind('<Control-y>', self.redo)
+        self.bind('<Control-Z>', self.redo) # Ctrl+Shift+Z
         self.protocol("WM_DELETE_WINDOW", self.on_closing)
 
-    def _get_float_or_default(self, tk_var, default_value=0.0):
-        """Helper to safely get float from a Tkinter variable, defaulting if empty or invalid."""
-        try:
-            value = tk_var.get()
-            if isinstance(value, str) and value.strip() == "":
-                return default_value
-            return float(value)
-        except (ValueError, tk.TclError):
-            return default_value
-
     def setup_ui(self):
         self.notebook = ttk.Notebook(self)
         self.notebook.pack(pady=10, padx=10, fill="both", expand=True)
@@ -154,22 +217,49 @@ class MortarCalculatorApp(tk.Tk):
         self.notebook.add(self.fire_mission_planner_tab, text="火力任务规划器")
         self.notebook.add(self.settings_tab, text="设置")
 
-        self.setup_trp_tab() # Setup TRP tab first
         self.setup_main_tab()
         self.setup_results_widgets()
-        self.setup_fire_mission_planner_tab()
-        self.setup_settings_tab()
         self.mission_log = MissionLog(self.main_tab, self, self.config_manager)
 
+        # The secondary tabs are built the first time they are selected (see build_tab)
+        self.pending_tabs = {
+            str(self.trp_tab): self.setup_trp_tab,
+            str(self.fire_mission_planner_tab): self.setup_fire_mission_planner_tab,
+            str(self.settings_tab): self.setup_settings_tab,
+        }
+        self.notebook.bind("<<NotebookTabChanged>>", lambda event: self.build_tab(self.notebook.select()))
+
+    def build_tab(self, tab):
+        """Builds the view of a secondary tab if it has not been built yet. Returns True if it was built now."""
+        setup = self.pending_tabs.pop(str(tab), None)
+        if setup is None:
+            return False
+        setup()
+        return True
+
     def post_init_load(self):
         """Load configs and populate UI after the main loop has started."""
-        self.settings_view.refresh_map_list()
-        map_list = self.settings_view.map_selection_combo['values']
+        self.mission_log.load_log()
+        map_list = self.config_manager.get_map_list()
         if "Zarichne.png" in map_list:
             self.state.selected_map_var.set("Zarichne.png")
         elif map_list:
             self.state.selected_map_var.set(map_list[0])
-        self.settings_view.on_map_selected()
+        self.on_map_selected()
+        self.offer_autosave_restore()
+        self._autosave_after_id = self.after(AUTOSAVE_INTERVAL_MS, self.autosave_session)
+        self._config_poll_after_id = self.after(CONFIG_POLL_INTERVAL_MS, self.poll_config_files)
+        if startup_profile.enabled:
+            self.after_idle(self.write_startup_profile)
+
+    def write_startup_profile(self):
+        """Writes the --profile-startup timeline to the developer log once startup has settled."""
+        startup_profile.mark("first idle after post_init_load")
+        startup_profile.stop()
+        log_file_path = self.dev_log.write_report("startup_profile", startup_profile.format_report())
+        if startup_profile.profiler is not None:
+            startup_profile.profiler.dump_stats(os.path.splitext(log_file_path)[0] + ".prof")
+        messagebox.showinfo("启动分析", f"启动时间报告已写入:\n{log_file_path}")
 
     def setup_main_tab(self):
         input_frame = ttk.Frame(self.main_tab)
@@ -182,12 +272,13 @@ class MortarCalculatorApp(tk.Tk):
         mortar_count_frame = ttk.Frame(self.mortar_frame)
         mortar_count_frame.pack(side="top", fill="x", padx=5, pady=5)
         ttk.Label(mortar_count_frame, text="迫击炮数量:").grid(row=0, column=0, sticky="w")
-        num_mortars_combo = ttk.Combobox(mortar_count_frame, textvariable=self.state.num_mortars_var, values=[1, 2, 3, 4], width=5, state="readonly")
+        num_mortars_combo = ttk.Combobox(mortar_count_frame, textvariable=self.state.num_mortars_var, values=list(range(1, MAX_MORTARS + 1)), width=5, state="readonly")
         num_mortars_combo.grid(row=0, column=1, sticky="w", padx=5)
         num_mortars_combo.bind("<<ComboboxSelected>>", self.update_mortar_inputs)
         
         self.mortar_inputs_container = ttk.Frame(self.mortar_frame)
         self.mortar_inputs_container.pack(side="top", fill="x", expand=True)
+        self.mortar_separator = ttk.Separator(self.mortar_inputs_container, orient='vertical')
 
         self.update_mortar_inputs()
 
@@ -273,7 +364,7 @@ class MortarCalculatorApp(tk.Tk):
         ttk.Label(self.trp_frame, text="目标海拔 (米):").grid(row=0, column=2, padx=5, pady=2, sticky="w")
         ttk.Entry(self.trp_frame, textvariable=self.state.trp_elev_var, width=7).grid(row=0, column=3, padx=5, pady=2)
         
-        self.load_trp_to_main_button = ttk.Button(self.trp_frame, text="从TRP列表加载", command=self.trp_view.load_valid_trp_to_main)
+        self.load_trp_to_main_button = ttk.Button(self.trp_frame, text="从TRP列表加载", command=self.load_valid_trp_to_main)
         self.load_trp_to_main_button.grid(row=1, column=0, columnspan=4, pady=5)
 
         corr_frame = ttk.LabelFrame(input_frame, text="4. 火力任务修正 (可选)")
@@ -298,14 +389,29 @@ class MortarCalculatorApp(tk.Tk):
 
 
     def setup_fire_mission_planner_tab(self):
+        from ui.fire_mission_planner_view import FireMissionPlannerView
         self.fire_mission_planner_view = FireMissionPlannerView(self.fire_mission_planner_tab, self)
 
     def setup_trp_tab(self):
+        from ui.trp_view import TRPView
         self.trp_view = TRPView(self.trp_tab, self)
+        self.trp_view.apply_theme()
 
     def setup_settings_tab(self):
+        from ui.settings_view import SettingsView
         self.settings_view = SettingsView(self.settings_tab, self)
 
+    def load_valid_trp_to_main(self):
+        self.build_tab(self.trp_tab)
+        self.trp_view.load_valid_trp_to_main()
+
+    def refresh_trp_list(self):
+        """Redraws the TRP list, building the TRP tab first once there are TRPs to show."""
+        if not hasattr(self, 'trp_view') and not self.state.trp_input_vars:
+            return
+        if not self.build_tab(self.trp_tab): # A new view draws the list itself
+            self.trp_view.refresh_trp_list()
+
     def setup_results_widgets(self):
         results_frame = ttk.Frame(self.main_tab)
         results_frame.pack(fill="both", expand=True)
@@ -353,119 +459,73 @@ class MortarCalculatorApp(tk.Tk):
 
     def toggle_theme(self):
         self.is_dark_mode = not self.is_dark_mode
-        if self.is_dark_mode:
-            self.settings_view.theme_button.config(text="切换到浅色模式")
-            bg_color, fg_color, frame_bg, entry_bg, button_bg, border_color = "#1E1E1E", "#00FF00", "#252526", "#3C3C3C", "#3C3C3C", "#3C3C3C"
-            self.style.theme_use('default')
-            self.update_idletasks() # Ensure theme is fully applied before custom styles
-            self.style.configure(".", background=bg_color, foreground=fg_color)
-            self.style.configure("TFrame", background=bg_color)
-            self.style.configure("TLabel", background=bg_color, foreground=fg_color, font=("Consolas", 10))
-            self.style.configure("TLabelFrame", background=frame_bg, bordercolor=border_color, relief="solid")
-            self.style.configure("TLabelFrame.Label", background=frame_bg, foreground=fg_color, font=("Consolas", 10, "bold"))
-            self.style.configure("TButton", background=button_bg, foreground=fg_color, font=("Consolas", 10), borderwidth=1)
-            self.style.map("TButton", background=[('active', '#6E6E6E')])
-            self.style.configure("TCombobox", selectbackground=entry_bg, fieldbackground=entry_bg, background=button_bg, foreground=fg_color)
-            self.style.map('TCombobox', fieldbackground=[('readonly', entry_bg)], selectbackground=[('readonly', entry_bg)], selectforeground=[('readonly', fg_color)])
-            self.option_add('*TCombobox*Listbox.background', entry_bg)
-            self.option_add('*TCombobox*Listbox.foreground', fg_color)
-            self.option_add('*TCombobox*Listbox.selectBackground', button_bg)
-            self.option_add('*TCombobox*Listbox.selectForeground', fg_color)
-            self.style.configure("TEntry", fieldbackground=entry_bg, foreground=fg_color, insertcolor=fg_color)
-            self.style.configure("Treeview", background=entry_bg, foreground=fg_color, fieldbackground=entry_bg)
-            self.style.configure("Treeview.Heading", background=button_bg, foreground=fg_color)
-            self.style.configure("TNotebook", background=bg_color, borderwidth=0)
-            self.style.configure("TNotebook.Tab", background=frame_bg, foreground=fg_color, padding=[5, 2])
-            self.style.map("TNotebook.Tab", background=[("selected", bg_color)], foreground=[("selected", fg_color)])
-            self.style.configure("TCheckbutton", background=frame_bg, foreground=fg_color, font=("Consolas", 10))
-            self.style.map("TCheckbutton", background=[('active', '#6E6E6E')], foreground=[('active', fg_color)])
-            self.style.configure("Highlight.TFrame", background=bg_color, relief="solid", borderwidth=1, bordercolor="white")
-            self.style.configure("Highlight.TLabel", background=bg_color, foreground=fg_color, font=("Consolas", 10))
-            self.style.configure("Highlight.Bold.TLabel", background=bg_color, foreground=fg_color, font=("Consolas", 10, "bold"))
-            self.style.configure("Highlight.BigBold.TLabel", background=bg_color, foreground=fg_color, font=("Consolas", 12, "bold"))
-            self.style.configure("QuickFire.TLabel", background=frame_bg, foreground="red", font=("Consolas", 14, "bold"))
-            self.style.configure("DangerClose.TLabel", background=frame_bg, foreground="red", font=("Consolas", 18, "bold"))
-            self.configure(background=bg_color)
-            self.map_view_widget.graph_canvas.config(bg=frame_bg)
-            self.status_label.config(foreground="#FF5555")
-            if hasattr(self.settings_view, 'admin_status_label') and self.state.admin_mode_enabled.get():
-                self.settings_view.admin_status_label.config(foreground="#00FF00")
-            if hasattr(self.settings_view, 'hidden_button_label'):
-                self.settings_view.hidden_button_label.config(bg=bg_color)
-            if hasattr(self, 'fire_mission_planner_view'):
-                self.fire_mission_planner_view.apply_theme()
-            if hasattr(self, 'trp_view'):
-                self.trp_view.apply_theme()
-        else:
-            self.settings_view.theme_button.config(text="切换到深色模式")
-            self.style.theme_use('vista')
-            self.update_idletasks() # Ensure theme is fully applied before custom styles
-            self.configure(background="SystemButtonFace")
-            self.map_view_widget.graph_canvas.config(bg="white")
-            self.status_label.config(foreground="red")
-            self.option_add('*TCombobox*Listbox.background', "white")
-            self.option_add('*TCombobox*Listbox.foreground', "black")
-            self.option_add('*TCombobox*Listbox.selectBackground', "blue")
-            self.option_add('*TCombobox*Listbox.selectForeground', "white")
-            if hasattr(self.settings_view, 'admin_status_label') and self.state.admin_mode_enabled.get():
-                self.settings_view.admin_status_label.config(foreground="green")
-            if hasattr(self.settings_view, 'hidden_button_label'):
-                self.settings_view.hidden_button_label.config(bg=self.cget('bg'))
-            if hasattr(self, 'fire_mission_planner_view'):
-                self.fire_mission_planner_view.apply_theme()
-            if hasattr(self, 'trp_view'):
-                self.trp_view.apply_theme()
+        self.theme_manager.use_palette("dark" if self.is_dark_mode else "light")
+        colors = self.theme_manager.colors
+        self.configure(background=colors["window_bg"])
+        self.map_view_widget.graph_canvas.config(bg=colors["canvas_bg"])
+        self.status_label.config(foreground=colors["status_fg"])
+        self.mission_log.apply_theme()
+        if hasattr(self, 'settings_view'):
+            self.settings_view.apply_theme()
+        if hasattr(self, 'fire_mission_planner_view'):
+            self.fire_mission_planner_view.apply_theme()
+        if hasattr(self, 'trp_view'):
+            self.trp_view.apply_theme()
 
     def update_mortar_inputs(self, event=None):
-        # Detach scrollbar to prevent visual glitches during update
-        self.canvas.configure(yscrollcommand=None)
-
-        # Clear all widgets from the frame for a clean slate
-        # Clear only the container for mortar inputs, not the count selector
-        for widget in self.mortar_inputs_container.winfo_children():
-            widget.destroy()
-        self.state.clear_mortars()
-        self.mortar_input_widgets.clear()
-
-        num_mortars = self.state.num_mortars_var.get()
-        
-        # Add a vertical separator if there are two columns of guns
+        """
+        Shows an input row per gun. Rows are pooled: lowering the gun count
+        only hides the surplus rows, and raising it shows them again with
+        the values typed before, so only the rows whose visibility changes
+        are touched.
+        """
+        num_mortars = self.state.model.num_mortars
+        self.ensure_mortar_rows(num_mortars)
+
+        for i in range(num_mortars, self.shown_mortar_rows):
+            self.mortar_row_frames[i].grid_remove()
+        for i in range(self.shown_mortar_rows, num_mortars):
+            self.mortar_row_frames[i].grid()
+        self.shown_mortar_rows = num_mortars
+
+        # A vertical separator between the two columns of guns
         if num_mortars > 1:
-            row_span = 4 if num_mortars > 2 else 2
-            sep = ttk.Separator(self.mortar_inputs_container, orient='vertical')
-            sep.grid(row=0, column=4, rowspan=row_span, sticky='ns', padx=10)
-
-        for i in range(num_mortars):
-            self.state.add_mortar()
+            self.mortar_separator.grid(row=0, column=1, rowspan=(num_mortars + 1) // 2, sticky='ns', padx=10)
+        else:
+            self.mortar_separator.grid_remove()
+
+    def ensure_mortar_rows(self, count):
+        """Creates input rows (and their state) until there are at least `count` guns."""
+        while len(self.mortar_row_frames) < count:
+            i = len(self.mortar_row_frames)
+            if i >= len(self.state.mortar_input_vars):
+                self.state.add_mortar()
             mortar_vars = self.state.get_mortar_vars(i)
 
-            # Determine grid position (odd guns on left, even on right)
-            row_base = (i // 2) * 2
-            col_base = (i % 2) * 5
+            # Odd guns on the left, even guns on the right
+            row_frame = ttk.Frame(self.mortar_inputs_container)
+            row_frame.grid(row=i // 2, column=(i % 2) * 2, sticky="w")
+            row_frame.grid_remove()
 
-            # Create and place widgets
-            ttk.Label(self.mortar_inputs_container, text=f"炮 {i+1} 网格:").grid(row=row_base, column=col_base, padx=5, pady=2, sticky="w")
-            grid_entry = ttk.Entry(self.mortar_inputs_container, textvariable=mortar_vars['grid'], width=12)
-            grid_entry.grid(row=row_base, column=col_base + 1, padx=5, pady=2)
-            
-            ttk.Label(self.mortar_inputs_container, text="海拔:").grid(row=row_base, column=col_base + 2, padx=5, pady=2, sticky="w")
-            elev_entry = ttk.Entry(self.mortar_inputs_container, textvariable=mortar_vars['elev'], width=7)
-            elev_entry.grid(row=row_base, column=col_base + 3, padx=5, pady=2)
+            ttk.Label(row_frame, text=f"炮 {i+1} 网格:").grid(row=0, column=0, padx=5, pady=2, sticky="w")
+            grid_entry = ttk.Entry(row_frame, textvariable=mortar_vars['grid'], width=12)
+            grid_entry.grid(row=0, column=1, padx=5, pady=2)
+
+            ttk.Label(row_frame, text="海拔:").grid(row=0, column=2, padx=5, pady=2, sticky="w")
+            elev_entry = ttk.Entry(row_frame, textvariable=mortar_vars['elev'], width=7)
+            elev_entry.grid(row=0, column=3, padx=5, pady=2)
 
-            ttk.Label(self.mortar_inputs_container, text="呼号:").grid(row=row_base + 1, column=col_base, padx=5, pady=2, sticky="w")
-            callsign_entry = ttk.Entry(self.mortar_inputs_container, textvariable=mortar_vars['callsign'], width=12)
-            callsign_entry.grid(row=row_base + 1, column=col_base + 1, padx=5, pady=2)
+            ttk.Label(row_frame, text="呼号:").grid(row=1, column=0, padx=5, pady=2, sticky="w")
+            callsign_entry = ttk.Entry(row_frame, textvariable=mortar_vars['callsign'], width=12)
+            callsign_entry.grid(row=1, column=1, padx=5, pady=2)
 
-            lock_check = ttk.Checkbutton(self.mortar_inputs_container, text="锁定", variable=mortar_vars['locked'], command=lambda i=i: self.toggle_mortar_lock(i))
-            lock_check.grid(row=row_base + 1, column=col_base + 2, padx=5, pady=2)
+            lock_check = ttk.Checkbutton(row_frame, text="锁定", variable=mortar_vars['locked'], command=lambda i=i: self.toggle_mortar_lock(i))
+            lock_check.grid(row=1, column=2, padx=5, pady=2)
 
+            self.mortar_row_frames.append(row_frame)
             self.mortar_input_widgets.append({"grid": grid_entry, "elev": elev_entry, "callsign": callsign_entry})
             self.toggle_mortar_lock(i)
 
-        # Re-attach scrollbar and force UI update
-        self.canvas.configure(yscrollcommand=self.scrollbar.set)
-        self.update_idletasks()
-
     def toggle_mortar_lock(self, index):
         widgets = self.mortar_input_widgets[index]
         is_locked = self.state.get_mortar_vars(index)['locked'].get()
@@ -473,13 +533,14 @@ class MortarCalculatorApp(tk.Tk):
 
         if is_locked:
             style_name = f"Locked.Gun{index}.TEntry"
-            lock_color = self.mortar_colors[index]
+            lock_color = self.mortar_colors[index % len(self.mortar_colors)]
             
             # Create a new style for the locked entry fields
             # The 'map' function is used to define appearance for specific states
-            self.style.map(style_name,
-                           foreground=[('readonly', 'white')],
-                           fieldbackground=[('readonly', lock_color)])
+            self.theme_manager.register_style(style_name, map={
+                "foreground": [('readonly', 'white')],
+                "fieldbackground": [('readonly', lock_color)],
+            })
             
             for widget in widgets.values():
                 widget.configure(style=style_name)
@@ -523,14 +584,74 @@ class MortarCalculatorApp(tk.Tk):
             if charges:
                 self.spotting_charge_combo.current(0)
 
+    def on_state_changed(self, obj, name, value):
+        """Schedules an undo step once the current burst of input changes settles."""
+        self.inputs_revision += 1
+        if self._restoring_history:
+            return
+        if self._history_after_id is not None:
+            self.after_cancel(self._history_after_id)
+        self._history_after_id = self.after(HISTORY_DELAY_MS, self.record_history)
+
+    def record_history(self):
+        if self._history_after_id is not None:
+            self.after_cancel(self._history_after_id)
+            self._history_after_id = None
+        self.history.record(take_snapshot(self.state.model, self.history.current))
+
+    def undo(self, event=None):
+        self.record_history() # Edits still waiting for their step are undone first
+        snapshot = self.history.undo()
+        if snapshot is not None:
+            self._restore_snapshot(snapshot)
+        return "break"
+
+    def redo(self, event=None):
+        self.record_history()
+        snapshot = self.history.redo()
+        if snapshot is not None:
+            self._restore_snapshot(snapshot)
+        return "break"
+
+    def _restore_snapshot(self, snapshot):
+        """Puts the mission inputs back to a history snapshot."""
+        mission = self.state.model
+        values = snapshot_values(snapshot)
+        self._restoring_history = True
+        try:
+            self.ensure_mortar_rows(len(snapshot.mortars))
+            for i, (mortar, (grid, elev, callsign, locked)) in enumerate(zip(mission.mortars, snapshot.mortars)):
+                mortar.grid, mortar.elev, mortar.callsign, mortar.locked = grid, elev, callsign, locked
+                self.toggle_mortar_lock(i)
+
+            for name, value in values.items():
+                setattr(mission, name, value)
+            self.update_mortar_inputs()
+            self.ammo_type_combo['values'] = list(BALLISTIC_DATA.get(mission.faction, {}).keys())
+            self.update_charge_options()
+            mission.spotting_charge = values["spotting_charge"] # update_charge_options selects the first charge
+            self.on_targeting_mode_change()
+            self.on_mission_type_change()
+
+            if len(snapshot.trps) != len(mission.trps):
+                self.state.clear_trps()
+                for _ in snapshot.trps:
+                    self.state.add_trp()
+            for trp, (grid, elev, name) in zip(mission.trps, snapshot.trps):
+                trp.grid, trp.elev, trp.name = grid, elev, name
+            self.refresh_trp_list()
+        finally:
+            self._restoring_history = False
+
     def on_map_right_click(self, event):
         if not self.state.admin_mode_enabled.get():
             return
         map_e, map_n = self.map_view_widget.canvas_to_map_coords(event.x, event.y)
         if map_e is not None and map_n is not None:
+            map_e, map_n = self.snap_to_known_target(event.x, event.y, map_e, map_n)
             self.state.admin_target_pin = (map_e, map_n)
             self.state.target_grid_10_var.set(f"{int(round(map_e)):05d} {int(round(map_n)):05d}")
-            target_elev = self.state.fo_elev_var.get() + self.state.fo_elev_diff_var.get()
+            target_elev = self.state.model.fo_elev + self.state.model.fo_elev_diff
             self.state.target_elev_var.set(f"{target_elev:.1f} m")
             self.state.mortar_to_target_azimuth_var.set("-- MIL")
             self.state.mortar_to_target_dist_var.set("-- m")
@@ -541,9 +662,19 @@ class MortarCalculatorApp(tk.Tk):
             self.state.fo_dist_var.set(0)
             self.map_view_widget.plot_positions()
 
+    def snap_to_known_target(self, canvas_x, canvas_y, map_e, map_n):
+        """Moves a map click onto the nearest logged or TRP target within SNAP_RADIUS_PX on screen."""
+        edge_e, _ = self.map_view_widget.canvas_to_map_coords(canvas_x + SNAP_RADIUS_PX, canvas_y)
+        if edge_e is None:
+            return map_e, map_n
+        nearest = self.target_index.nearest(map_e, map_n, abs(edge_e - map_e))
+        if nearest is None:
+            return map_e, map_n
+        return nearest[2]["coords"]
+
     def calculate_all(self, trp_data=None):
         """Queues a calculation task for the worker thread.
-        If trp_data is provided, it's a single TRP from a list calculation."""
+        If trp_data (a TrpState) is provided, it's a single TRP from a list calculation."""
         try:
             if trp_data is None: # Regular single calculation from Main tab
                 self.state.correction_status_var.set("计算中...")
@@ -551,36 +682,10 @@ class MortarCalculatorApp(tk.Tk):
                     self.after_cancel(self.flash_dc_job)
                     self.danger_close_label.grid_remove()
 
-            mortars_data = []
-            for i in range(self.state.num_mortars_var.get()):
-                mortar_vars = self.state.get_mortar_vars(i)
-                mortars_data.append({
-                    "grid": mortar_vars['grid'].get(),
-                    "elev": self._get_float_or_default(mortar_vars['elev']),
-                    "callsign": mortar_vars['callsign'].get()
-                })
-
-            task = {
-                'mission_type': self.state.fire_mission_type_var.get(),
-                'targeting_mode': self.state.targeting_mode_var.get(),
-                'faction': self.state.faction_var.get(),
-                'ammo': self.state.ammo_type_var.get(),
-                'creep_direction': self._get_float_or_default(self.state.creep_direction_var),
-                'creep_spread': self._get_float_or_default(self.state.creep_spread_var, 1.0),
-                'fo_grid_str': self.state.fo_grid_var.get(),
-                'fo_elev': self._get_float_or_default(self.state.fo_elev_var),
-                'fo_azimuth_deg': self._get_float_or_default(self.state.fo_azimuth_var),
-                'fo_dist': self._get_float_or_default(self.state.fo_dist_var),
-                'fo_elev_diff': self._get_float_or_default(self.state.fo_elev_diff_var),
-                'corr_lr': self._get_float_or_default(self.state.corr_lr_var),
-                'corr_ad': self._get_float_or_default(self.state.corr_ad_var),
-                'mortars': mortars_data,
-                'target_grid_str': self.state.trp_grid_var.get() if trp_data is None else trp_data['grid'],
-                'target_elev': self._get_float_or_default(self.state.trp_elev_var) if trp_data is None else self._get_float_or_default(tk.DoubleVar(value=trp_data['elev'])),
-                'is_trp_list_calc': trp_data is not None, # Flag to indicate if it's part of a TRP list calculation
-                'trp_name': trp_data['name'] if trp_data is not None else None
-            }
+            task = build_calculation_task(self.state.model, trp_data)
             self.task_queue.put(task)
+            self.dev_log.event("task", "calculation queued: %s, %d gun(s)%s", task['mission_type'], len(task['mortars']),
+                               f", TRP {task.get('trp_name')}" if task.get('is_trp_list_calc') else "")
         except Exception as e:
             self.handle_calculation_error(e)
 
@@ -600,14 +705,7 @@ class MortarCalculatorApp(tk.Tk):
 
     def calculate_trps_from_list(self):
         """Initiates calculation for all TRPs in the list."""
-        trps_to_calculate = [
-            {
-                "grid": trp_vars['grid'].get(),
-                "elev": trp_vars['elev'].get(),
-                "name": trp_vars['name'].get()
-            }
-            for trp_vars in self.state.trp_input_vars # Corrected from self.app.state
-        ]
+        trps_to_calculate = list(self.state.model.trps)
 
         if not trps_to_calculate:
             messagebox.showinfo("无TRP", "没有添加TRP进行计算。")
@@ -630,32 +728,27 @@ class MortarCalculatorApp(tk.Tk):
         self.calculated_trp_results.append(result)
         
         # Update the status of the corresponding TRP in state_manager
-        if self.current_trp_calc_index < len(self.state.trp_input_vars):
-            current_trp_vars = self.state.get_trp_vars(self.current_trp_calc_index)
+        if self.current_trp_calc_index < len(self.state.model.trps):
+            current_trp = self.state.model.trps[self.current_trp_calc_index]
             # Check if there's at least one valid solution among the results
             has_valid_solution = any(not sol.get('error') for sol in result.get('solutions', []))
             
             if has_valid_solution:
-                current_trp_vars['status'].set("Solution Found")
+                current_trp.status = "Solution Found"
             elif result.get('error'):
-                current_trp_vars['status'].set(f"Error: {result['error']}")
+                current_trp.status = f"Error: {result['error']}"
             else:
                 # If no valid solutions and no overall error, it means no solution was found for any mortar
-                current_trp_vars['status'].set("No Solution")
-            self.trp_view.refresh_trp_list() # Refresh TRP list to show status
+                current_trp.status = "No Solution"
+            self.refresh_trp_list() # Refresh TRP list to show status
 
         self.current_trp_calc_index += 1
  
         if self.current_trp_calc_index < self.total_trps_to_calc:
             # Continue with the next TRP
-            next_trp_data = self.state.trp_input_vars[self.current_trp_calc_index]
             # Only update status bar, do not switch tabs or update main UI during batch calculation
             self.state.correction_status_var.set(f"Calculating TRP {self.current_trp_calc_index + 1} of {self.total_trps_to_calc}...")
-            self.calculate_all(trp_data={
-                "grid": next_trp_data['grid'].get(),
-                "elev": next_trp_data['elev'].get(),
-                "name": next_trp_data['name'].get()
-            })
+            self.calculate_all(trp_data=self.state.model.trps[self.current_trp_calc_index])
         else:
             # All TRPs calculated, process all results
             self.trp_list_calc_in_progress = False
@@ -669,6 +762,8 @@ class MortarCalculatorApp(tk.Tk):
         # self.clear_solution() # Removed as per user feedback
 
         valid_solutions_count = 0
+        missions_to_log = []
+        mission = self.state.model
         # Clear previous solution display on main tab
         # self._clear_solution_ui() # Removed as per user feedback
         # self.clear_solution() # Removed as per user feedback
@@ -696,39 +791,36 @@ class MortarCalculatorApp(tk.Tk):
                         # Construct a full mission data dictionary for logging as a regular entry
                         mission_data_for_log = {
                             "target_name": trp_name,
-                            "mortars": [
-                                {
-                                    "grid": m['grid'].get(),
-                                    "elev": m['elev'].get(),
-                                    "callsign": m['callsign'].get(),
-                                    "locked": m['locked'].get()
-                                } for m in self.state.mortar_input_vars # Use current mortar inputs
-                            ],
-                            "num_mortars": self.state.num_mortars_var.get(),
-                            "fire_mission_type": self.state.fire_mission_type_var.get(),
+                            "mortars": [mortar.to_dict() for mortar in mission.active_mortars()], # Use current mortar inputs
+                            "num_mortars": mission.num_mortars,
+                            "fire_mission_type": mission.fire_mission_type,
                             "targeting_mode": "Grid", # Always "Grid" for TRP calculations
-                            "fo_grid": self.state.fo_grid_var.get(),
-                            "fo_elev": self.state.fo_elev_var.get(),
-                            "fo_id": self.state.fo_id_var.get(),
-                            "fo_azimuth_deg": self.state.fo_azimuth_var.get(),
-                            "fo_dist": self.state.fo_dist_var.get(),
-                            "fo_elev_diff": self.state.fo_elev_diff_var.get(),
-                            "corr_lr": self.state.corr_lr_var.get(),
-                            "corr_ad": self.state.corr_ad_var.get(),
-                            "spotting_charge": self.state.spotting_charge_var.get(),
-                            "faction": self.state.faction_var.get(),
-                            "ammo": self.state.ammo_type_var.get(),
+                            "fo_grid": mission.fo_grid,
+                            "fo_elev": mission.fo_elev,
+                            "fo_id": mission.fo_id,
+                            "fo_azimuth_deg": mission.fo_azimuth,
+                            "fo_dist": mission.fo_dist,
+                            "fo_elev_diff": mission.fo_elev_diff,
+                            "corr_lr": mission.corr_lr,
+                            "corr_ad": mission.corr_ad,
+                            "spotting_charge": mission.spotting_charge,
+                            "faction": mission.faction,
+                            "ammo": mission.ammo,
                             "calculated_target_grid": f"{int(round(sol['target_coords'][0])):05d} {int(round(sol['target_coords'][1])):05d}",
                             "mortar_to_target_azimuth": f"{sol['azimuth']:.0f} MIL",
                             "mortar_to_target_dist": f"{sol['distance']:.0f} m",
                             "target_grid_str": trp_name, # Use TRP name as target_grid_str for consistency
                             "target_elev": sol['target_elev'],
                             "original_trp_grid": result.get('original_trp_grid', None), # Log original TRP grid
-                            "original_trp_elev": result.get('original_trp_elev', None) # Log original TRP elevation
+                            "original_trp_elev": result.get('original_trp_elev', None), # Log original TRP elevation
+                            "timestamp": datetime.now().isoformat(timespec="seconds")
                         }
-                        self.mission_log.log_mission_data_directly(mission_data_for_log)
+                        missions_to_log.append(mission_data_for_log)
             # No else block here, as invalid TRPs are only shown in the TRP tab's status column
 
+        # Log the whole batch at once: one tree refresh and one journal write instead of one per TRP
+        self.mission_log.log_missions_directly(missions_to_log)
+
         if valid_solutions_count > 0:
             messagebox.showinfo("TRP计算结果",
                                 f"计算了 {valid_solutions_count} 个有效TRP。 "
@@ -816,11 +908,9 @@ class MortarCalculatorApp(tk.Tk):
 
 
     def _clear_solution_ui(self):
-        """Clears the solution notebook and quick fire frames."""
-        for tab in self.solution_notebook.tabs():
-            self.solution_notebook.forget(tab)
-        for widget in self.quick_fire_frame.winfo_children():
-            widget.destroy()
+        """Hides the solution panels; they are kept for the next result."""
+        for panel in self.solution_panels:
+            panel.hide()
 
     def _update_target_details(self, solution):
         """Updates the main target detail labels."""
@@ -851,101 +941,32 @@ class MortarCalculatorApp(tk.Tk):
         self.state.mortar_to_target_dist_var.set(f"{solution.get('distance', 0.0):.0f} m")
         self.state.mortar_to_target_elev_diff_var.set(f"{solution.get('elev_diff', 0.0):.1f} m")
 
-    def _populate_solution_tab(self, tab_frame, sol, tab_color, gun_index):
-        """Populates a single tab in the solution notebook with firing data,
-        displaying error if no solution found for this mortar."""
-        if not isinstance(sol, dict):
-            print(f"调试: _populate_solution_tab 接收到非字典解决方案: {sol}")
-            ttk.Label(tab_frame, text="错误: 无效的解决方案数据", foreground="red").pack(pady=10)
-            return
-        
-        # Create unique styles for the labels within this tab
-        label_style = f"Gun{gun_index}.TLabel"
-        bold_label_style = f"Gun{gun_index}.Bold.TLabel"
-        
-        self.style.configure(label_style, background=tab_color, foreground="white", font=("Consolas", 10))
-        self.style.configure(bold_label_style, background=tab_color, foreground="white", font=("Consolas", 10, "bold"))
-
-        if sol.get('error'):
-            ttk.Label(tab_frame, text=f"错误: {sol['error']}", foreground="red", wraplength=250).pack(pady=10)
-            return
- 
-        ttk.Label(tab_frame, text="最短飞行时间", style=bold_label_style).grid(row=0, column=1, padx=5)
-        ttk.Label(tab_frame, text="最长飞行时间", style=bold_label_style).grid(row=0, column=2, padx=5)
-        
-        ttk.Label(tab_frame, text="装药 (环):", style=label_style).grid(row=1, column=0, sticky="w", padx=5)
-        ttk.Label(tab_frame, text=f"{sol.get('least_tof', {}).get('charge', '--')}", style=bold_label_style).grid(row=1, column=1, padx=5)
-        ttk.Label(tab_frame, text=f"{sol.get('most_tof', {}).get('charge', '--')}", style=bold_label_style).grid(row=1, column=2, padx=5)
- 
-        # The elevation frame has its own highlighting, so we don't apply the tab color here.
-        elevation_frame = ttk.Frame(tab_frame, style="Highlight.TFrame")
-        elevation_frame.grid(row=2, column=0, columnspan=3, sticky="ew", padx=5, pady=2)
-        inner_elevation_frame = ttk.Frame(elevation_frame, style="TFrame")
-        inner_elevation_frame.pack(fill="both", expand=True, padx=1, pady=1)
-        inner_elevation_frame.grid_columnconfigure(1, weight=1)
-        inner_elevation_frame.grid_columnconfigure(2, weight=1)
-        ttk.Label(inner_elevation_frame, text="修正仰角:", style="Highlight.TLabel").grid(row=0, column=0, sticky="w", padx=5, pady=2)
-        ttk.Label(inner_elevation_frame, text=f"{sol.get('least_tof', {}).get('elev', 0.0):.0f} MIL", style="Highlight.BigBold.TLabel").grid(row=0, column=1)
-        ttk.Label(inner_elevation_frame, text=f"{sol.get('most_tof', {}).get('elev', 0.0):.0f} MIL", style="Highlight.BigBold.TLabel").grid(row=0, column=2)
- 
-        ttk.Label(tab_frame, text="飞行时间:", style=label_style).grid(row=3, column=0, sticky="w", padx=5)
-        ttk.Label(tab_frame, text=f"{sol.get('least_tof', {}).get('tof', 0.0):.1f} sec", style=bold_label_style).grid(row=3, column=1, padx=5)
-        ttk.Label(tab_frame, text=f"{sol.get('most_tof', {}).get('tof', 0.0):.1f} sec", style=bold_label_style).grid(row=3, column=2, padx=5)
- 
-        ttk.Label(tab_frame, text="散布半径:", style=label_style).grid(row=4, column=0, sticky="w", padx=5)
-        ttk.Label(tab_frame, text=f"{sol.get('least_tof', {}).get('dispersion', 0.0)} m", style=bold_label_style).grid(row=4, column=1, padx=5)
-        ttk.Label(tab_frame, text=f"{sol.get('most_tof', {}).get('dispersion', 0.0)} m", style=bold_label_style).grid(row=4, column=2, padx=5)
-
-    def _populate_quick_fire_data(self, sol, gun_index):
-        """Populates the quick fire data frame for a single gun,
-        displaying error if no solution found for this mortar."""
-        if not isinstance(sol, dict):
-            print(f"调试: _populate_quick_fire_data 接收到非字典解决方案: {sol}")
-            return
-
-        gun_frame = ttk.LabelFrame(self.quick_fire_frame, text=f"炮 {gun_index + 1}")
-        gun_frame.grid(row=0, column=gun_index, padx=5, pady=2, sticky="ns")
-        
-        if sol.get('error'):
-            ttk.Label(gun_frame, text=f"错误: {sol['error']}", foreground="red", wraplength=100).pack(pady=5)
-            # Clear quick fire variables for this gun if there's an error
-            self.state.quick_azimuth_var.set("---- MIL")
-            self.state.quick_least_tof_elev_var.set("C-: ---- MIL")
-            self.state.quick_most_tof_elev_var.set("C-: ---- MIL")
-            return
-
-        ttk.Label(gun_frame, text="方位角:").pack(anchor="w")
-        ttk.Label(gun_frame, text=f"{sol.get('azimuth', 0.0):.0f} MIL", style="QuickFire.TLabel").pack(anchor="w")
-        ttk.Label(gun_frame, text="最短飞行时间仰角:").pack(anchor="w")
-        ttk.Label(gun_frame, text=f"C-{sol.get('least_tof', {}).get('charge', '--')}: {sol.get('least_tof', {}).get('elev', 0.0):.0f} MIL", style="QuickFire.TLabel").pack(anchor="w")
-        ttk.Label(gun_frame, text="最长飞行时间仰角:").pack(anchor="w")
-        ttk.Label(gun_frame, text=f"C-{sol.get('most_tof', {}).get('charge', '--')}: {sol.get('most_tof', {}).get('elev', 0.0):.0f} MIL", style="QuickFire.TLabel").pack(anchor="w")
-
-    def _create_solution_tabs(self, mortar_results):
-        """Creates and populates the solution tabs and quick fire data for each mortar."""
+    def _show_solution_panels(self, mortar_results):
+        """Shows each mortar's result in its pooled solution panel, creating panels on first use."""
         num_mortars = self.state.num_mortars_var.get()
         mission_type = self.state.fire_mission_type_var.get()
- 
+
         for i, sol in enumerate(mortar_results): # Iterate through per-mortar results
             tab_title = f"Gun {i + 1}"
             if num_mortars == 1 and mission_type == "Regular":
                 tab_title = "Firing Solution"
-            
-            # Create a unique style for the tab's frame
-            frame_style_name = f"Gun{i}.TFrame"
-            self.style.configure(frame_style_name, background=self.mortar_colors[i])
- 
-            tab_frame = ttk.Frame(self.solution_notebook, style=frame_style_name)
-            self.solution_notebook.add(tab_frame, text=tab_title)
-            
-            self._populate_solution_tab(tab_frame, sol, self.mortar_colors[i], i)
-            self._populate_quick_fire_data(sol, i)
+
+            if i == len(self.solution_panels):
+                color = self.mortar_colors[i % len(self.mortar_colors)]
+                self.solution_panels.append(SolutionPanel(self.solution_notebook, self.quick_fire_frame, self.theme_manager, i, color))
+            self.solution_panels[i].show(sol, tab_title)
+            if not isinstance(sol, dict) or sol.get('error'):
+                self.state.quick_azimuth_var.set("---- MIL")
+                self.state.quick_least_tof_elev_var.set("C-: ---- MIL")
+                self.state.quick_most_tof_elev_var.set("C-: ---- MIL")
+
+        for panel in self.solution_panels[len(mortar_results):]:
+            panel.hide()
 
     def update_ui_with_solution(self, solutions):
         """Updates the entire UI with the calculated firing solutions."""
-        self._clear_solution_ui()
-
         if not solutions:
+            self._clear_solution_ui()
             self.clear_solution()
             return
 
@@ -962,7 +983,7 @@ class MortarCalculatorApp(tk.Tk):
             self._update_target_details({}) # Pass empty dict to clear
             self.state.last_coords['mortars'] = []
  
-        self._create_solution_tabs(solutions) # Pass all solutions (including errors) to create tabs
+        self._show_solution_panels(solutions) # Pass all solutions (including errors) to fill the panels
 
         self.map_view_widget.auto_zoom_to_pins()
         self.map_view_widget.plot_positions()
@@ -971,8 +992,7 @@ class MortarCalculatorApp(tk.Tk):
     def handle_calculation_error(self, e):
         self.clear_solution(clear_error=True) # Clear previous solution before showing error
         self.state.correction_status_var.set(f"Error: {e}")
-        if self.state.dev_log_enabled.get():
-            self.dev_log.write_log(e)
+        self.dev_log.write_log(e)
         self.state.quick_azimuth_var.set("---- MIL")
         self.state.quick_least_tof_elev_var.set("C-: ---- MIL")
         self.state.quick_most_tof_elev_var.set("C-: ---- MIL")
@@ -993,43 +1013,38 @@ class MortarCalculatorApp(tk.Tk):
         self.state.quick_most_tof_elev_var.set("C-: ---- MIL")
 
     def get_current_mission_data_for_log(self):
-        if self.state.targeting_mode_var.get() == "Grid":
-            calculated_target_grid = self.state.trp_grid_var.get()
+        mission = self.state.model
+        if mission.targeting_mode == "Grid":
+            calculated_target_grid = mission.target_grid
         else:
             try:
-                target_easting, target_northing = calculate_target_coords(self.state.fo_grid_var.get(), self.state.fo_azimuth_var.get(), self.state.fo_dist_var.get(), self.state.fo_elev_diff_var.get(), self.state.corr_lr_var.get(), self.state.corr_ad_var.get())
+                target_easting, target_northing = calculate_target_coords(mission.fo_grid, mission.fo_azimuth, mission.fo_dist, mission.fo_elev_diff, mission.corr_lr, mission.corr_ad)
                 calculated_target_grid = f"{int(round(target_easting)):05d} {int(round(target_northing)):05d}"
             except Exception:
                 calculated_target_grid = "Calculation Error"
         return {
             "target_name": self.mission_log.target_name_var.get(),
-            "mortars": [
-                {
-                    "grid": self.state.get_mortar_vars(i)['grid'].get(),
-                    "elev": self.state.get_mortar_vars(i)['elev'].get(),
-                    "callsign": self.state.get_mortar_vars(i)['callsign'].get(),
-                    "locked": self.state.get_mortar_vars(i)['locked'].get()
-                } for i in range(self.state.num_mortars_var.get())
-            ],
-            "num_mortars": self.state.num_mortars_var.get(),
-            "fire_mission_type": self.state.fire_mission_type_var.get(),
-            "targeting_mode": self.state.targeting_mode_var.get(),
-            "fo_grid": self.state.fo_grid_var.get(),
-            "fo_elev": self.state.fo_elev_var.get(),
-            "fo_id": self.state.fo_id_var.get(),
-            "fo_azimuth_deg": self.state.fo_azimuth_var.get(),
-            "fo_dist": self.state.fo_dist_var.get(),
-            "fo_elev_diff": self.state.fo_elev_diff_var.get(),
-            "corr_lr": self.state.corr_lr_var.get(),
-            "corr_ad": self.state.corr_ad_var.get(),
-            "spotting_charge": self.state.spotting_charge_var.get(),
-            "faction": self.state.faction_var.get(),
-            "ammo": self.state.ammo_type_var.get(),
+            "mortars": [mortar.to_dict() for mortar in mission.active_mortars()],
+            "num_mortars": mission.num_mortars,
+            "fire_mission_type": mission.fire_mission_type,
+            "targeting_mode": mission.targeting_mode,
+            "fo_grid": mission.fo_grid,
+            "fo_elev": mission.fo_elev,
+            "fo_id": mission.fo_id,
+            "fo_azimuth_deg": mission.fo_azimuth,
+            "fo_dist": mission.fo_dist,
+            "fo_elev_diff": mission.fo_elev_diff,
+            "corr_lr": mission.corr_lr,
+            "corr_ad": mission.corr_ad,
+            "spotting_charge": mission.spotting_charge,
+            "faction": mission.faction,
+            "ammo": mission.ammo,
             "calculated_target_grid": calculated_target_grid,
             "mortar_to_target_azimuth": self.state.mortar_to_target_azimuth_var.get(),
             "mortar_to_target_dist": self.state.mortar_to_target_dist_var.get(),
-            "target_grid_str": self.state.trp_grid_var.get(),
-            "target_elev": self.state.trp_elev_var.get()
+            "target_grid_str": mission.target_grid,
+            "target_elev": mission.target_elev,
+            "timestamp": datetime.now().isoformat(timespec="seconds")
         }
 
     def load_mission_data_from_log(self, mission_data):
@@ -1042,28 +1057,29 @@ class MortarCalculatorApp(tk.Tk):
                 loaded_mortars.append(mortar_data)
 
         self.state.num_mortars_var.set(len(loaded_mortars) if loaded_mortars else 1)
-        self.update_mortar_inputs() # This will clear existing and add new based on num_mortars_var
+        self.update_mortar_inputs() # Shows one input row per loaded gun
         
+        mission = self.state.model
         for i, mortar_data in enumerate(loaded_mortars):
-            if i < self.state.num_mortars_var.get(): # Ensure we don't go out of bounds
-                mortar_vars = self.state.get_mortar_vars(i)
-                mortar_vars['grid'].set(mortar_data.get("grid", ""))
-                mortar_vars['elev'].set(self._get_float_or_default(tk.DoubleVar(value=mortar_data.get("elev", 0))))
-                mortar_vars['callsign'].set(mortar_data.get("callsign", ""))
-                mortar_vars['locked'].set(mortar_data.get("locked", False))
+            if i < mission.num_mortars: # Ensure we don't go out of bounds
+                mortar = mission.mortars[i]
+                mortar.grid = mortar_data.get("grid", "")
+                mortar.elev = to_float(mortar_data.get("elev", 0))
+                mortar.callsign = mortar_data.get("callsign", "")
+                mortar.locked = bool(mortar_data.get("locked", False))
                 self.toggle_mortar_lock(i)
 
         self.state.fire_mission_type_var.set("Regular") # Default to Regular on load
         self.state.targeting_mode_var.set(mission_data.get("targeting_mode", "Polar"))
         self.on_targeting_mode_change()
-        self.state.fo_grid_var.set(mission_data.get("fo_grid", ""))
-        self.state.fo_elev_var.set(self._get_float_or_default(tk.DoubleVar(value=mission_data.get("fo_elev", 0))))
-        self.state.fo_id_var.set(mission_data.get("fo_id", ""))
-        self.state.fo_azimuth_var.set(self._get_float_or_default(tk.DoubleVar(value=mission_data.get("fo_azimuth_deg", 0))))
-        self.state.fo_dist_var.set(self._get_float_or_default(tk.DoubleVar(value=mission_data.get("fo_dist", 0))))
-        self.state.fo_elev_diff_var.set(self._get_float_or_default(tk.DoubleVar(value=mission_data.get("fo_elev_diff", 0))))
-        self.state.corr_lr_var.set(self._get_float_or_default(tk.DoubleVar(value=mission_data.get("corr_lr", 0))))
-        self.state.corr_ad_var.set(self._get_float_or_default(tk.DoubleVar(value=mission_data.get("corr_ad", 0))))
+        mission.fo_grid = mission_data.get("fo_grid", "")
+        mission.fo_elev = to_float(mission_data.get("fo_elev", 0))
+        mission.fo_id = mission_data.get("fo_id", "")
+        mission.fo_azimuth = to_float(mission_data.get("fo_azimuth_deg", 0))
+        mission.fo_dist = to_float(mission_data.get("fo_dist", 0))
+        mission.fo_elev_diff = to_float(mission_data.get("fo_elev_diff", 0))
+        mission.corr_lr = to_float(mission_data.get("corr_lr", 0))
+        mission.corr_ad = to_float(mission_data.get("corr_ad", 0))
         self.state.faction_var.set(mission_data.get("faction", "NATO"))
         self.on_faction_change()
         self.state.ammo_type_var.set(mission_data.get("ammo", ""))
@@ -1101,7 +1117,7 @@ class MortarCalculatorApp(tk.Tk):
                 mortars.append({"coords": coords})
             
             fo_e, fo_n = parse_grid(self.state.fo_grid_var.get())
-            target_e, target_n = calculate_target_coords(self.state.fo_grid_var.get(), self.state.fo_azimuth_var.get(), self.state.fo_dist_var.get(), self.state.fo_elev_diff_var.get(), 0, 0)
+            target_e, target_n = calculate_target_coords(mission.fo_grid, mission.fo_azimuth, mission.fo_dist, mission.fo_elev_diff, 0, 0)
 
             self.state.last_coords = {
                 'mortars': [m['coords'] for m in mortars],
@@ -1129,12 +1145,32 @@ class MortarCalculatorApp(tk.Tk):
             self.creep_spread_slider.grid_remove()
             self.creep_spread_value_label.grid_remove()
 
+    def on_map_selected(self, event=None):
+        map_name = self.state.selected_map_var.get()
+        if not map_name:
+            return
+
+        # Ask for confirmation before changing the map and clearing data
+        if self.state.fo_grid_var.get() != "0000000000": # Check if there's existing data
+            if not messagebox.askyesno("更改地图？", "更改地图将清除所有当前任务数据。确定吗？"):
+                return # Stop the map change
+
+        config = self.config_manager.get_map_config(map_name)
+        self.state.map_x_max_var.set(config.get('x_max', 1000))
+        self.state.map_y_max_var.set(config.get('y_max', 1000))
+
+        # If user confirmed, or if there was no data, proceed to clear and load
+        self.new_mission(confirm=False) # Call new_mission without a second confirmation
+        self.load_map_image_and_view()
+
     def new_mission(self, confirm=True):
         if confirm and not messagebox.askyesno("新任务", "这将清除所有当前任务数据。确定吗？"):
             return
 
         self.state.reset_inputs()
         self.update_mortar_inputs()
+        for i in range(len(self.mortar_row_frames)):
+            self.toggle_mortar_lock(i) # Rows are reused, so drop any lock styling
         self.clear_solution()
         self.mission_log.clear_log()
         self.state.last_coords = {}
@@ -1143,62 +1179,397 @@ class MortarCalculatorApp(tk.Tk):
     def save_log_as(self):
         filepath = filedialog.asksaveasfilename(
             defaultextension=".json",
-            filetypes=[("JSON files", "*.json"), ("All files", "*.*")],
+            filetypes=[("JSON files", "*.json"), ("Mission archives", f"*{ARCHIVE_EXTENSION}"), ("All files", "*.*")],
             title="Save Mission Log As..."
         )
         if not filepath:
             return
         try:
-            with open(filepath, 'w') as f:
-                json.dump(self.mission_log.get_log_data(), f, indent=4)
+            if filepath.lower().endswith(ARCHIVE_EXTENSION):
+                write_archive(filepath, KIND_MISSION_LOG, self.mission_log.get_log_data())
+            else:
+                with open(filepath, 'w') as f:
+                    json.dump(self.mission_log.get_log_data(), f, indent=4)
             messagebox.showinfo("成功", "任务日志保存成功。")
         except Exception as e:
             messagebox.showerror("错误", f"保存任务日志失败: {e}")
 
     def load_log_from_file(self):
+        if self.import_in_progress():
+            return
         filepath = filedialog.askopenfilename(
-            filetypes=[("JSON files", "*.json"), ("All files", "*.*")],
+            filetypes=[("JSON files", "*.json"), ("JSON Lines files", "*.jsonl"), ("Mission archives", f"*{ARCHIVE_EXTENSION}"), ("All files", "*.*")],
             title="加载任务日志"
         )
         if not filepath:
             return
+        self.start_log_import('log', filepath)
+
+    def merge_logs_from_files(self):
+        if self.import_in_progress():
+            return
+        filepaths = filedialog.askopenfilenames(
+            filetypes=[("JSON files", "*.json"), ("JSON Lines files", "*.jsonl"), ("Mission archives", f"*{ARCHIVE_EXTENSION}"), ("All files", "*.*")],
+            title="合并任务日志"
+        )
+        if not filepaths:
+            return
+        self.import_token += 1
+        self.mission_log.begin_merge()
+        self.merge_stats = {'files': len(filepaths), 'finished': 0, 'total': 0, 'added': 0, 'duplicates': 0,
+                            'replaced': 0, 'skipped': [], 'errors': []}
+        for filepath in filepaths:
+            self.import_task_queue.put({'token': self.import_token, 'kind': 'merge', 'path': filepath})
+
+    def get_session_snapshot(self):
+        """Returns the current mission inputs, TRP list and map as a JSON-serializable dict."""
+        return {
+            "map": self.state.selected_map_var.get(),
+            "mission": self.get_current_mission_data_for_log(),
+            "trps": [dict(trp.to_dict(), type="TRP") for trp in self.state.model.trps]
+        }
+
+    def apply_session_snapshot(self, snapshot):
+        """Restores mission inputs and the TRP list from get_session_snapshot's dict."""
+        mission = snapshot.get("mission")
+        if mission:
+            self.load_mission_data_from_log(mission)
+            self.state.trp_grid_var.set(mission.get("target_grid_str", "0000000000"))
+        self.state.clear_trps()
+        for trp in snapshot.get("trps", []):
+            self.state.add_trp()
+            trp_vars = self.state.get_trp_vars(len(self.state.trp_input_vars) - 1)
+            trp_vars['grid'].set(trp.get("grid", "0000000000"))
+            trp_vars['elev'].set(trp.get("elev", 100))
+            trp_vars['name'].set(trp.get("name", ""))
+            trp_vars['status'].set(trp.get("status", "Loaded"))
+        self.refresh_trp_list()
+
+    def export_session(self):
+        filepath = filedialog.asksaveasfilename(
+            defaultextension=ARCHIVE_EXTENSION,
+            filetypes=[("Mission archives", f"*{ARCHIVE_EXTENSION}"), ("All files", "*.*")],
+            title="导出会话"
+        )
+        if not filepath:
+            return
+        try:
+            write_archive(filepath, KIND_SESSION, self.mission_log.get_log_data(), meta=self.get_session_snapshot())
+            messagebox.showinfo("成功", "会话导出成功。")
+        except Exception as e:
+            messagebox.showerror("错误", f"导出会话失败: {e}")
+
+    def import_session(self):
+        if self.import_in_progress():
+            return
+        filepath = filedialog.askopenfilename(
+            filetypes=[("Mission archives", f"*{ARCHIVE_EXTENSION}"), ("All files", "*.*")],
+            title="导入会话"
+        )
+        if not filepath:
+            return
+        try:
+            with ArchiveReader(filepath) as reader:
+                if reader.kind != KIND_SESSION:
+                    raise ValueError("该存档不包含会话")
+                snapshot = reader.meta
+        except Exception as e:
+            messagebox.showerror("错误", f"导入会话失败: {e}")
+            return
+        self.apply_session_snapshot(snapshot)
+        # The log entries are streamed in by the log import thread like any other log file
+        self.start_log_import('log', filepath)
+
+    def autosave_session(self):
+        try:
+            self.autosave.save()
+        except Exception as e:
+            # Autosave must never interrupt the user, note the failure and try again next time
+            self.dev_log.write_log(e)
+        self._autosave_after_id = self.after(AUTOSAVE_INTERVAL_MS, self.autosave_session)
+
+    def poll_config_files(self):
+        """Picks up changes that other machines sharing the config folder made to the maps and config files."""
+        try:
+            changes = self.config_manager.poll()
+            if "config" in changes:
+                self.map_cache.set_budget(self.config_manager.get_map_cache_budget_mb() * 1024 * 1024)
+            if hasattr(self, 'settings_view'):
+                if "maps" in changes:
+                    self.settings_view.refresh_map_list()
+                self.settings_view.update_map_info() # Also shows a map hash computed since
+            self.theme_manager.poll()
+        except Exception as e:
+            # A flaky network drive must not interrupt the user, try again next time
+            self.dev_log.write_log(e)
+        self._config_poll_after_id = self.after(CONFIG_POLL_INTERVAL_MS, self.poll_config_files)
+
+    def offer_autosave_restore(self):
+        """Offers to restore the session autosaved by a run that did not exit cleanly."""
+        data = self.autosave.load()
+        if not data:
+            return
+        saved_at = datetime.fromtimestamp(data.get("saved_at", 0)).strftime("%Y-%m-%d %H:%M:%S")
+        if not messagebox.askyesno("恢复会话", f"程序上次未正常退出。\n是否恢复 {saved_at} 自动保存的会话？"):
+            return
+
+        session = data.get("session", {})
+        if session.get("map") and session["map"] != self.state.selected_map_var.get():
+            self.state.selected_map_var.set(session["map"])
+            self.on_map_selected()
+        self.apply_session_snapshot(session)
+
+        solutions = data.get("solutions", {})
+        if solutions.get("last_solutions"):
+            try:
+                self.state.last_solutions = solutions["last_solutions"]
+                self.update_ui_with_solution(self.state.last_solutions)
+                self.state.last_coords = solutions.get("last_coords", {})
+            except Exception:
+                self.clear_solution()
+                self.state.last_solutions = []
+                self.state.last_coords = {}
+        if data.get("map_view"):
+            self.state.map_view = list(data["map_view"])
+        plan = data.get("planner")
         try:
-            with open(filepath, 'r') as f:
-                log_data = json.load(f)
-            self.mission_log.load_log_data(log_data)
-            messagebox.showinfo("成功", "任务日志加载成功。")
+            if plan and (plan.get("image_path") or plan.get("items")):
+                self.build_tab(self.fire_mission_planner_tab)
+                self.fire_mission_planner_view.set_plan(plan)
         except Exception as e:
-            messagebox.showerror("错误", f"加载任务日志失败: {e}")
+            messagebox.showerror("错误", f"恢复作战计划失败: {e}")
+        self.map_view_widget.plot_positions()
+
+    def import_in_progress(self):
+        """
+        Tells the user and returns True if a log import or merge is still
+        running. Imports don't overlap, so a failed import always restores
+        the log or TRP list from before it started.
+        """
+        if self.import_backup is None and self.merge_stats is None:
+            return False
+        messagebox.showinfo("导入进行中", "正在导入日志，请等待当前导入完成后再试。")
+        return True
+
+    def start_log_import(self, kind, filepath):
+        """
+        Reads a mission log file on the log import thread. For kind 'log' the
+        entries replace the mission log, for kind 'trp' the TRPs found in it
+        replace the TRP list. Rows are inserted batch by batch as they arrive.
+        """
+        self.import_token += 1
+        if kind == 'log':
+            self.import_backup = self.mission_log.get_log_data()
+            self.mission_log.load_log_data([])
+        else:
+            self.import_backup = self.state.get_trp_list()
+            self.state.clear_trps()
+            self.refresh_trp_list()
+        self.import_task_queue.put({'token': self.import_token, 'kind': kind, 'path': filepath})
+
+    def on_log_import_progress(self, event=None):
+        """Applies batches, the final summary and errors posted by the log import thread."""
+        while True:
+            try:
+                result = self.import_result_queue.get_nowait()
+            except queue.Empty:
+                break
+            if result['token'] != self.import_token:
+                continue # Superseded by a newer import
+
+            kind = result['kind']
+            if kind == 'merge':
+                self._on_merge_progress(result)
+            elif result['status'] == 'batch':
+                if kind == 'log':
+                    self.mission_log.append_imported_entries(result['items'])
+                else:
+                    for trp in result['items']:
+                        self.state.add_trp()
+                        new_trp_vars = self.state.get_trp_vars(len(self.state.trp_input_vars) - 1)
+                        new_trp_vars['grid'].set(trp['grid'])
+                        new_trp_vars['elev'].set(trp['elev'])
+                        new_trp_vars['name'].set(trp['name'] or f"TRP from Log {len(self.state.trp_input_vars)}")
+                        new_trp_vars['status'].set(trp['status']) # Set initial status
+            elif result['status'] == 'done' and result['total'] and len(result['skipped']) == result['total']:
+                # Not a single usable row, most likely not a mission log at all
+                self._restore_import_backup(kind)
+                messagebox.showerror("错误", "无效的JSON文件。请选择有效的任务日志。")
+            elif result['status'] == 'done':
+                self.import_backup = None
+                if kind == 'trp':
+                    self.refresh_trp_list()
+                self._show_import_summary(result)
+            else:
+                self._restore_import_backup(kind)
+                error = result['error']
+                if isinstance(error, UnicodeDecodeError):
+                    messagebox.showerror("错误", "无效的JSON文件。请选择有效的任务日志。")
+                else:
+                    messagebox.showerror("错误", f"加载失败: {error}")
+
+    def _on_merge_progress(self, result):
+        stats = self.merge_stats
+        if result['status'] == 'batch':
+            added, duplicates, replaced = self.mission_log.merge_entries(result['items'])
+            stats['added'] += added
+            stats['duplicates'] += duplicates
+            stats['replaced'] += replaced
+            return
+
+        file_name = os.path.basename(result.get('path', ''))
+        if result['status'] == 'done':
+            stats['total'] += result['total']
+            stats['skipped'].extend((row_number, f"{file_name}: {reason}") for row_number, reason in result['skipped'])
+        else:
+            stats['errors'].append(f"{file_name}: {result['error']}")
+        stats['finished'] += 1
+        if stats['finished'] < stats['files']:
+            return
+
+        self.mission_log.end_merge()
+        self.merge_stats = None
+        message = (f"合并了 {stats['files']} 个日志文件，读取 {stats['total']} 个条目:\n"
+                   f"新增 {stats['added']} 个，重复 {stats['duplicates']} 个，以较新记录替换 {stats['replaced']} 个。")
+        if stats['skipped']:
+            report_path = self.dev_log.write_report("log_merge_skipped", format_skipped_report("(merge)", stats['total'], stats['skipped']))
+            message += f"\n跳过了 {len(stats['skipped'])} 个无效条目，完整列表见:\n{report_path}"
+        if stats['errors']:
+            messagebox.showwarning("合并警告", message + "\n\n无法读取:\n" + "\n".join(stats['errors']))
+        else:
+            messagebox.showinfo("合并完成", message)
+
+    def _restore_import_backup(self, kind):
+        """Puts back the log or TRP list that a failed import replaced."""
+        if kind == 'log':
+            self.mission_log.load_log_data(self.import_backup)
+        else:
+            self.state.set_trp_list(self.import_backup)
+            self.refresh_trp_list()
+        self.import_backup = None
+
+    def _show_import_summary(self, result):
+        skipped = result['skipped']
+        self.dev_log.event("import", "%s import of %s: %d entries, %d skipped", result['kind'], result['path'], result['total'], len(skipped))
+        if result['kind'] == 'log':
+            message = f"任务日志加载成功。读取了 {result['total']} 个条目。"
+        else:
+            message = f"从日志文件加载了 {len(self.state.trp_input_vars)} 个TRP。"
+        if not skipped:
+            messagebox.showinfo("成功", message)
+            return
+
+        max_shown = 10
+        lines = [f"第 {row_number} 条: {reason}" for row_number, reason in skipped[:max_shown]]
+        if len(skipped) > max_shown:
+            report_path = self.dev_log.write_report("log_import_skipped", format_skipped_report(result['path'], result['total'], skipped))
+            lines.append(f"... 另有 {len(skipped) - max_shown} 条，完整列表见:\n{report_path}")
+        messagebox.showwarning("加载警告", f"{message}\n跳过了 {len(skipped)} 个无效条目:\n\n" + "\n".join(lines))
 
     def load_map_image_and_view(self):
+        """Shows the selected map, from the map cache if possible, otherwise
+        by queueing it for decoding on the map loader thread."""
         map_name = self.state.selected_map_var.get()
+        self.map_load_token += 1 # Invalidate any load still in flight
+        self._release_map_image()
         if not map_name:
-            self.state.map_image = None
+            self.state.map_loading = False
             self.map_view_widget.plot_positions()
             return
 
-        map_path = "" # Define here to be available in except block
-        try:
-            # Use the config_manager to get the correct base directory for maps
-            map_path = os.path.join(self.config_manager.maps_dir, map_name)
-            
-            if os.path.exists(map_path):
-                self.state.map_image = Image.open(map_path)
-                map_x_max = self.state.map_x_max_var.get()
-                map_y_max = self.state.map_y_max_var.get()
-                self.state.map_view = [0, 0, map_x_max, map_y_max]
+        # Use the config_manager to get the correct base directory for maps
+        map_path = os.path.join(self.config_manager.maps_dir, map_name)
+        map_info = self.config_manager.get_map_info(map_name)
+        if map_info is None:
+            self.state.map_loading = False
+            messagebox.showerror("地图错误", f"未找到地图文件。\n\nPyInstaller检查：应用程序期望在以下路径找到地图，但该路径不存在：\n\n{map_path}")
+            self.map_view_widget.plot_positions()
+            return
+
+        map_x_max = self.state.map_x_max_var.get()
+        map_y_max = self.state.map_y_max_var.get()
+        self.state.map_view = [0, 0, map_x_max, map_y_max]
+
+        map_mtime = map_info.mtime
+        pyramid = self.map_cache.get(map_name, map_mtime)
+        if pyramid is not None:
+            self.state.map_pyramid = pyramid
+            self.state.map_image = pyramid.levels[0]
+            self.state.map_loading = False
+        else:
+            self.state.map_loading = True
+            self.map_task_queue.put({'token': self.map_load_token, 'map_name': map_name, 'map_path': map_path, 'mtime': map_mtime})
+        self.update_map_cache_status()
+        self.map_view_widget.plot_positions()
+
+    def _release_map_image(self):
+        """Drops the references to the current map so its buffers can be freed.
+        Full pyramids stay alive in the map cache, previews are closed here."""
+        if self.state.map_pyramid is None and self.state.map_image is not None:
+            self.state.map_image.close()
+        self.state.map_image = None
+        self.state.map_pyramid = None
+        self.state.map_photo = None
+        self.map_view_widget.graph_canvas.delete("all") # The canvas still references the old PhotoImage
+
+    def on_map_loaded(self, event=None):
+        """Handles preview, full-detail and error results from the map loader thread."""
+        while True:
+            try:
+                result = self.map_result_queue.get_nowait()
+            except queue.Empty:
+                break
+
+            if result['token'] != self.map_load_token:
+                # The user switched maps while this one was decoding, drop it
+                if result['kind'] in ('preview', 'loaded'):
+                    result['payload'].close()
+                continue
+
+            if result['kind'] == 'preview':
+                if self.state.map_pyramid is None: # Never replace full detail with a preview
+                    self._release_map_image()
+                    self.state.map_image = result['payload']
+            elif result['kind'] == 'loaded':
+                pyramid = result['payload']
+                self._release_map_image()
+                self.map_cache.put(result['map_name'], result['mtime'], pyramid)
+                self.state.map_pyramid = pyramid
+                self.state.map_image = pyramid.levels[0]
+                self.state.map_loading = False
+                self.update_map_cache_status()
+                self.dev_log.event("map", "map %s loaded, %d levels", result['map_name'], len(pyramid.levels))
             else:
-                self.state.map_image = None
-                messagebox.showerror("地图错误", f"未找到地图文件。\n\nPyInstaller检查：应用程序期望在以下路径找到地图，但该路径不存在：\n\n{map_path}")
-        except Exception as e:
-            self.state.map_image = None
-            messagebox.showerror("地图加载错误", f"加载地图图片时发生错误：\n\n{e}\n\n尝试的路径：\n{map_path}")
-        
+                self._release_map_image()
+                self.state.map_loading = False
+                self.dev_log.event("map", "map load failed: %s", result['payload'], level=logging.ERROR)
+                messagebox.showerror("地图加载错误", f"加载地图图片时发生错误：\n\n{result['payload']}\n\n尝试的路径：\n{result.get('map_path', '')}")
         self.map_view_widget.plot_positions()
 
+    def set_map_cache_budget(self, budget_mb):
+        self.config_manager.set_map_cache_budget_mb(budget_mb)
+        self.map_cache.set_budget(budget_mb * 1024 * 1024)
+        self.update_map_cache_status()
+
+    def update_map_cache_status(self):
+        if hasattr(self, 'settings_view'):
+            self.settings_view.update_map_cache_status()
+            self.settings_view.update_map_info()
+
     def on_closing(self):
         """Handles the window closing event to gracefully shut down the worker thread."""
         self.task_queue.put(None)  # Send sentinel to worker
+        self.map_task_queue.put(None)  # Send sentinel to map loader
+        self.import_task_queue.put(None)  # Send sentinel to log importer
+        self.map_view_widget.reachability_layer.close()  # and to the heatmap thread
+        if self._autosave_after_id is not None:
+            self.after_cancel(self._autosave_after_id)
+        if self._config_poll_after_id is not None:
+            self.after_cancel(self._config_poll_after_id)
+        self.mission_log.close()
+        self.autosave.discard() # A clean exit has nothing to recover
+        write_behind.close()  # Flush pending config and log saves before exiting
+        self.dev_log.close()
         self.destroy()
 
     def load_trp_to_main_from_log(self):
@@ -1218,23 +1589,13 @@ class MortarCalculatorApp(tk.Tk):
                 # For regular missions, display Target Name and Grid
                 display_entries.append(f"{entry.get('target_name', 'Unknown Mission')} ({entry.get('calculated_target_grid', 'N/A')})")
 
+        from ui.fire_mission_planner_view import ListSelectDialog
         dialog = ListSelectDialog(self, "Select Mission Log Entry", display_entries, self.is_dark_mode)
-        selected_display_name = dialog.result
-
-        if selected_display_name:
-            # Find the original mission data based on the selected display name
-            selected_mission_data = None
-            for i, entry in enumerate(log_entries):
-                if entry.get("type") == "TRP_BATCH_RESULT":
-                    trp_data = entry.get("data", {})
-                    if selected_display_name == f"TRP Batch: {trp_data.get('TRP Name', 'Unknown')} ({trp_data.get('Status', 'N/A')})":
-                        selected_mission_data = entry
-                        break
-                else:
-                    if selected_display_name == f"{entry.get('target_name', 'Unknown Mission')} ({entry.get('calculated_target_grid', 'N/A')})":
-                        selected_mission_data = entry
-                        break
-            
+
+        if dialog.result is not None:
+            # The dialog lists the entries in log order, so its index is the log index
+            selected_mission_data = log_entries[dialog.result_index]
+
             if selected_mission_data:
                 # Extract TRP data from the selected mission
                 if selected_mission_data.get("type") == "TRP_BATCH_RESULT":
@@ -1261,5 +1622,9 @@ class MortarCalculatorApp(tk.Tk):
                 messagebox.showwarning("选择错误", "无法找到选中的任务数据。")
 
 if __name__ == "__main__":
+    startup_profile.time_methods(MortarCalculatorApp, [name for name in vars(MortarCalculatorApp) if name.startswith("setup_")]
+                                 + ["__init__", "toggle_theme", "post_init_load", "offer_autosave_restore"])
+    startup_profile.time_methods(ThemeManager, ["apply_theme"])
+    startup_profile.time_methods(MissionLog, ["__init__", "load_log"])
     app = MortarCalculatorApp()
     app.mainloop()
\ No newline at end of file
@@ -0,0 +1,207 @@
+import os
+import queue
+import traceback
+from collections import OrderedDict
+from PIL import Image
+
+# Longest edge (in pixels) of the quick preview shown while the full map decodes
+PREVIEW_MAX_EDGE = 1024
+# Pyramid levels are generated until the longest edge drops below this size
+PYRAMID_MIN_EDGE = 512
+# Sidecar folder (inside the maps directory) holding cached previews
+PREVIEW_DIR_NAME = ".previews"
+
+
+class MapPyramid:
+    """
+    A decoded map image together with progressively halved copies of it.
+    Level 0 is the full-resolution image, each following level is half the
+    size of the one before. Rendering picks the level closest to the zoom
+    so a zoomed-out view never resamples the full-resolution image.
+    """
+    def __init__(self, levels):
+        self.levels = levels
+
+    @property
+    def size(self):
+        return self.levels[0].size
+
+    def level_for_ratio(self, ratio):
+        """
+        Returns (image, factor) for the coarsest level that still has at least
+        one source pixel per rendered pixel. `ratio` is the number of
+        full-resolution pixels that end up in one canvas pixel.
+        """
+        level = 0
+        while level + 1 < len(self.levels) and ratio >= 2 ** (level + 1):
+            level += 1
+        return self.levels[level], 2 ** level
+
+    @property
+    def nbytes(self):
+        """Approximate memory held by all levels' pixel buffers."""
+        return sum(image.width * image.height * len(image.getbands()) for image in self.levels)
+
+    def close(self):
+        """Releases the pixel buffers of every level."""
+        for image in self.levels:
+            image.close()
+        self.levels = []
+
+
+class MapCache:
+    """
+    Least-recently-used cache of decoded map pyramids bounded by a byte budget.
+    Entries are keyed by map name and remember the source file's modification
+    time, so a replaced map file is decoded again instead of served stale.
+    Evicted pyramids are closed to hand their pixel buffers back right away.
+    """
+    def __init__(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self._entries = OrderedDict() # map_name -> (mtime, MapPyramid)
+        self.used_bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, map_name, mtime):
+        entry = self._entries.get(map_name)
+        if entry is None:
+            return None
+        if entry[0] != mtime:
+            self._remove(map_name)
+            return None
+        self._entries.move_to_end(map_name)
+        return entry[1]
+
+    def put(self, map_name, mtime, pyramid):
+        if map_name in self._entries:
+            self._remove(map_name)
+        self._entries[map_name] = (mtime, pyramid)
+        self.used_bytes += pyramid.nbytes
+        self._evict()
+
+    def set_budget(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self._evict()
+
+    def clear(self):
+        for map_name in list(self._entries):
+            self._remove(map_name)
+
+    def _evict(self):
+        # The most recently used map is the one on screen, it is never evicted
+        while self.used_bytes > self.budget_bytes and len(self._entries) > 1:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, map_name):
+        _, pyramid = self._entries.pop(map_name)
+        self.used_bytes -= pyramid.nbytes
+        pyramid.close()
+
+
+def get_preview_path(map_path):
+    """Returns the path of the cached preview image for a map file."""
+    maps_dir, map_name = os.path.split(map_path)
+    return os.path.join(maps_dir, PREVIEW_DIR_NAME, f"{map_name}.preview.png")
+
+
+def _load_cached_preview(map_path):
+    """Loads the cached preview if it exists and is newer than the map file."""
+    preview_path = get_preview_path(map_path)
+    try:
+        if os.path.getmtime(preview_path) < os.path.getmtime(map_path):
+            return None
+        with Image.open(preview_path) as preview:
+            preview.load()
+            return preview.copy()
+    except OSError:
+        return None
+
+
+def _save_cached_preview(map_path, preview):
+    preview_path = get_preview_path(map_path)
+    try:
+        os.makedirs(os.path.dirname(preview_path), exist_ok=True)
+        preview.save(preview_path)
+    except OSError:
+        pass  # A missing preview cache only costs a slower first paint next time
+
+
+def _make_preview(image):
+    preview = image
+    while max(preview.size) > PREVIEW_MAX_EDGE:
+        preview = preview.reduce(2)
+    return preview if preview is not image else image.copy()
+
+
+def _build_pyramid(image):
+    levels = [image]
+    while max(levels[-1].size) // 2 >= PYRAMID_MIN_EDGE:
+        levels.append(levels[-1].reduce(2))
+    return MapPyramid(levels)
+
+
+def _decode_map(map_path):
+    """Opens the map and forces a full decode into a resample-friendly mode."""
+    with Image.open(map_path) as image:
+        image.load()
+        if image.mode not in ("RGB", "RGBA"):
+            return image.convert("RGBA" if "transparency" in image.info else "RGB")
+        return image.copy()
+
+
+def map_loader_thread(task_queue, result_queue, app):
+    """
+    Background thread that decodes map images so the Tk thread never blocks.
+    For each task it posts a low-resolution 'preview' result as early as
+    possible, followed by a 'loaded' result carrying the full MapPyramid.
+    Superseded tasks (the user picked another map meanwhile) are skipped.
+    """
+    while True:
+        task = task_queue.get(block=True)
+        if task is None:  # Sentinel value to exit the thread
+            break
+
+        # Only the most recent request matters, drop anything queued before it
+        while True:
+            try:
+                newer_task = task_queue.get_nowait()
+            except queue.Empty:
+                break
+            task_queue.task_done()
+            if newer_task is None:
+                task_queue.task_done()
+                return
+            task = newer_task
+
+        token, map_name, map_path = task['token'], task['map_name'], task['map_path']
+        try:
+            preview = _load_cached_preview(map_path)
+            if preview is not None:
+                _post(result_queue, app, 'preview', token, map_name, preview)
+
+            image = _decode_map(map_path)
+            if preview is None:
+                preview = _make_preview(image)
+                _post(result_queue, app, 'preview', token, map_name, preview)
+                _save_cached_preview(map_path, preview)
+
+            _post(result_queue, app, 'loaded', token, map_name, _build_pyramid(image), mtime=task['mtime'])
+            try:
+                # The file was just read, so hashing it now is cheap; the settings tab shows the hash
+                app.config_manager.get_map_hash(map_name)
+            except OSError:
+                pass
+        except Exception as e:
+            traceback.print_exc()
+            _post(result_queue, app, 'error', token, map_name, e, map_path=map_path)
+        finally:
+            task_queue.task_done()
+
+
+def _post(result_queue, app, kind, token, map_name, payload, **extra):
+    result = {'kind': kind, 'token': token, 'map_name': map_name, 'payload': payload}
+    result.update(extra)
+    result_queue.put(result)
+    app.event_generate("<<MapLoaded>>")
@@ -1,17 +1,45 @@
+import queue
 import tkinter as tk
-from tkinter import ttk
-import json
-import os
+from bisect import bisect_left
+from tkinter import ttk, messagebox
+from log_store import (
+    LazyLogEntries,
+    create_log_store,
+    iter_undecoded,
+    log_entry_hash,
+    log_entry_target,
+    normalize_log_entry,
+    search_entries,
+)
+from log_stats import LogStats
+from spatial_index import ENGAGED_TARGET_RADIUS
+from ui.virtual_tree import VirtualTreeview
+from ui.log_stats_dialog import LogStatsDialog
 
 class MissionLog:
     def __init__(self, parent_frame, app, config_manager):
         self.app = app
         self.config_manager = config_manager
         self.log_data = []
+        # Map targets of the log ({"name", "coords"}), kept up to date incrementally,
+        # and the log_data index each one belongs to (ascending)
         self.logged_target_coords = []
+        self.logged_target_indices = []
+        # Column copy of log_data with running aggregates, updated with every change
+        self.stats = LogStats()
         self.log_file = self.config_manager.log_file_path
+        self.store = create_log_store(self.config_manager)
+        self.store.on_error = self._store_write_failed
+        self.store_errors = queue.SimpleQueue() # failed background writes, shown by on_store_write_failed
+        self.app.bind("<<LogSaveFailed>>", self.on_store_write_failed)
+        # True while log_data differs from disk in a way the journal cannot express
+        # (cleared without saving, or replaced by a loaded file); the next write saves a full snapshot
+        self.store_out_of_sync = False
+        self._filter_after_id = None
+        self.merge_index = None # content hash -> log_data index while a merge is running
+        self.visible_indices = [] # log_data indices of the rows passing the filter, in display order
         self.create_log_widgets(parent_frame)
-        self.load_log()
+        # load_log is left to the app, which calls it once the window is up
 
     def create_log_widgets(self, parent_frame):
         log_frame = ttk.LabelFrame(parent_frame, text="Fire Mission Log")
@@ -32,13 +60,24 @@ class MissionLog:
         # Add Save and Load buttons to the right
         ttk.Button(action_frame, text="另存为...", command=self.app.save_log_as).pack(side="right", padx=5)
         ttk.Button(action_frame, text="加载日志文件", command=self.app.load_log_from_file).pack(side="right", padx=5)
+        ttk.Button(action_frame, text="合并日志...", command=self.app.merge_logs_from_files).pack(side="right", padx=5)
+        ttk.Button(action_frame, text="统计...", command=self.show_stats).pack(side="right", padx=5)
 
-        # --- Log Display Frame ---
-        tree_frame = ttk.Frame(log_frame)
-        tree_frame.pack(pady=5, fill="both", expand=True)
+        # --- Filter Frame ---
+        filter_frame = ttk.Frame(log_frame)
+        filter_frame.pack(pady=(0, 5), fill="x")
+        ttk.Label(filter_frame, text="筛选 (名称/前观ID/弹药/网格):").pack(side="left", padx=(0, 5))
+        self.filter_var = tk.StringVar()
+        self.filter_var.trace_add("write", self.on_filter_changed)
+        ttk.Entry(filter_frame, textvariable=self.filter_var, width=30).pack(side="left", padx=5)
+        ttk.Button(filter_frame, text="清除", command=lambda: self.filter_var.set("")).pack(side="left", padx=5)
 
+        # --- Log Display Frame ---
+        # Only the rows in view are materialized, so very large logs stay responsive
         columns = ("name", "target_grid", "ammo", "azimuth", "dist", "mortar_callsign", "fo_id")
-        self.log_tree = ttk.Treeview(tree_frame, columns=columns, show="headings")
+        self.log_view = VirtualTreeview(log_frame, columns, self._get_tree_row, show="headings", selectmode="browse")
+        self.log_view.pack(pady=5, fill="both", expand=True)
+        self.log_tree = self.log_view.tree
 
         self.log_tree.heading("name", text="目标名称")
         self.log_tree.heading("target_grid", text="目标网格")
@@ -56,145 +95,326 @@ class MissionLog:
         self.log_tree.column("mortar_callsign", width=120)
         self.log_tree.column("fo_id", width=120)
 
-        self.log_tree.pack(side="left", fill="both", expand=True)
-        self.scrollbar = ttk.Scrollbar(tree_frame, orient="vertical", command=self.log_tree.yview)
-        self.log_tree.configure(yscroll=self.scrollbar.set)
-        self.scrollbar.pack(side="right", fill="y")
-
     def log_mission(self):
         # This will now call a method on the main app to get the required data
         mission_data = self.app.get_current_mission_data_for_log()
         if mission_data:
+            nearby = self.find_engaged_target(normalize_log_entry(mission_data))
+            if nearby and not messagebox.askyesno("目标已记录", f"该目标距已记录目标 '{nearby[2]['name']}' 仅 {nearby[0]:.0f} 米。仍要记录吗？"):
+                return
             self.log_data.append(mission_data)
-            self.update_log_tree()
-            self.save_log()
+            self._entries_appended(1)
+            self._persist(lambda: self.store.append(mission_data))
 
     def add_trp_batch_log(self, trp_results):
         """Adds a batch of TRP calculation results to the log."""
         # Each item in trp_results is a dictionary containing TRP details and calculation status
-        for result in trp_results:
-            self.log_data.append({"type": "TRP_BATCH_RESULT", "data": result})
-        self.update_log_tree()
-        self.save_log()
+        entries = [{"type": "TRP_BATCH_RESULT", "data": result} for result in trp_results]
+        self.log_data.extend(entries)
+        self._entries_appended(len(entries))
+        self._persist(lambda: self.store.append_many(entries))
 
     def log_mission_data_directly(self, mission_data):
         """Logs a pre-formatted mission data dictionary directly to the log."""
-        self.log_data.append(mission_data)
-        self.update_log_tree()
-        self.save_log()
+        self.log_missions_directly([mission_data])
+
+    def log_missions_directly(self, missions):
+        """Logs several pre-formatted mission data dictionaries with a single tree refresh and journal write."""
+        if not missions:
+            return
+        self.log_data.extend(missions)
+        self._entries_appended(len(missions))
+        self._persist(lambda: self.store.append_many(missions))
 
     def load_selected_mission(self):
-        selected_item = self.log_tree.selection()
+        selected_item = self.log_view.selection()
         if not selected_item: return
         
-        selected_index = self.log_tree.index(selected_item[0])
+        selected_index = int(selected_item[0]) # Item ids are log_data indices
         mission_data = self.log_data[selected_index]
         self.app.load_mission_data_from_log(mission_data)
 
     def delete_selected_mission(self):
-        selected_item = self.log_tree.selection()
+        selected_item = self.log_view.selection()
         if not selected_item: return
 
-        selected_index = self.log_tree.index(selected_item[0])
+        selected_index = int(selected_item[0])
         del self.log_data[selected_index]
+        self.stats.delete(selected_index)
+        self._remove_logged_target(selected_index)
+        if self.merge_index is not None:
+            # Later batches of a running merge must still find the entries after it
+            self.merge_index = {entry_hash: index - (index > selected_index)
+                                for entry_hash, index in self.merge_index.items() if index != selected_index}
         self.update_log_tree()
-        self.save_log()
+        self._persist(lambda: self.store.delete(selected_index))
 
     def clear_log(self, save_to_disk=True):
         """Clears all entries from the log.
         If save_to_disk is False, the log file is not immediately updated."""
         self.log_data = []
+        if self.merge_index is not None:
+            self.merge_index = {}
+        self._rebuild_logged_targets()
+        self.stats.rebuild(self.log_data)
         self.update_log_tree()
         if save_to_disk:
-            self.save_log()
+            self._persist(self.store.clear)
+        else:
+            self.store_out_of_sync = True
+
+    def show_stats(self):
+        LogStatsDialog(self.app, self.stats, self.app.is_dark_mode)
 
     def get_log_data(self):
+        if isinstance(self.log_data, LazyLogEntries):
+            return list(self.log_data) # Decoded, so that json.dump sees entries
         return self.log_data
 
     def load_log_data(self, data):
         self.log_data = data
+        self.store_out_of_sync = True
+        self._rebuild_logged_targets()
+        self.stats.rebuild(self.log_data)
         self.update_log_tree()
 
+    def append_imported_entries(self, entries):
+        """Adds a batch of entries from a log file being imported, see load_log_data."""
+        self.log_data.extend(entries)
+        self._entries_appended(len(entries))
+
+    def begin_merge(self):
+        """Indexes the current entries by content hash for merge_entries."""
+        self.merge_index = {}
+        for index, entry in enumerate(self.log_data):
+            self.merge_index.setdefault(log_entry_hash(entry), index)
+
+    def merge_entries(self, entries):
+        """
+        Merges entries from another log. An entry whose content hash is not in
+        the log yet is appended, an entry with a known hash replaces the
+        logged one only if its timestamp is newer. Returns (added, duplicates,
+        replaced), which add up to len(entries): a row matching an entry added
+        earlier in the merge counts as a duplicate, even if it is newer and
+        takes that entry's place.
+        """
+        new_entries = []
+        replaced = {} # log_data index -> newer entry
+        duplicates = 0
+        replaced_rows = 0
+        for entry in entries:
+            entry_hash = log_entry_hash(entry)
+            index = self.merge_index.get(entry_hash)
+            if index is None:
+                self.merge_index[entry_hash] = len(self.log_data) + len(new_entries)
+                new_entries.append(entry)
+                continue
+            if index < len(self.log_data):
+                existing = replaced.get(index, self.log_data[index])
+            else:
+                existing = new_entries[index - len(self.log_data)]
+            if (entry.get("timestamp") or "") > (existing.get("timestamp") or ""):
+                if index < len(self.log_data):
+                    replaced[index] = entry
+                    replaced_rows += 1
+                    continue
+                new_entries[index - len(self.log_data)] = entry
+            duplicates += 1
+
+        for index, entry in replaced.items():
+            self.log_data[index] = entry
+            self.stats.replace(index, entry)
+        if replaced:
+            self._rebuild_logged_targets()
+            self.update_log_tree()
+        self.log_data.extend(new_entries)
+        self._entries_appended(len(new_entries))
+
+        def write_journal():
+            for index, entry in replaced.items():
+                self.store.replace(index, entry)
+            self.store.append_many(new_entries)
+        if new_entries or replaced:
+            self._persist(write_journal)
+        return len(new_entries), duplicates, replaced_rows
+
+    def end_merge(self):
+        self.merge_index = None
+
     def save_log(self):
-        with open(self.log_file, "w") as f:
-            json.dump(self.log_data, f, indent=4)
+        """Queues the whole log as a fresh snapshot and starts an empty journal."""
+        self.store.replace_all(self.log_data)
+        self.store_out_of_sync = False
 
     def load_log(self):
-        if not os.path.exists(self.log_file):
-            # Create the file if it does not exist
-            with open(self.log_file, "w") as f:
-                json.dump([], f)
-        
+        self.log_data = self.store.load()
+        self._rebuild_logged_targets()
+        # The statistics are computed when first shown, not on every launch
+        self.stats.defer(self.log_data)
+        self.update_log_tree()
+
+    def switch_store(self):
+        """Moves the log into the store selected by the 'log_backend' setting, replacing what that store held."""
+        entries = list(self.log_data) # Decodes rows still in the old store
+        store = create_log_store(self.config_manager)
         try:
-            with open(self.log_file, "r") as f:
-                self.log_data = json.load(f)
-        except (json.JSONDecodeError, TypeError):
-            self.log_data = []
+            store.load()
+            store.replace_all(entries)
+        except Exception:
+            store.close()
+            raise
+        store.on_error = self._store_write_failed
+        self.store.close()
+        self.store = store
+        self.store_out_of_sync = False
+        self.log_data = entries
+        self.stats.defer(self.log_data)
+
+    def close(self):
+        self.store.close()
+
+    def _persist(self, write_journal):
+        """Records a change that has already been applied to log_data."""
+        if self.store_out_of_sync or self.store.needs_full_save:
+            self.save_log()
+            return
+        write_journal()
+        if self.store.needs_compaction():
+            self.store.compact(self.log_data)
+
+    def _store_write_failed(self, error):
+        # Runs on the write-behind thread
+        self.store_errors.put(error)
+        self.app.event_generate("<<LogSaveFailed>>")
+
+    def on_store_write_failed(self, event=None):
+        errors = []
+        while True:
+            try:
+                errors.append(self.store_errors.get_nowait())
+            except queue.Empty:
+                break
+        if not errors:
+            return
+        for error in errors:
+            self.app.dev_log.write_log(error)
+        messagebox.showerror("错误", f"保存任务日志失败: {errors[-1]}\n\n"
+                             "已记录的任务仍保留在程序中，下次记录或修改任务时会重新尝试保存。")
+
+    def on_filter_changed(self, *args):
+        # Debounce typing so the query runs once the user pauses
+        if self._filter_after_id is not None:
+            self.app.after_cancel(self._filter_after_id)
+        self._filter_after_id = self.app.after(250, self._apply_filter)
+
+    def _apply_filter(self):
+        self._filter_after_id = None
         self.update_log_tree()
 
+    def get_visible_indices(self):
+        """Returns the log_data indices that pass the current filter."""
+        query = self.filter_var.get().strip()
+        if not query:
+            return range(len(self.log_data))
+        if self.store_out_of_sync:
+            # The store does not mirror log_data right now, so it cannot answer the query
+            return search_entries(query, self.log_data)
+        return self.store.search(query, self.log_data)
+
     def update_log_tree(self):
-        """
-        Updates the mission log Treeview.
-        This version includes optimizations to prevent rendering artifacts during updates.
-        """
-        # Detach scrollbar to prevent visual glitches during update
-        if hasattr(self, 'scrollbar'):
-            self.log_tree.configure(yscrollcommand=None)
-
-        # More efficient way to clear the tree
-        self.log_tree.delete(*self.log_tree.get_children())
-        self.logged_target_coords.clear()
-
-        for entry in self.log_data:
-            if entry.get("type") == "TRP_BATCH_RESULT":
-                trp_result = entry.get("data", {})
-                target_name = trp_result.get("TRP Name", "")
-                status = trp_result.get("Status", "")
-                target_grid = trp_result.get("Target Grid", "")
-                
-                # For TRP batch results, we'll display a simplified view
-                display_values = (
-                    target_name,
-                    target_grid,
-                    trp_result.get("Ammo", ""), # This might not be present for out-of-range
-                    trp_result.get("Mortar-Target Azimuth", ""),
-                    trp_result.get("Mortar-Target Distance", ""),
-                    "", # No specific mortar callsign for batch TRP
-                    status # Display status here
-                )
-                self.log_tree.insert("", "end", values=display_values, tags=('trp_batch',))
-            else:
-                # Existing mission log entry
-                target_name = entry.get("target_name", "")
-                grid_str = entry.get("calculated_target_grid", "")
-                
-                # Attempt to parse the grid to store coordinates for map plotting
-                try:
-                    from calculations import parse_grid # Local import to avoid circular dependency
-                    easting, northing = parse_grid(grid_str)
-                    self.logged_target_coords.append({"name": target_name, "coords": (easting, northing)})
-                except (ValueError, TypeError):
-                    pass # Ignore missions with invalid grids
-
-                # Correctly extract the callsign from the nested data structure
-                mortars = entry.get("mortars", [])
-                callsign = mortars[0].get("callsign", "") if mortars else ""
-
-                display_values = (
-                    target_name,
-                    grid_str,
-                    entry.get("ammo", ""),
-                    entry.get("mortar_to_target_azimuth", ""),
-                    entry.get("mortar_to_target_dist", ""),
-                    callsign,
-                    entry.get("fo_id", "")
-                )
-                self.log_tree.insert("", "end", values=display_values)
-        
-        # Apply tag styling for TRP batch results
-        self.log_tree.tag_configure('trp_batch', background='#e0e0e0' if not self.app.is_dark_mode else '#3a3a3a')
+        """Rebuilds the filtered rows shown in the mission log."""
+        self.visible_indices = list(self.get_visible_indices())
+        self.log_view.refresh(len(self.visible_indices))
+
+    def apply_theme(self):
+        # Tag styling for TRP batch results
+        self.log_tree.tag_configure('trp_batch', background=self.app.theme_manager.colors["log_trp_batch_bg"])
+
+    def _entries_appended(self, count):
+        """Shows the last `count` entries of log_data without rebuilding the view."""
+        first = len(self.log_data) - count
+        new_entries = self.log_data[first:]
+        for index, entry in enumerate(new_entries, first):
+            self._add_logged_target(index, entry)
+            self.stats.append(entry)
+            if self.merge_index is not None:
+                # Entries logged while a merge runs are matched by its later batches too
+                self.merge_index.setdefault(log_entry_hash(entry), index)
+        query = self.filter_var.get().strip()
+        if query:
+            new_indices = [first + i for i in search_entries(query, new_entries)]
+        else:
+            new_indices = list(range(first, len(self.log_data)))
+        self.visible_indices.extend(new_indices)
+        self.log_view.rows_appended(len(new_indices))
+
+    def find_engaged_target(self, entry):
+        """Returns (distance, key, target) of the nearest logged target within ENGAGED_TARGET_RADIUS of an entry, or None."""
+        if entry["target_easting"] is None:
+            return None
+        for found in self.app.target_index.within(entry["target_easting"], entry["target_northing"], ENGAGED_TARGET_RADIUS):
+            if found[2].get("source") == "log":
+                return found
+        return None
+
+    def _rebuild_logged_targets(self):
+        for target in self.logged_target_coords:
+            self.app.target_index.remove(id(target))
+        self.logged_target_coords = []
+        self.logged_target_indices = []
+        # Rows not decoded yet carry their target position, see LazyLogEntries
+        for index, entry in enumerate(iter_undecoded(self.log_data)):
+            self._add_logged_target(index, entry)
+
+    def _add_logged_target(self, index, entry):
+        # Grids are parsed once per entry, later refreshes reuse the stored numbers
+        found = log_entry_target(entry)
+        if found is None:
+            return # Ignore TRP batch results and missions with invalid grids
+        name, easting, northing = found
+        target = {"name": name, "coords": (easting, northing), "source": "log"}
+        self.logged_target_coords.append(target)
+        self.logged_target_indices.append(index)
+        self.app.target_index.insert(id(target), *target["coords"], target)
+
+    def _remove_logged_target(self, index):
+        """Drops the target of the deleted entry `index` and shifts the indices after it."""
+        position = bisect_left(self.logged_target_indices, index)
+        if position < len(self.logged_target_indices) and self.logged_target_indices[position] == index:
+            self.app.target_index.remove(id(self.logged_target_coords[position]))
+            del self.logged_target_coords[position]
+            del self.logged_target_indices[position]
+        for i in range(position, len(self.logged_target_indices)):
+            self.logged_target_indices[i] -= 1
+
+    def _get_tree_row(self, position):
+        """Returns (iid, values, tags) for the row at `position` of the filtered log."""
+        index = self.visible_indices[position]
+        entry = self.log_data[index]
+        if entry.get("type") == "TRP_BATCH_RESULT":
+            trp_result = entry.get("data", {})
+            # For TRP batch results, we'll display a simplified view
+            display_values = (
+                trp_result.get("TRP Name", ""),
+                trp_result.get("Target Grid", ""),
+                trp_result.get("Ammo", ""), # This might not be present for out-of-range
+                trp_result.get("Mortar-Target Azimuth", ""),
+                trp_result.get("Mortar-Target Distance", ""),
+                "", # No specific mortar callsign for batch TRP
+                trp_result.get("Status", "") # Display status here
+            )
+            return str(index), display_values, ('trp_batch',)
 
-        # Re-attach scrollbar and force UI update
-        if hasattr(self, 'scrollbar'):
-            self.log_tree.configure(yscrollcommand=self.scrollbar.set)
-        self.app.update_idletasks()
\ No newline at end of file
+        # Correctly extract the callsign from the nested data structure
+        mortars = entry.get("mortars", [])
+        callsign = mortars[0].get("callsign", "") if mortars else ""
+        display_values = (
+            entry.get("target_name", ""),
+            entry.get("calculated_target_grid", ""),
+            entry.get("ammo", ""),
+            entry.get("mortar_to_target_azimuth", ""),
+            entry.get("mortar_to_target_dist", ""),
+            callsign,
+            entry.get("fo_id", "")
+        )
+        return str(index), display_values, ()
@@ -0,0 +1,224 @@
+import atexit
+import json
+import os
+import threading
+import time
+import traceback
+
+# Saves of the same file within this window are collapsed into one write
+COALESCE_DELAY_S = 0.2
+# How often the session autosave checks for changes
+AUTOSAVE_INTERVAL_MS = 5000
+
+
+def write_json_atomic(path, data, indent=4):
+    """Writes `data` as JSON to a temp file next to `path` and renames it into place."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=indent)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class WriteBehindWriter:
+    """
+    Background thread that takes JSON file writes off the Tk thread.
+
+    `save_json` only records the latest data for a path and returns at once.
+    The thread waits COALESCE_DELAY_S after the first pending save, so a burst
+    of saves to the same file ends up as a single write of the newest data.
+    Every write goes through write_json_atomic, so a crash leaves either the
+    old or the new file on disk, never a truncated one.
+
+    Callers must pass data they no longer mutate (a copy), since it is
+    serialized later on the writer thread.
+    """
+    def __init__(self, delay=COALESCE_DELAY_S):
+        self.delay = delay
+        self._condition = threading.Condition()
+        self._pending = {} # path -> (data, indent, on_written, on_error)
+        self._writing = False
+        self._flush_requested = False
+        self._closed = False
+        self._thread = None
+
+    def save_json(self, path, data, indent=4, on_written=None, on_error=None):
+        """
+        Queues `data` to be written to `path`, replacing any save still pending
+        for it. `on_written` is called on the writer thread once it is on disk;
+        if the write fails, `on_error` is called there with the exception
+        instead (without one the traceback is printed).
+        """
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("WriteBehindWriter is closed")
+            self._pending[path] = (data, indent, on_written, on_error)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._condition.notify_all()
+
+    def flush(self):
+        """Blocks until every pending save has been written."""
+        with self._condition:
+            self._flush_requested = True
+            self._condition.notify_all()
+            while self._pending or self._writing:
+                self._condition.wait()
+            self._flush_requested = False
+
+    def close(self):
+        """Flushes pending saves and stops the writer thread."""
+        self.flush()
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if not self._pending:
+                    return
+                # Give further saves a moment to coalesce unless someone is waiting on a flush
+                if not self._flush_requested:
+                    self._condition.wait(timeout=self.delay)
+                batch, self._pending = self._pending, {}
+                self._writing = True
+
+            for path, (data, indent, on_written, on_error) in batch.items():
+                try:
+                    try:
+                        write_json_atomic(path, data, indent)
+                    except Exception as e:
+                        if on_error is None:
+                            raise
+                        on_error(e)
+                    else:
+                        if on_written is not None:
+                            on_written()
+                except Exception:
+                    traceback.print_exc()
+
+            with self._condition:
+                self._writing = False
+                self._condition.notify_all()
+
+
+def stat_mtime(path):
+    """Returns the modification time of `path` in ns, or None if it cannot be read."""
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+class WatchedJsonFile:
+    """
+    A JSON file that other processes may change, such as a config file in a
+    folder shared by several machines.
+
+    Saves go through write_behind. `changed` tells with a single stat whether
+    the file was modified by someone else since this process last loaded or
+    wrote it; while one of our own saves is still pending it reports no
+    change, so a reload never replaces newer in-memory data with older.
+    """
+    def __init__(self, path, writer=None):
+        self.path = path
+        self.writer = writer or write_behind
+        self._mtime = None # mtime of the version on disk we know about
+        self._saved_generation = 0
+        self._written_generation = 0
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def load(self):
+        """Reads the file. Raises OSError or ValueError if it cannot be read or parsed."""
+        mtime = stat_mtime(self.path)
+        with open(self.path, "r") as f:
+            data = json.load(f)
+        self._mtime = mtime
+        return data
+
+    def save(self, data, indent=4):
+        """Queues `data` (not mutated afterwards) to be written."""
+        self._saved_generation += 1
+        generation = self._saved_generation
+
+        def written():
+            # Runs on the writer thread; only the newest of coalesced saves reports back
+            self._mtime = stat_mtime(self.path)
+            self._written_generation = generation
+
+        def failed(error):
+            # The file on disk is unchanged, so keep comparing against the version we know
+            self._written_generation = generation
+            traceback.print_exception(type(error), error, error.__traceback__)
+        self.writer.save_json(self.path, data, indent=indent, on_written=written, on_error=failed)
+
+    def changed(self):
+        if self._written_generation != self._saved_generation:
+            return False
+        mtime = stat_mtime(self.path)
+        return mtime is not None and mtime != self._mtime
+
+
+class SessionAutosave:
+    """
+    Periodic snapshot of the session in one compact JSON file.
+
+    The file is made of named sections, each given as (key, build): `key()`
+    is a cheap change marker compared with ==, and `build()` produces the
+    section's JSON data. `save` only rebuilds the sections whose key changed
+    and skips the write entirely when none did; the write itself goes
+    through write_behind, so the Tk thread never waits on the disk. Built
+    sections are kept and reused, so they must not be mutated afterwards.
+    """
+    def __init__(self, path, sections, writer=None):
+        self.path = path
+        self.sections = sections
+        self.writer = writer or write_behind
+        self._keys = {}
+        self._data = {}
+
+    def save(self):
+        """Writes the changed sections. Returns True if a write was queued."""
+        changed = False
+        for name, (key, build) in self.sections.items():
+            current = key()
+            if name in self._keys and self._keys[name] == current:
+                continue
+            self._data[name] = build()
+            self._keys[name] = current
+            changed = True
+        if changed:
+            self.writer.save_json(self.path, dict(self._data, saved_at=time.time()), indent=None)
+        return changed
+
+    def load(self):
+        """Returns the data of an existing autosave file, or None if there is no usable one."""
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return data if isinstance(data, dict) else None
+
+    def discard(self):
+        """Deletes the autosave file once pending writes are done, e.g. after a clean exit."""
+        self.writer.flush()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+# Shared writer for all application files, flushed by the app on exit
+write_behind = WriteBehindWriter()
+# Also flush when the interpreter exits without going through the app's on_closing
+atexit.register(write_behind.flush)
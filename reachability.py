@@ -0,0 +1,115 @@
+from functools import lru_cache
+
+import numpy as np
+
+from ballistics import BALLISTIC_DATA
+
+# Edge length (m) of one heatmap cell
+DEFAULT_CELL_SIZE = 10
+
+
+@lru_cache(maxsize=None)
+def compile_ballistic_table(faction, ammo):
+    """
+    Converts the nested BALLISTIC_DATA tables of one ammo type into NumPy
+    arrays that can be interpolated in a single vectorized call.
+    Returns a tuple of (charge, ranges, elevs, tofs) sorted by charge.
+    """
+    compiled = []
+    for charge, charge_data in sorted(BALLISTIC_DATA.get(faction, {}).get(ammo, {}).items()):
+        ranges = sorted(charge_data['ranges'])
+        compiled.append((
+            charge,
+            np.array(ranges, dtype=np.float32),
+            np.array([charge_data['ranges'][r]['elev'] for r in ranges], dtype=np.float32),
+            np.array([charge_data['ranges'][r]['tof'] for r in ranges], dtype=np.float32),
+        ))
+    return tuple(compiled)
+
+
+class ReachabilityRaster:
+    """
+    Per-gun reachability of every cell in a rectangular block of the map.
+    Row 0 is the northern edge, so the arrays map directly onto an image.
+    For each gun, `charges` holds a bitmask of the charges that reach a cell,
+    `tof` the fastest time of flight (inf if unreachable) and `elev` the
+    elevation of that fastest charge, assuming no height difference.
+    """
+    def __init__(self, min_e, max_n, cell_size, charges, tof, elev):
+        self.min_e = min_e
+        self.max_n = max_n
+        self.cell_size = cell_size
+        self.charges = charges # (guns, rows, cols) uint16
+        self.tof = tof         # (guns, rows, cols) float32
+        self.elev = elev       # (guns, rows, cols) float32
+
+    @property
+    def shape(self):
+        return self.tof.shape[1:]
+
+    @property
+    def fastest_tof(self):
+        """Fastest time of flight over all guns per cell (inf where no gun reaches)."""
+        return self.tof.min(axis=0)
+
+    def sample(self, e, n):
+        """
+        Returns a list with one (charge_list, tof, elev) tuple per gun for the
+        cell containing (e, n), or None if the point lies outside the raster.
+        """
+        col = int((e - self.min_e) // self.cell_size)
+        row = int((self.max_n - n) // self.cell_size)
+        rows, cols = self.shape
+        if not (0 <= row < rows and 0 <= col < cols):
+            return None
+        results = []
+        for gun in range(self.tof.shape[0]):
+            mask = int(self.charges[gun, row, col])
+            charges = [bit for bit in range(16) if mask & (1 << bit)]
+            results.append((charges, float(self.tof[gun, row, col]), float(self.elev[gun, row, col])))
+        return results
+
+
+def compute_reachability(gun_coords, faction, ammo, map_x_max, map_y_max, cell_size=DEFAULT_CELL_SIZE):
+    """
+    Computes a ReachabilityRaster for the given gun positions over the part
+    of the map any gun can reach. Returns None if nothing can be reached.
+    """
+    table = compile_ballistic_table(faction, ammo)
+    if not gun_coords or not table:
+        return None
+
+    max_range = max(float(ranges[-1]) for _, ranges, _, _ in table)
+    min_e = max(0.0, min(e for e, _ in gun_coords) - max_range)
+    max_e = min(float(map_x_max), max(e for e, _ in gun_coords) + max_range)
+    min_n = max(0.0, min(n for _, n in gun_coords) - max_range)
+    max_n = min(float(map_y_max), max(n for _, n in gun_coords) + max_range)
+    if max_e <= min_e or max_n <= min_n:
+        return None
+
+    # Snap the block to the cell grid so cached rasters line up with map coordinates
+    min_e = (min_e // cell_size) * cell_size
+    max_n = -((-max_n) // cell_size) * cell_size
+    cols = int(-((min_e - max_e) // cell_size))
+    rows = int(-((min_n - max_n) // cell_size))
+
+    cell_e = (min_e + (np.arange(cols, dtype=np.float32) + 0.5) * cell_size)[np.newaxis, :]
+    cell_n = (max_n - (np.arange(rows, dtype=np.float32) + 0.5) * cell_size)[:, np.newaxis]
+
+    charges = np.zeros((len(gun_coords), rows, cols), dtype=np.uint16)
+    tof = np.full((len(gun_coords), rows, cols), np.inf, dtype=np.float32)
+    elev = np.zeros((len(gun_coords), rows, cols), dtype=np.float32)
+
+    for gun, (gun_e, gun_n) in enumerate(gun_coords):
+        distance = np.hypot(cell_e - np.float32(gun_e), cell_n - np.float32(gun_n))
+        for charge, ranges, elevs, tofs in table:
+            in_range = (distance >= ranges[0]) & (distance <= ranges[-1])
+            if not in_range.any():
+                continue
+            charges[gun][in_range] |= np.uint16(1 << charge)
+            charge_tof = np.where(in_range, np.interp(distance, ranges, tofs), np.inf)
+            faster = charge_tof < tof[gun]
+            tof[gun][faster] = charge_tof[faster]
+            elev[gun][faster] = np.interp(distance[faster], ranges, elevs)
+
+    return ReachabilityRaster(min_e, max_n, cell_size, charges, tof, elev)
@@ -0,0 +1,67 @@
+import math
+
+# Edge length (m) of one bucket of the known target index
+TARGET_INDEX_CELL_SIZE = 250
+# Map clicks snap to a known target within this many screen pixels
+SNAP_RADIUS_PX = 15
+# Logging a target this close (m) to an already logged one asks for confirmation
+ENGAGED_TARGET_RADIUS = 50
+
+
+class GridIndex:
+    """
+    Uniform-grid spatial index over map points.
+
+    Points are bucketed into square cells, so inserting and removing a point
+    is O(1) and a radius query only visits the cells the circle overlaps.
+    Each point is stored under a caller-chosen hashable key together with an
+    arbitrary payload.
+    """
+    def __init__(self, cell_size=TARGET_INDEX_CELL_SIZE):
+        self.cell_size = cell_size
+        self._cells = {}  # (col, row) -> {key: (easting, northing, payload)}
+        self._points = {} # key -> (col, row)
+
+    def __len__(self):
+        return len(self._points)
+
+    def insert(self, key, easting, northing, payload=None):
+        self.remove(key)
+        cell = self._cell(easting, northing)
+        self._cells.setdefault(cell, {})[key] = (easting, northing, payload)
+        self._points[key] = cell
+
+    def remove(self, key):
+        cell = self._points.pop(key, None)
+        if cell is None:
+            return
+        bucket = self._cells[cell]
+        del bucket[key]
+        if not bucket:
+            del self._cells[cell]
+
+    def clear(self):
+        self._cells.clear()
+        self._points.clear()
+
+    def within(self, easting, northing, radius):
+        """Returns (distance, key, payload) for every point within `radius`, nearest first."""
+        min_col, min_row = self._cell(easting - radius, northing - radius)
+        max_col, max_row = self._cell(easting + radius, northing + radius)
+        found = []
+        for col in range(min_col, max_col + 1):
+            for row in range(min_row, max_row + 1):
+                for key, (e, n, payload) in self._cells.get((col, row), {}).items():
+                    distance = math.hypot(e - easting, n - northing)
+                    if distance <= radius:
+                        found.append((distance, key, payload))
+        found.sort(key=lambda item: item[0])
+        return found
+
+    def nearest(self, easting, northing, max_distance):
+        """Returns (distance, key, payload) of the nearest point within `max_distance`, or None."""
+        found = self.within(easting, northing, max_distance)
+        return found[0] if found else None
+
+    def _cell(self, easting, northing):
+        return int(easting // self.cell_size), int(northing // self.cell_size)
@@ -0,0 +1,146 @@
+import cProfile
+import functools
+import io
+import pstats
+import sys
+import time
+
+# Command line flag enabling the profile; "--profile-startup=cprofile" also runs cProfile
+PROFILE_STARTUP_FLAG = "--profile-startup"
+# Imports faster than this (ms, including their own imports) are left out of the report...
+IMPORT_REPORT_MIN_MS = 1.0
+# ...except these packages and modules, which are always listed
+ALWAYS_REPORTED_IMPORTS = ("ballistics", "calculations", "PIL", "ui", "config", "mission_log", "map_loader")
+# Functions listed from the cProfile statistics, by cumulative time
+CPROFILE_TOP_FUNCTIONS = 40
+
+
+class StartupProfile:
+    """
+    Timeline of the application's startup: every module import and every
+    method registered with time_methods, as start offset and wall time
+    from the moment the profile was created, nested by call depth.
+    A disabled profile does nothing, so it can stay wired into main.py.
+    """
+    def __init__(self, enabled=False, use_cprofile=False):
+        self.enabled = enabled
+        self.origin = time.perf_counter()
+        self._events = [] # [start ms, duration ms (None while running), depth, kind, name]
+        self._depth = 0
+        self._import_finder = None
+        self.profiler = None
+        if enabled:
+            self._import_finder = _ImportTimer(self)
+            sys.meta_path.insert(0, self._import_finder)
+            if use_cprofile:
+                self.profiler = cProfile.Profile()
+                self.profiler.enable()
+
+    @classmethod
+    def from_argv(cls, argv):
+        for arg in argv[1:]:
+            if arg == PROFILE_STARTUP_FLAG:
+                return cls(enabled=True)
+            if arg == f"{PROFILE_STARTUP_FLAG}=cprofile":
+                return cls(enabled=True, use_cprofile=True)
+        return cls()
+
+    def begin(self, kind, name):
+        event = [(time.perf_counter() - self.origin) * 1000, None, self._depth, kind, name]
+        self._events.append(event)
+        self._depth += 1
+        return event
+
+    def end(self, event):
+        self._depth -= 1
+        event[1] = (time.perf_counter() - self.origin) * 1000 - event[0]
+
+    def mark(self, name):
+        """Records a point in time, e.g. the first idle moment of the main loop."""
+        if self.enabled:
+            self._events.append([(time.perf_counter() - self.origin) * 1000, 0.0, self._depth, "mark", name])
+
+    def time_methods(self, cls, names):
+        """Replaces the methods `names` of `cls` with versions that record each call."""
+        if not self.enabled:
+            return
+        for name in names:
+            method = getattr(cls, name)
+
+            @functools.wraps(method)
+            def timed(*args, _method=method, _label=f"{cls.__name__}.{name}", **kwargs):
+                event = self.begin("call", _label)
+                try:
+                    return _method(*args, **kwargs)
+                finally:
+                    self.end(event)
+            setattr(cls, name, timed)
+
+    def stop(self):
+        """Stops recording imports and cProfile; the timeline is kept for the report."""
+        if self._import_finder in sys.meta_path:
+            sys.meta_path.remove(self._import_finder)
+        if self.profiler is not None:
+            self.profiler.disable()
+
+    def format_report(self):
+        """Formats the timeline (and the cProfile top list, if it ran) as plain text for the developer log."""
+        frozen = "PyInstaller" if getattr(sys, "frozen", False) else "source"
+        lines = [f"Python {sys.version.split()[0]}, running from {frozen}", ""]
+        lines.append(f"{'start':>9}{'time':>9}  step")
+        for start, duration, depth, kind, name in self._events:
+            if duration is None:
+                lines.append(f"{start:>9.1f}{'running':>9}  {'  ' * depth}{name}")
+            elif kind != "import" or duration >= IMPORT_REPORT_MIN_MS or name.split(".")[0] in ALWAYS_REPORTED_IMPORTS:
+                label = f"import {name}" if kind == "import" else name
+                lines.append(f"{start:>9.1f}{duration:>9.1f}  {'  ' * depth}{label}")
+        lines.append("")
+        lines.append(f"Times in ms; nested steps are included in their parent. Other imports under {IMPORT_REPORT_MIN_MS:.0f} ms are omitted.")
+        if self.profiler is not None:
+            stream = io.StringIO()
+            pstats.Stats(self.profiler, stream=stream).sort_stats("cumulative").print_stats(CPROFILE_TOP_FUNCTIONS)
+            lines.extend(["", "cProfile (cumulative):", stream.getvalue()])
+        return "\n".join(lines)
+
+
+class _ImportTimer:
+    """
+    sys.meta_path entry that times module execution. It finds nothing
+    itself: it asks the finders after it for the spec and wraps the
+    loader's exec_module, which also works for loaders shared between
+    modules, like the one of a PyInstaller build.
+    """
+    def __init__(self, profile):
+        self.profile = profile
+
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path[sys.meta_path.index(self) + 1:]:
+            find_spec = getattr(finder, "find_spec", None)
+            spec = find_spec(fullname, path, target) if find_spec else None
+            if spec is not None:
+                break
+        else:
+            return None
+        loader = spec.loader
+        # Built-in and frozen modules are loaded by their importer class and take no measurable time
+        if loader is not None and not isinstance(loader, type) and hasattr(loader, "exec_module"):
+            self._wrap(loader)
+        return spec
+
+    def _wrap(self, loader):
+        exec_module = loader.exec_module
+        if getattr(exec_module, "_startup_timed", False):
+            return
+        profile = self.profile
+
+        def timed_exec_module(module):
+            event = profile.begin("import", module.__name__)
+            try:
+                exec_module(module)
+            finally:
+                profile.end(event)
+        timed_exec_module._startup_timed = True
+        try:
+            loader.exec_module = timed_exec_module
+        except AttributeError:
+            pass # Loaders with __slots__ stay untimed
@@ -0,0 +1,103 @@
+from collections import deque, namedtuple
+
+# Undo steps kept; the oldest are dropped beyond this
+UNDO_LIMIT = 2000
+# Changes within this many milliseconds of each other form one undo step
+HISTORY_DELAY_MS = 400
+
+# MissionState fields grouped into the subtrees of a snapshot
+SNAPSHOT_GROUPS = (
+    ("mission", ("num_mortars", "fire_mission_type", "targeting_mode", "faction", "ammo", "spotting_charge", "creep_direction", "creep_spread")),
+    ("fo", ("fo_grid", "fo_elev", "fo_id", "fo_azimuth", "fo_dist", "fo_elev_diff")),
+    ("target", ("target_grid", "target_elev")),
+    ("corrections", ("corr_lr", "corr_ad")),
+)
+MORTAR_FIELDS = ("grid", "elev", "callsign", "locked")
+# A TRP's status is a calculation result, not an input, so it is not part of the history
+TRP_FIELDS = ("grid", "elev", "name")
+
+MissionSnapshot = namedtuple("MissionSnapshot", [group for group, _ in SNAPSHOT_GROUPS] + ["mortars", "trps"])
+
+
+def take_snapshot(mission, previous=None):
+    """
+    Returns an immutable MissionSnapshot of a MissionState.
+
+    Every subtree (a field group, the mortar list, each mortar, the TRP list,
+    each TRP) that is unchanged since `previous` is reused from it instead of
+    copied, so consecutive snapshots share everything but the parts that
+    changed and a step of the history costs only a few small tuples.
+    """
+    parts = []
+    for i, (_, names) in enumerate(SNAPSHOT_GROUPS):
+        values = tuple(getattr(mission, name) for name in names)
+        parts.append(_share(values, previous[i] if previous else None))
+    parts.append(_share_items([tuple(getattr(m, name) for name in MORTAR_FIELDS) for m in mission.mortars], previous.mortars if previous else ()))
+    parts.append(_share_items([tuple(getattr(t, name) for name in TRP_FIELDS) for t in mission.trps], previous.trps if previous else ()))
+    snapshot = MissionSnapshot(*parts)
+    if previous is not None and all(a is b for a, b in zip(snapshot, previous)):
+        return previous
+    return snapshot
+
+
+def snapshot_values(snapshot):
+    """Returns the MissionState fields of a snapshot as {name: value}."""
+    values = {}
+    for i, (_, names) in enumerate(SNAPSHOT_GROUPS):
+        values.update(zip(names, snapshot[i]))
+    return values
+
+
+def _share(values, previous):
+    return previous if values == previous else values
+
+
+def _share_items(items, previous):
+    shared = tuple(old if i < len(previous) and (old := previous[i]) == item else item for i, item in enumerate(items))
+    if len(shared) == len(previous) and all(a is b for a, b in zip(shared, previous)):
+        return previous
+    return shared
+
+
+class StateHistory:
+    """
+    Undo/redo stacks of MissionSnapshots around the `current` one.
+    Recording a new snapshot discards the redo stack. The undo stack is
+    bounded by `limit`, the oldest steps falling off first.
+    """
+    def __init__(self, limit=UNDO_LIMIT):
+        self.current = None
+        self._undo = deque(maxlen=limit)
+        self._redo = []
+
+    def record(self, snapshot):
+        """Makes `snapshot` the current state. Returns False if nothing changed."""
+        if snapshot is self.current:
+            return False
+        if self.current is not None:
+            self._undo.append(self.current)
+        self._redo.clear()
+        self.current = snapshot
+        return True
+
+    def can_undo(self):
+        return bool(self._undo)
+
+    def can_redo(self):
+        return bool(self._redo)
+
+    def undo(self):
+        """Steps back and returns the snapshot to restore, or None at the oldest step."""
+        if not self._undo:
+            return None
+        self._redo.append(self.current)
+        self.current = self._undo.pop()
+        return self.current
+
+    def redo(self):
+        """Steps forward and returns the snapshot to restore, or None at the newest step."""
+        if not self._redo:
+            return None
+        self._undo.append(self.current)
+        self.current = self._redo.pop()
+        return self.current
@@ -1,10 +1,55 @@
 import tkinter as tk
+from state_model import MissionState, MortarState, TrpState
+
+
+class TkBinder:
+    """
+    Keeps fields of state_model objects and tkinter variables in sync.
+
+    A write to a bound variable (typing into its widget) is parsed into the
+    field's native type and stored on the model; unparsable input (an empty
+    or half-typed number) stores the field's fallback without touching the
+    text. Assigning a field on the model updates the variable.
+    """
+    def __init__(self):
+        self._from_var = None # (model, name) being stored from its variable
+
+    def bind(self, model, variables, fallbacks=None):
+        """Binds `variables` ({field name: tk.Variable}) to `model`, initializing the fields from the variables."""
+        fallbacks = fallbacks or {}
+        for name, var in variables.items():
+            kind = type(getattr(model, name))
+            args = (model, name, var, kind, fallbacks.get(name, kind()))
+            var.trace_add("write", lambda *trace_args, args=args: self._var_written(*args))
+            self._var_written(*args)
+
+        def model_changed(obj, name, value):
+            var = variables.get(name)
+            if var is not None and self._from_var != (obj, name):
+                var.set(value)
+        model.subscribe(model_changed)
+
+    def _var_written(self, model, name, var, kind, fallback):
+        try:
+            value = kind(var.get())
+        except (ValueError, tk.TclError):
+            value = fallback
+        self._from_var = (model, name)
+        try:
+            setattr(model, name, value)
+        finally:
+            self._from_var = None
+
 
 class StateManager:
     """
     Manages the state of the application using tkinter variables.
     This class centralizes all state variables, decoupling them from the main
     application logic and UI components.
+
+    The calculation inputs are mirrored into `model`, a plain-Python
+    MissionState that calculations and batch jobs read as native values
+    without going through Tcl.
     """
     def __init__(self):
         # UI Variables
@@ -15,10 +60,13 @@ class StateManager:
         self.admin_mode_enabled = tk.BooleanVar(value=False)
         self.admin_target_pin = None
         self.dev_log_enabled = tk.BooleanVar(value=False)
+        self.frame_timing_enabled = tk.BooleanVar(value=False)
         self.faction_var = tk.StringVar(value="NATO")
 
         # Map State
         self.map_image = None
+        self.map_pyramid = None # MapPyramid of the fully decoded map, None while loading
+        self.map_loading = False
         self.map_photo = None
         self.map_view = [0, 0, 4607, 4607]
         self.pan_start_x = 0
@@ -80,39 +128,67 @@ class StateManager:
         # Mission Log State
         self.loaded_target_name = tk.StringVar()
 
+        self.model = MissionState()
+        self._change_listeners = []
+        self.binder = TkBinder()
+        self.binder.bind(self.model, {
+            "num_mortars": self.num_mortars_var,
+            "fire_mission_type": self.fire_mission_type_var,
+            "targeting_mode": self.targeting_mode_var,
+            "faction": self.faction_var,
+            "ammo": self.ammo_type_var,
+            "fo_grid": self.fo_grid_var,
+            "fo_elev": self.fo_elev_var,
+            "fo_id": self.fo_id_var,
+            "fo_azimuth": self.fo_azimuth_var,
+            "fo_dist": self.fo_dist_var,
+            "fo_elev_diff": self.fo_elev_diff_var,
+            "creep_direction": self.creep_direction_var,
+            "creep_spread": self.creep_spread_var,
+            "target_grid": self.trp_grid_var,
+            "target_elev": self.trp_elev_var,
+            "corr_lr": self.corr_lr_var,
+            "corr_ad": self.corr_ad_var,
+            "spotting_charge": self.spotting_charge_var,
+        }, fallbacks={"creep_spread": 1.0})
+
+    def subscribe_all(self, listener):
+        """
+        Subscribes `listener` to the model and all of its mortars and TRPs,
+        present and future. Adding or removing rows calls it with
+        (model, "mortars" or "trps", list).
+        """
+        self._change_listeners.append(listener)
+        for item in [self.model] + self.model.mortars + self.model.trps:
+            item.subscribe(listener)
+
+    def _row_added(self, item, rows_name):
+        for listener in self._change_listeners:
+            item.subscribe(listener)
+        self._rows_changed(rows_name)
+
+    def _rows_changed(self, rows_name):
+        for listener in self._change_listeners:
+            listener(self.model, rows_name, getattr(self.model, rows_name))
+
     def add_mortar(self):
         """Adds a new set of variables for a mortar."""
-        self.mortar_input_vars.append({
+        mortar_vars = {
             "grid": tk.StringVar(value="0000000000"),
             "elev": tk.DoubleVar(value=100),
             "callsign": tk.StringVar(),
             "locked": tk.BooleanVar(value=False)
-        })
-
-    def clear_mortars(self):
-        """Clears all mortar variables."""
-        self.mortar_input_vars.clear()
+        }
+        mortar = MortarState()
+        self.binder.bind(mortar, mortar_vars)
+        self.mortar_input_vars.append(mortar_vars)
+        self.model.mortars.append(mortar)
+        self._row_added(mortar, "mortars")
 
     def get_mortar_vars(self, index):
         """Returns the variables for a specific mortar."""
         return self.mortar_input_vars[index]
 
-    def add_trp(self):
-        """Adds a new set of variables for a TRP."""
-        self.trp_input_vars.append({
-            "grid": tk.StringVar(value="0000000000"),
-            "elev": tk.DoubleVar(value=100),
-            "name": tk.StringVar(value=f"TRP {len(self.trp_input_vars) + 1}")
-        })
-
-    def clear_trps(self):
-        """Clears all TRP variables."""
-        self.trp_input_vars.clear()
-
-    def get_trp_vars(self, index):
-        """Returns the variables for a specific TRP."""
-        return self.trp_input_vars[index]
-
     def reset_inputs(self):
         """Resets all user-configurable input fields to their default state."""
         self.num_mortars_var.set(1)
@@ -133,25 +209,45 @@ class StateManager:
         self.corr_lr_var.set(0)
         self.corr_ad_var.set(0)
         
-        # Reset mortar inputs
-        self.clear_mortars()
-        self.add_mortar() # Add back one default mortar
+        # Reset mortar inputs, keeping the pooled rows bound to them
+        for mortar in self.model.mortars:
+            mortar.reset()
 
         # Reset TRP inputs
         self.clear_trps()
 
     def add_trp(self):
         """Adds a new set of variables for a TRP."""
-        self.trp_input_vars.append({
+        trp_vars = {
             "grid": tk.StringVar(value="0000000000"),
             "elev": tk.DoubleVar(value=100),
             "name": tk.StringVar(value=f"TRP {len(self.trp_input_vars) + 1}"),
             "status": tk.StringVar(value="Pending") # New status variable
-        })
+        }
+        trp = TrpState()
+        self.binder.bind(trp, trp_vars)
+        self.trp_input_vars.append(trp_vars)
+        self.model.trps.append(trp)
+        self._row_added(trp, "trps")
+
+    def remove_trp(self, index):
+        del self.trp_input_vars[index]
+        del self.model.trps[index]
+        self._rows_changed("trps")
 
     def clear_trps(self):
         """Clears all TRP variables."""
         self.trp_input_vars.clear()
+        self.model.trps.clear()
+        self._rows_changed("trps")
+
+    def get_trp_list(self):
+        """Returns the TRP list as an opaque value for set_trp_list."""
+        return list(self.trp_input_vars), list(self.model.trps)
+
+    def set_trp_list(self, trp_list):
+        self.trp_input_vars[:], self.model.trps[:] = trp_list
+        self._rows_changed("trps")
 
     def get_trp_vars(self, index):
         """Returns the variables for a specific TRP."""
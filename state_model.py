@@ -0,0 +1,144 @@
+_MISSING = object()
+
+
+def to_float(value, default=0.0):
+    """Converts an input value to float, returning `default` if it is empty or not a number."""
+    try:
+        if isinstance(value, str) and value.strip() == "":
+            return default
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+class Observable:
+    """
+    Base of the plain-Python state objects.
+
+    Subclasses list their fields with defaults in FIELDS and the matching
+    __slots__, and take initial values as keyword arguments. Assigning a
+    field a different value calls every subscriber with (obj, name, value).
+    """
+    __slots__ = ("_listeners",)
+    FIELDS = ()
+
+    def __init__(self, **values):
+        object.__setattr__(self, "_listeners", [])
+        for name, default in self.FIELDS:
+            object.__setattr__(self, name, values.pop(name, default))
+        if values:
+            raise TypeError(f"Unknown {type(self).__name__} fields: {', '.join(values)}")
+
+    def __setattr__(self, name, value):
+        old = getattr(self, name, _MISSING)
+        object.__setattr__(self, name, value)
+        if old != value:
+            for listener in tuple(self._listeners):
+                listener(self, name, value)
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name, _ in self.FIELDS)
+        return f"{type(self).__name__}({fields})"
+
+    def subscribe(self, listener):
+        self._listeners.append(listener)
+        return listener
+
+    def unsubscribe(self, listener):
+        self._listeners.remove(listener)
+
+    def reset(self):
+        """Sets every field back to its default."""
+        for name, default in self.FIELDS:
+            setattr(self, name, default)
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name, _ in self.FIELDS}
+
+
+class MortarState(Observable):
+    FIELDS = (
+        ("grid", "0000000000"),
+        ("elev", 100.0),
+        ("callsign", ""),
+        ("locked", False),
+    )
+    __slots__ = tuple(name for name, _ in FIELDS)
+
+
+class TrpState(Observable):
+    FIELDS = (
+        ("grid", "0000000000"),
+        ("elev", 100.0),
+        ("name", ""),
+        ("status", "Pending"),
+    )
+    __slots__ = tuple(name for name, _ in FIELDS)
+
+
+class MissionState(Observable):
+    """
+    Calculation inputs of the current mission.
+    `mortars` holds a MortarState per gun row and `trps` a TrpState per
+    entry of the TRP list; only the first `num_mortars` guns take part.
+    """
+    FIELDS = (
+        ("num_mortars", 1),
+        ("fire_mission_type", "Regular"),
+        ("targeting_mode", "Polar"),
+        ("faction", "NATO"),
+        ("ammo", ""),
+        ("fo_grid", "0000000000"),
+        ("fo_elev", 100.0),
+        ("fo_id", ""),
+        ("fo_azimuth", 0.0),
+        ("fo_dist", 1000.0),
+        ("fo_elev_diff", 0.0),
+        ("creep_direction", 0.0),
+        ("creep_spread", 1.0),
+        ("target_grid", "0000000000"),
+        ("target_elev", 100.0),
+        ("corr_lr", 0.0),
+        ("corr_ad", 0.0),
+        ("spotting_charge", 0),
+    )
+    __slots__ = tuple(name for name, _ in FIELDS) + ("mortars", "trps")
+
+    def __init__(self, mortars=None, trps=None, **values):
+        super().__init__(**values)
+        object.__setattr__(self, "mortars", list(mortars or []))
+        object.__setattr__(self, "trps", list(trps or []))
+
+    def active_mortars(self):
+        return self.mortars[:self.num_mortars]
+
+
+def build_calculation_task(mission, trp=None):
+    """
+    Builds the worker task (see worker.process_task) for a mission.
+    If `trp` (a TrpState) is given, it is the target of a TRP list calculation
+    instead of the mission's own target grid.
+    """
+    return {
+        'mission_type': mission.fire_mission_type,
+        'targeting_mode': mission.targeting_mode,
+        'faction': mission.faction,
+        'ammo': mission.ammo,
+        'creep_direction': mission.creep_direction,
+        'creep_spread': mission.creep_spread,
+        'fo_grid_str': mission.fo_grid,
+        'fo_elev': mission.fo_elev,
+        'fo_azimuth_deg': mission.fo_azimuth,
+        'fo_dist': mission.fo_dist,
+        'fo_elev_diff': mission.fo_elev_diff,
+        'corr_lr': mission.corr_lr,
+        'corr_ad': mission.corr_ad,
+        'mortars': [
+            {"grid": mortar.grid, "elev": mortar.elev, "callsign": mortar.callsign}
+            for mortar in mission.active_mortars()
+        ],
+        'target_grid_str': mission.target_grid if trp is None else trp.grid,
+        'target_elev': mission.target_elev if trp is None else trp.elev,
+        'is_trp_list_calc': trp is not None, # Flag to indicate if it's part of a TRP list calculation
+        'trp_name': trp.name if trp is not None else None
+    }
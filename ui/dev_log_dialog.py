@@ -0,0 +1,40 @@
+import tkinter as tk
+from tkinter import ttk
+
+class DevLogDialog(tk.Toplevel):
+    """Shows the recent developer log events kept in memory (see dev_log.RingBufferHandler)."""
+    def __init__(self, parent, dev_log, is_dark_mode):
+        super().__init__(parent)
+        self.title("开发日志")
+        self.dev_log = dev_log
+        self.transient(parent)
+        self.configure(bg="#252526" if is_dark_mode else "SystemButtonFace")
+
+        text_frame = ttk.Frame(self)
+        text_frame.pack(padx=10, pady=10, fill="both", expand=True)
+        self.log_text = tk.Text(text_frame, wrap="none", font=("Consolas", 9), state="disabled")
+        self.log_text.pack(side="left", fill="both", expand=True)
+        scrollbar = ttk.Scrollbar(text_frame, orient="vertical", command=self.log_text.yview)
+        self.log_text.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side="right", fill="y")
+
+        button_frame = ttk.Frame(self)
+        button_frame.pack(pady=5)
+        ttk.Button(button_frame, text="刷新", command=self.refresh).pack(side="left", padx=10)
+        ttk.Button(button_frame, text="清空", command=self.clear).pack(side="left", padx=10)
+        ttk.Button(button_frame, text="关闭", command=self.destroy).pack(side="left", padx=10)
+
+        self.geometry("760x480")
+        self.refresh()
+
+    def refresh(self):
+        lines = self.dev_log.recent_events()
+        self.log_text.configure(state="normal")
+        self.log_text.delete("1.0", "end")
+        self.log_text.insert("end", "\n".join(lines) if lines else "还没有记录任何事件。")
+        self.log_text.configure(state="disabled")
+        self.log_text.see("end")
+
+    def clear(self):
+        self.dev_log.ring_buffer.clear()
+        self.refresh()
@@ -2,7 +2,7 @@ import tkinter as tk
 import json
 import os
 from tkinter import ttk, filedialog, simpledialog
-from PIL import Image, ImageTk, ImageGrab
+from PIL import Image, ImageTk
 
 class Tooltip:
     def __init__(self, widget, text, display_widget):
@@ -23,6 +23,7 @@ class ListSelectDialog(tk.Toplevel):
         super().__init__(parent)
         self.title(title)
         self.result = None
+        self.result_index = None
         self.transient(parent)
 
         bg_color = "#252526" if is_dark_mode else "SystemButtonFace"
@@ -36,7 +37,8 @@ class ListSelectDialog(tk.Toplevel):
 
         def on_select():
             if listbox.curselection():
-                self.result = listbox.get(listbox.curselection())
+                self.result_index = listbox.curselection()[0]
+                self.result = listbox.get(self.result_index)
                 self.destroy()
 
         button_frame = ttk.Frame(self, style="TFrame")
@@ -58,6 +60,14 @@ class ListSelectDialog(tk.Toplevel):
         self.grab_set()
         self.wait_window()
 
+# Canvas item options saved with a plan, per item type
+PLAN_ITEM_OPTIONS = {
+    "line": ("fill", "width", "arrow"),
+    "oval": ("outline", "width"),
+    "rectangle": ("outline", "width"),
+    "text": ("text", "fill", "font"),
+}
+
 class FireMissionPlannerView(ttk.Frame):
     def __init__(self, parent, app):
         super().__init__(parent, padding="10")
@@ -67,6 +77,7 @@ class FireMissionPlannerView(ttk.Frame):
         self.drawn_items = []
         self.image_path = None
         self.resize_handles = []
+        self.revision = 0 # Bumped on every change to the plan, for the session autosave
 
         self.pack(fill="both", expand=True)
 
@@ -136,6 +147,7 @@ class FireMissionPlannerView(ttk.Frame):
 
     def load_image(self, file_path):
         self.image_path = file_path
+        self.revision += 1
         image = Image.open(file_path)
         self.original_image = image.copy()
         self.zoom_level = 1.0
@@ -181,6 +193,7 @@ class FireMissionPlannerView(ttk.Frame):
         elif self.current_item:
             self.drawn_items.append(self.current_item)
             self.current_item = None
+            self.revision += 1
 
     def draw_text(self, x, y):
         text = simpledialog.askstring("Input", "Enter text:", parent=self)
@@ -188,6 +201,7 @@ class FireMissionPlannerView(ttk.Frame):
             color = self.selected_color.get()
             item = self.canvas.create_text(x, y, text=text, fill=color, font=("Arial", 12))
             self.drawn_items.append(item)
+            self.revision += 1
 
     def save_plan(self):
         file_path = filedialog.asksaveasfilename(defaultextension=".png", filetypes=[("PNG文件", "*.png")])
@@ -199,6 +213,7 @@ class FireMissionPlannerView(ttk.Frame):
         x1 = x + self.canvas.winfo_width()
         y1 = y + self.canvas.winfo_height()
         
+        from PIL import ImageGrab # Only needed here, and slow to import
         ImageGrab.grab().crop((x, y, x1, y1)).save(file_path)
 
     def update_image(self):
@@ -234,11 +249,13 @@ class FireMissionPlannerView(ttk.Frame):
         if item in self.drawn_items:
             self.canvas.delete(item)
             self.drawn_items.remove(item)
+            self.revision += 1
 
     def clear_all(self):
         for item in self.drawn_items:
             self.canvas.delete(item)
         self.drawn_items = []
+        self.revision += 1
 
     def select_for_resize(self, event):
         self.clear_resize_handles()
@@ -285,12 +302,30 @@ class FireMissionPlannerView(ttk.Frame):
 
         self.clear_resize_handles()
         self.show_resize_handles(self.current_item)
+        self.revision += 1
+
+    def get_plan(self):
+        """Returns the background image path and the drawn items as JSON-serializable data."""
+        items = []
+        for item in self.drawn_items:
+            item_type = self.canvas.type(item)
+            options = {option: self.canvas.itemcget(item, option) for option in PLAN_ITEM_OPTIONS.get(item_type, ())}
+            items.append({"type": item_type, "coords": self.canvas.coords(item), "options": options})
+        return {"image_path": self.image_path, "items": items}
+
+    def set_plan(self, plan):
+        """Replaces the current plan with data from get_plan."""
+        self.clear_all()
+        image_path = plan.get("image_path")
+        if image_path and os.path.exists(image_path):
+            self.load_image(image_path)
+        for item in plan.get("items", []):
+            if item.get("type") not in PLAN_ITEM_OPTIONS:
+                continue
+            create = getattr(self.canvas, f"create_{item['type']}")
+            self.drawn_items.append(create(*item["coords"], **item.get("options", {})))
+        self.revision += 1
 
     def apply_theme(self):
-        bg_color = "#252526" if self.app.is_dark_mode else "white"
-        self.canvas.config(bg=bg_color)
-        
-        if self.app.is_dark_mode:
-            self.app.style.configure("Tooltip.TLabel", background="black", foreground="green", bordercolor="red")
-        else:
-            self.app.style.configure("Tooltip.TLabel", background="white", foreground="black", bordercolor="red")
\ No newline at end of file
+        # The Tooltip.TLabel style is part of the theme palettes
+        self.canvas.config(bg=self.app.theme_manager.colors["canvas_bg"])
\ No newline at end of file
@@ -0,0 +1,60 @@
+import csv
+import tkinter as tk
+from tkinter import ttk, filedialog, messagebox
+
+class LogStatsDialog(tk.Toplevel):
+    """Shows the live aggregates of the mission log (see log_stats.LogStats) and exports them as CSV."""
+    def __init__(self, parent, stats, is_dark_mode):
+        super().__init__(parent)
+        self.title("任务日志统计")
+        self.stats = stats
+        self.transient(parent)
+        self.configure(bg="#252526" if is_dark_mode else "SystemButtonFace")
+
+        tree_frame = ttk.Frame(self)
+        tree_frame.pack(padx=10, pady=10, fill="both", expand=True)
+        self.stats_tree = ttk.Treeview(tree_frame, columns=("value",), show="tree headings")
+        self.stats_tree.heading("#0", text="项目")
+        self.stats_tree.heading("value", text="数值")
+        self.stats_tree.column("#0", width=220)
+        self.stats_tree.column("value", width=100, anchor="e")
+        self.stats_tree.pack(side="left", fill="both", expand=True)
+        scrollbar = ttk.Scrollbar(tree_frame, orient="vertical", command=self.stats_tree.yview)
+        self.stats_tree.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side="right", fill="y")
+
+        button_frame = ttk.Frame(self)
+        button_frame.pack(pady=5)
+        ttk.Button(button_frame, text="刷新", command=self.refresh).pack(side="left", padx=10)
+        ttk.Button(button_frame, text="导出CSV...", command=self.export_csv).pack(side="left", padx=10)
+        ttk.Button(button_frame, text="关闭", command=self.destroy).pack(side="left", padx=10)
+
+        self.geometry("380x480")
+        self.refresh()
+
+    def refresh(self):
+        # The aggregates are kept current by the log, so this only redraws them
+        self.stats_tree.delete(*self.stats_tree.get_children())
+        self.stats_tree.insert("", "end", text="任务总数", values=(len(self.stats),))
+        for section, rows in self.stats.summary():
+            parent = self.stats_tree.insert("", "end", text=section, open=True)
+            for label, value in rows:
+                self.stats_tree.insert(parent, "end", text=label, values=(value,))
+
+    def export_csv(self):
+        file_path = filedialog.asksaveasfilename(
+            parent=self,
+            defaultextension=".csv",
+            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")],
+            title="导出统计"
+        )
+        if not file_path:
+            return
+        try:
+            with open(file_path, "w", newline="", encoding="utf-8-sig") as f:
+                writer = csv.writer(f)
+                writer.writerow(("section", "item", "value"))
+                for section, rows in self.stats.summary():
+                    writer.writerows((section, label, value) for label, value in rows)
+        except OSError as e:
+            messagebox.showerror("错误", f"导出统计失败: {e}", parent=self)
@@ -0,0 +1,258 @@
+import queue
+import threading
+import traceback
+import numpy as np
+from PIL import Image, ImageDraw, ImageColor, ImageTk
+
+from calculations import get_charge_range_limits
+from reachability import compute_reachability
+
+# Alpha values (0-255) of the coverage overlay layers
+COVERAGE_FILL_ALPHA = 40
+DEAD_ZONE_ALPHA = 90
+RING_ALPHA = 200
+DEAD_ZONE_COLOR = "red"
+# Alpha of heatmap cells reached by every gun / by only some of the guns
+HEATMAP_ALL_GUNS_ALPHA = 120
+HEATMAP_SOME_GUNS_ALPHA = 55
+
+
+class CoverageOverlay:
+    """
+    Renders every gun's per-charge min/max range rings and its dead zone as a
+    semi-transparent image layer for the map canvas.
+
+    The rendered layer covers the visible view plus a margin on every side and
+    is cached per (gun positions, faction, ammo, map scale). Panning within the
+    margin only moves the cached image, the geometry is re-rasterized only
+    when a gun moves, the ammo changes or the zoom level changes.
+    """
+    def __init__(self):
+        self._key = None
+        self._region = None # (min_e, min_n, max_e, max_n) covered by the cached layer
+        self._photo = None
+
+    def invalidate(self):
+        self._key = None
+        self._region = None
+        self._photo = None
+
+    def get_layer(self, guns, faction, ammo, view, scale):
+        """
+        Returns (photo, min_e, max_n) for the overlay covering `view`, where
+        (min_e, max_n) is the map coordinate of the image's top-left corner,
+        or None if there is nothing to draw.
+        `guns` is a tuple of ((easting, northing), color) pairs.
+        """
+        limits = get_charge_range_limits(faction, ammo)
+        if not guns or not limits or scale <= 0:
+            return None
+
+        rings_bbox = self._rings_bbox(guns, limits)
+        visible = self._intersect(view, rings_bbox)
+        if visible is None:
+            return None
+
+        key = (guns, faction, ammo, round(scale, 9))
+        if key != self._key or not self._contains(self._region, visible):
+            self._render(key, guns, limits, view, rings_bbox, scale)
+        if self._photo is None:
+            return None
+        return self._photo, self._region[0], self._region[3]
+
+    def _render(self, key, guns, limits, view, rings_bbox, scale):
+        min_e, min_n, max_e, max_n = view
+        margin_e = (max_e - min_e) / 2
+        margin_n = (max_n - min_n) / 2
+        region = self._intersect((min_e - margin_e, min_n - margin_n, max_e + margin_e, max_n + margin_n), rings_bbox)
+        self._key = key
+        self._region = region
+        self._photo = None
+        if region is None:
+            return
+
+        width = max(1, int((region[2] - region[0]) * scale))
+        height = max(1, int((region[3] - region[1]) * scale))
+        layer = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+
+        def to_pixels(e, n):
+            return (e - region[0]) * scale, (region[3] - n) * scale
+
+        min_range = min(limit[1] for limit in limits)
+        max_range = max(limit[2] for limit in limits)
+        for (gun_e, gun_n), color in guns:
+            # Each gun is drawn on its own layer so overlapping coverage blends instead of overwriting
+            gun_layer = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+            draw = ImageDraw.Draw(gun_layer)
+            red, green, blue = ImageColor.getrgb(color)
+            x, y = to_pixels(gun_e, gun_n)
+
+            r = max_range * scale
+            draw.ellipse((x - r, y - r, x + r, y + r), fill=(red, green, blue, COVERAGE_FILL_ALPHA))
+            r = min_range * scale
+            draw.ellipse((x - r, y - r, x + r, y + r), fill=(*ImageColor.getrgb(DEAD_ZONE_COLOR), DEAD_ZONE_ALPHA))
+
+            for charge, charge_min, charge_max in limits:
+                for radius in (charge_min, charge_max):
+                    r = radius * scale
+                    draw.ellipse((x - r, y - r, x + r, y + r), outline=(red, green, blue, RING_ALPHA), width=1)
+                label_y = y - charge_max * scale
+                draw.text((x + 3, label_y + 1), f"C{charge}", fill=(red, green, blue, 255))
+            layer = Image.alpha_composite(layer, gun_layer)
+
+        self._photo = ImageTk.PhotoImage(layer)
+
+    @staticmethod
+    def _rings_bbox(guns, limits):
+        max_range = max(limit[2] for limit in limits)
+        eastings = [coords[0] for coords, _ in guns]
+        northings = [coords[1] for coords, _ in guns]
+        return (min(eastings) - max_range, min(northings) - max_range,
+                max(eastings) + max_range, max(northings) + max_range)
+
+    @staticmethod
+    def _intersect(a, b):
+        min_e, min_n = max(a[0], b[0]), max(a[1], b[1])
+        max_e, max_n = min(a[2], b[2]), min(a[3], b[3])
+        if max_e <= min_e or max_n <= min_n:
+            return None
+        return (min_e, min_n, max_e, max_n)
+
+    @staticmethod
+    def _contains(outer, inner):
+        if outer is None:
+            return False
+        return outer[0] <= inner[0] and outer[1] <= inner[1] and outer[2] >= inner[2] and outer[3] >= inner[3]
+
+
+class ReachabilityLayer:
+    """
+    Toggleable heatmap of which cells the current guns can reach and how fast.
+    The raster is computed and colorized once per (guns, faction, ammo, map
+    size) on a background thread, so moving a gun never stalls the Tk thread;
+    the previous heatmap stays up until the new one is ready. Redraws only
+    crop and scale the cached image. Color runs from green (fastest time of
+    flight) to red (slowest), cells only some of the guns reach are drawn fainter.
+    """
+    def __init__(self, widget, event_name):
+        self._widget = widget # receives event_name once a requested raster is ready
+        self._event_name = event_name
+        self._key = None
+        self._requested_key = None
+        self.raster = None
+        self.gun_numbers = () # 1-based gun number of each raster layer
+        self.tof_range = None
+        self._image = None
+        self._photo_key = None
+        self._photo = None
+        self._task_queue = queue.Queue()
+        self._result_queue = queue.Queue()
+        self._thread = None
+
+    def request(self, guns, faction, ammo, map_x_max, map_y_max):
+        """
+        Queues the raster for `guns` ((gun number, (easting, northing)) pairs)
+        unless it is the one shown or already being computed.
+        """
+        key = (guns, faction, ammo, map_x_max, map_y_max)
+        if key == self._key or key == self._requested_key:
+            return
+        self._requested_key = key
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        self._task_queue.put(key)
+
+    def apply_results(self):
+        """Takes over a finished raster on the Tk thread. Returns True if the heatmap changed."""
+        changed = False
+        while True:
+            try:
+                key, raster, image, tof_range = self._result_queue.get_nowait()
+            except queue.Empty:
+                break
+            if key != self._requested_key:
+                continue # Superseded while it was computed
+            self._key = key
+            self.raster = raster
+            self.gun_numbers = tuple(number for number, _ in key[0])
+            self._image = image
+            self.tof_range = tof_range
+            self._photo_key = None
+            self._photo = None
+            changed = True
+        return changed
+
+    def close(self):
+        if self._thread is not None:
+            self._task_queue.put(None)
+
+    def _run(self):
+        while True:
+            key = self._task_queue.get()
+            # Only the most recent request matters, drop anything queued before it
+            while True:
+                try:
+                    newer_key = self._task_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if newer_key is None:
+                    return
+                key = newer_key
+            if key is None:
+                return
+            guns, faction, ammo, map_x_max, map_y_max = key
+            try:
+                raster = compute_reachability(tuple(coords for _, coords in guns), faction, ammo, map_x_max, map_y_max)
+                image, tof_range = self._colorize(raster) if raster is not None else (None, None)
+            except Exception:
+                traceback.print_exc()
+                raster, image, tof_range = None, None, None
+            self._result_queue.put((key, raster, image, tof_range))
+            self._widget.event_generate(self._event_name)
+
+    @staticmethod
+    def _colorize(raster):
+        """Returns (RGBA image, (fastest, slowest time of flight)), or (None, None) if no cell is reached."""
+        fastest = raster.fastest_tof
+        reached = np.isfinite(fastest)
+        if not reached.any():
+            return None, None
+        tof_min, tof_max = float(fastest[reached].min()), float(fastest[reached].max())
+
+        t = np.zeros_like(fastest)
+        if tof_max > tof_min:
+            t[reached] = (fastest[reached] - tof_min) / (tof_max - tof_min)
+        rgba = np.zeros(fastest.shape + (4,), dtype=np.uint8)
+        rgba[..., 0] = np.interp(t, (0.0, 0.5, 1.0), (0, 230, 220))
+        rgba[..., 1] = np.interp(t, (0.0, 0.5, 1.0), (200, 230, 0))
+        all_guns = np.isfinite(raster.tof).all(axis=0)
+        rgba[..., 3] = np.where(all_guns, HEATMAP_ALL_GUNS_ALPHA, np.where(reached, HEATMAP_SOME_GUNS_ALPHA, 0))
+        return Image.fromarray(rgba, "RGBA"), (tof_min, tof_max)
+
+    def get_layer(self, view, scale):
+        """
+        Returns (photo, min_e, max_n) for the visible part of the heatmap, where
+        (min_e, max_n) is the map coordinate of the image's top-left corner,
+        or None if nothing is visible.
+        """
+        if self._image is None or scale <= 0:
+            return None
+        raster = self.raster
+        rows, cols = raster.shape
+        extent = (raster.min_e, raster.max_n - rows * raster.cell_size,
+                  raster.min_e + cols * raster.cell_size, raster.max_n)
+        visible = CoverageOverlay._intersect(view, extent)
+        if visible is None:
+            return None
+
+        photo_key = (visible, round(scale, 9))
+        if photo_key != self._photo_key:
+            cell = raster.cell_size
+            crop_box = ((visible[0] - raster.min_e) / cell, (raster.max_n - visible[3]) / cell,
+                        (visible[2] - raster.min_e) / cell, (raster.max_n - visible[1]) / cell)
+            size = (max(1, int((visible[2] - visible[0]) * scale)), max(1, int((visible[3] - visible[1]) * scale)))
+            # Nearest-neighbor keeps cell borders crisp when zoomed in
+            self._photo = ImageTk.PhotoImage(self._image.resize(size, Image.NEAREST, box=crop_box))
+            self._photo_key = photo_key
+        return self._photo, visible[0], visible[3]
@@ -2,11 +2,15 @@ import tkinter as tk
 from tkinter import ttk
 from PIL import Image, ImageTk
 import math
+from calculations import parse_grid
+from frame_timer import FrameTimer, FRAME_BUDGET_MS
+from ui.map_overlays import CoverageOverlay, ReachabilityLayer
 
 class MapView(ttk.Frame):
     def __init__(self, parent, app):
         super().__init__(parent)
         self.app = app
+        self.frame_timer = FrameTimer()
 
         self.grid_rowconfigure(0, weight=1)
         self.grid_columnconfigure(0, weight=1)
@@ -28,11 +32,29 @@ class MapView(ttk.Frame):
         show_saved_target_check = ttk.Checkbutton(self, text="显示已记录目标", variable=self.show_saved_target_var, command=self.plot_positions)
         show_saved_target_check.place(relx=0.02, rely=0.02, anchor="nw")
 
+        self.coverage_overlay = CoverageOverlay()
+        self.show_coverage_var = tk.BooleanVar(value=False)
+        show_coverage_check = ttk.Checkbutton(self, text="显示射程覆盖", variable=self.show_coverage_var, command=self.plot_positions)
+        show_coverage_check.place(relx=0.02, rely=0.02, y=25, anchor="nw")
+
+        self.reachability_layer = ReachabilityLayer(self, "<<ReachabilityComputed>>")
+        self.bind("<<ReachabilityComputed>>", self.on_reachability_computed)
+        self.show_heatmap_var = tk.BooleanVar(value=False)
+        show_heatmap_check = ttk.Checkbutton(self, text="显示可达热图", variable=self.show_heatmap_var, command=self.plot_positions)
+        show_heatmap_check.place(relx=0.02, rely=0.02, y=50, anchor="nw")
+        self.graph_canvas.bind("<Motion>", self.on_heatmap_probe)
+
     def plot_positions(self):
+        with self.frame_timer.stage("frame"):
+            self._plot_positions()
+        if self.frame_timer.enabled:
+            self._draw_frame_time_overlay()
+
+    def _plot_positions(self):
         self.graph_canvas.delete("all")
 
-        bg_color = "#252526" if self.app.is_dark_mode else "white"
-        mortar_colors = ["blue", "green", "purple", "orange"]
+        bg_color = self.app.theme_manager.colors["canvas_bg"]
+        mortar_colors = self.app.mortar_colors
         fo_color, target_color = "yellow", "red"
         self.graph_canvas.config(bg=bg_color)
 
@@ -47,6 +69,9 @@ class MapView(ttk.Frame):
             self._draw_map_image(canvas_width, canvas_height, view_width, view_height)
         elif self.app.theme_manager.theme_config.get("use_logo_as_background"):
             self._draw_logo_background()
+
+        if self.app.state.map_loading:
+            self.graph_canvas.create_text(canvas_width // 2, 20, text="正在加载地图...", fill="red", font=("Consolas", 10, "bold"))
         
         # 2. Define Coordinate Transformation Function
         def transform(e, n):
@@ -59,8 +84,19 @@ class MapView(ttk.Frame):
             y = offset_y + ((max_n - n) * scale)
             return x, y, scale
 
-        # 3. Draw Pins and Overlays
-        # 3. Draw Pins and Overlays
+        # 3. Draw Reachability Heatmap and Coverage Overlay
+        if self.show_heatmap_var.get() and view_width > 0 and view_height > 0:
+            with self.frame_timer.stage("heatmap"):
+                self._draw_reachability_heatmap(transform, mortar_colors)
+        if self.show_coverage_var.get() and view_width > 0 and view_height > 0:
+            with self.frame_timer.stage("overlay"):
+                self._draw_coverage_overlay(transform, mortar_colors)
+
+        # 4. Draw Pins and Overlays
+        with self.frame_timer.stage("pins"):
+            self._plot_pins(transform, mortar_colors, fo_color, target_color, canvas_width, canvas_height)
+
+    def _plot_pins(self, transform, mortar_colors, fo_color, target_color, canvas_width, canvas_height):
         if self.app.state.last_coords.get('trp_targets'):
             self._plot_trp_targets(transform, target_color)
         elif self.app.state.last_solutions:
@@ -91,12 +127,125 @@ class MapView(ttk.Frame):
         crop_min_y = ((map_scale_y - max_n) / map_scale_y) * img_height
         crop_max_y = ((map_scale_y - min_n) / map_scale_y) * img_height
 
-        if crop_max_x > crop_min_x and crop_max_y > crop_min_y:
-            cropped_img = self.app.state.map_image.crop((crop_min_x, crop_min_y, crop_max_x, crop_max_y))
-            resized_image = cropped_img.resize((render_width, render_height), Image.LANCZOS)
-            self.app.state.map_photo = ImageTk.PhotoImage(resized_image)
+        if crop_max_x > crop_min_x and crop_max_y > crop_min_y and render_width > 0 and render_height > 0:
+            source_image, factor = self.app.state.map_image, 1
+            if self.app.state.map_pyramid is not None:
+                # Crop from the pyramid level closest to the zoom instead of the full-resolution map
+                ratio = (crop_max_x - crop_min_x) / render_width
+                source_image, factor = self.app.state.map_pyramid.level_for_ratio(ratio)
+            crop_box = (crop_min_x / factor, crop_min_y / factor, crop_max_x / factor, crop_max_y / factor)
+            with self.frame_timer.stage("crop"):
+                cropped_img = source_image.crop(crop_box)
+            with self.frame_timer.stage("resample"):
+                resized_image = cropped_img.resize((render_width, render_height), Image.LANCZOS)
+            with self.frame_timer.stage("photo"):
+                self.app.state.map_photo = ImageTk.PhotoImage(resized_image)
             self.graph_canvas.create_image(offset_x, offset_y, anchor="nw", image=self.app.state.map_photo)
 
+    def set_frame_timing(self, enabled):
+        self.frame_timer.enabled = enabled
+        if not enabled:
+            self.frame_timer.reset()
+        self.plot_positions()
+
+    def _draw_frame_time_overlay(self):
+        """Draws per-stage p50/p95/p99 render times in the bottom-left corner of the map."""
+        lines = [f"帧预算 {FRAME_BUDGET_MS:.1f} ms  (p50/p95/p99)"]
+        over_budget = False
+        for name in self.frame_timer.stages():
+            p50, p95, p99, _ = self.frame_timer.percentiles(name)
+            lines.append(f"{name:<9}{p50:6.1f}{p95:7.1f}{p99:7.1f}")
+            if name == "frame" and p95 > FRAME_BUDGET_MS:
+                over_budget = True
+        self.graph_canvas.create_text(
+            8, self.graph_canvas.winfo_height() - 8, text="\n".join(lines), anchor="sw",
+            fill="red" if over_budget else "#00AA00", font=("Consolas", 8), tags="frame_time_overlay"
+        )
+
+    def _get_guns(self):
+        """Returns (gun number, (easting, northing)) for every gun with a valid, non-default grid."""
+        guns = []
+        for i in range(self.app.state.num_mortars_var.get()):
+            if i >= len(self.app.state.mortar_input_vars):
+                break
+            try:
+                coords = parse_grid(self.app.state.get_mortar_vars(i)['grid'].get())
+            except (ValueError, tk.TclError):
+                continue
+            if coords != (0, 0):
+                guns.append((i + 1, coords))
+        return tuple(guns)
+
+    def _get_gun_positions(self, mortar_colors):
+        """Returns ((easting, northing), color) for every gun with a valid, non-default grid."""
+        return tuple((coords, mortar_colors[(number - 1) % len(mortar_colors)]) for number, coords in self._get_guns())
+
+    def _draw_coverage_overlay(self, transform, mortar_colors):
+        """Draws the cached range-ring/dead-zone layer for the current guns and ammo."""
+        _, _, scale = transform(0, 0)
+        layer = self.coverage_overlay.get_layer(
+            self._get_gun_positions(mortar_colors),
+            self.app.state.faction_var.get(),
+            self.app.state.ammo_type_var.get(),
+            tuple(self.app.state.map_view),
+            scale
+        )
+        if layer is None:
+            return
+        photo, region_min_e, region_max_n = layer
+        x, y, _ = transform(region_min_e, region_max_n)
+        self.graph_canvas.create_image(x, y, anchor="nw", image=photo, tags="coverage_overlay")
+
+    def _draw_reachability_heatmap(self, transform, mortar_colors):
+        """Draws the cached reachability heatmap and requests a new one in the background if a gun moved."""
+        self.reachability_layer.request(
+            self._get_guns(),
+            self.app.state.faction_var.get(),
+            self.app.state.ammo_type_var.get(),
+            self.app.state.map_x_max_var.get(),
+            self.app.state.map_y_max_var.get()
+        )
+        _, _, scale = transform(0, 0)
+        layer = self.reachability_layer.get_layer(tuple(self.app.state.map_view), scale)
+        if layer is None:
+            return
+        photo, visible_min_e, visible_max_n = layer
+        x, y, _ = transform(visible_min_e, visible_max_n)
+        self.graph_canvas.create_image(x, y, anchor="nw", image=photo, tags="reachability_heatmap")
+        tof_min, tof_max = self.reachability_layer.tof_range
+        self.graph_canvas.create_text(
+            self.graph_canvas.winfo_width() - 40, 8, anchor="ne", font=("Consolas", 8), fill="black",
+            text=f"热图: 绿 {tof_min:.1f}s → 红 {tof_max:.1f}s", tags="reachability_heatmap"
+        )
+
+    def on_reachability_computed(self, event=None):
+        if self.reachability_layer.apply_results() and self.show_heatmap_var.get():
+            self.plot_positions()
+
+    def on_heatmap_probe(self, event):
+        """Shows charges, time of flight and elevation per gun for the cell under the cursor."""
+        self.graph_canvas.delete("heatmap_probe")
+        raster = self.reachability_layer.raster
+        if not self.show_heatmap_var.get() or raster is None:
+            return
+        map_e, map_n = self.canvas_to_map_coords(event.x, event.y)
+        if map_e is None:
+            return
+        samples = raster.sample(map_e, map_n)
+        if samples is None:
+            return
+        lines = []
+        for number, (charges, tof, elev) in zip(self.reachability_layer.gun_numbers, samples):
+            if charges:
+                charge_text = ",".join(str(charge) for charge in charges)
+                lines.append(f"炮 {number}: 装药 {charge_text} | {tof:.1f} s | {elev:.0f} MIL")
+            else:
+                lines.append(f"炮 {number}: 超出射程")
+        self.graph_canvas.create_text(
+            event.x + 12, event.y + 12, anchor="nw", text="\n".join(lines), fill="black",
+            font=("Consolas", 8), tags="heatmap_probe"
+        )
+
     def _draw_logo_background(self):
         logo_path = self.app.theme_manager.theme_config.get("logo_path")
         if logo_path and os.path.exists(logo_path):
@@ -123,13 +272,10 @@ class MapView(ttk.Frame):
 
             mortar_e, mortar_n = mortar_coords
             mortar_x, mortar_y, _ = transform(mortar_e, mortar_n)
-            self.graph_canvas.create_oval(mortar_x-5, mortar_y-5, mortar_x+5, mortar_y+5, fill=mortar_colors[i], outline="black")
+            self.graph_canvas.create_oval(mortar_x-5, mortar_y-5, mortar_x+5, mortar_y+5, fill=mortar_colors[i % len(mortar_colors)], outline="black")
             self.graph_canvas.create_text(mortar_x, mortar_y - 15, text=f"炮 {i+1}", fill="black")
 
         # Get FO coordinates from app state, not from individual solutions
-        # Import parse_grid if not already imported
-        from calculations import parse_grid
-        
         fo_grid_str = self.app.state.fo_grid_var.get()
         fo_easting, fo_northing = parse_grid(fo_grid_str)
         
@@ -170,8 +316,8 @@ class MapView(ttk.Frame):
  
         target_label = self.app.state.loaded_target_name.get() or "目标"
         for i, sol in enumerate(valid_solutions): # Iterate only valid solutions for target pins
-            self.graph_canvas.create_oval(target_x - 10, target_y - 10, target_x + 10, target_y + 10, outline=mortar_colors[i], width=2)
-            self.graph_canvas.create_polygon(target_x, target_y-7, target_x-7, target_y+7, target_x+7, target_y+7, fill=mortar_colors[i], outline="black")
+            self.graph_canvas.create_oval(target_x - 10, target_y - 10, target_x + 10, target_y + 10, outline=mortar_colors[i % len(mortar_colors)], width=2)
+            self.graph_canvas.create_polygon(target_x, target_y-7, target_x-7, target_y+7, target_x+7, target_y+7, fill=mortar_colors[i % len(mortar_colors)], outline="black")
         self.graph_canvas.create_text(target_x, target_y + 15, text=target_label, fill="black")
 
         legend_x = canvas_width - 150
@@ -190,8 +336,8 @@ class MapView(ttk.Frame):
         target_e, target_n = sol['target_coords'][:2] # Unpack only easting and northing
         target_x, target_y, scale = transform(target_e, target_n)
         for i, sol_i in enumerate(valid_solutions):
-            self.graph_canvas.create_oval(target_x - 10, target_y - 10, target_x + 10, target_y + 10, outline=mortar_colors[i], width=2)
-            self.graph_canvas.create_polygon(target_x, target_y-7, target_x-7, target_y+7, target_x+7, target_y+7, fill=mortar_colors[i], outline="black")
+            self.graph_canvas.create_oval(target_x - 10, target_y - 10, target_x + 10, target_y + 10, outline=mortar_colors[i % len(mortar_colors)], width=2)
+            self.graph_canvas.create_polygon(target_x, target_y-7, target_x-7, target_y+7, target_x+7, target_y+7, fill=mortar_colors[i % len(mortar_colors)], outline="black")
         self.graph_canvas.create_text(target_x, target_y + 15, text="目标", fill="black")
         
         disp = sol['least_tof']['dispersion'] * scale
@@ -209,8 +355,8 @@ class MapView(ttk.Frame):
         for i, sol in enumerate(valid_solutions):
             target_e, target_n = sol['target_coords'][:2] # Unpack only easting and northing
             target_x, target_y, _ = transform(target_e, target_n)
-            self.graph_canvas.create_oval(target_x - 10, target_y - 10, target_x + 10, target_y + 10, outline=mortar_colors[i], width=2)
-            self.graph_canvas.create_polygon(target_x, target_y-7, target_x-7, target_y+7, target_x+7, target_y+7, fill=mortar_colors[i], outline="black")
+            self.graph_canvas.create_oval(target_x - 10, target_y - 10, target_x + 10, target_y + 10, outline=mortar_colors[i % len(mortar_colors)], width=2)
+            self.graph_canvas.create_polygon(target_x, target_y-7, target_x-7, target_y+7, target_x+7, target_y+7, fill=mortar_colors[i % len(mortar_colors)], outline="black")
             self.graph_canvas.create_text(target_x, target_y + 15, text=f"目标 {i+1}", fill="black")
  
         creep_vec_e = last_target_e - first_target_e
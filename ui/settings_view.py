@@ -24,6 +24,8 @@ class SettingsView(ttk.Frame):
         ttk.Entry(map_settings_frame, textvariable=self.app.state.map_y_max_var, width=10).grid(row=2, column=1, padx=5, pady=2)
 
         ttk.Button(map_settings_frame, text="上传新地图", command=self.upload_map).grid(row=3, column=0, columnspan=2, pady=10)
+        self.map_info_label = ttk.Label(map_settings_frame, text="")
+        self.map_info_label.grid(row=4, column=0, columnspan=2, padx=5, pady=2, sticky="w")
         map_settings_frame.grid_columnconfigure(1, weight=1)
 
         # Theme
@@ -58,6 +60,17 @@ class SettingsView(ttk.Frame):
         warnings_frame.pack(fill="x", expand=True, pady=5)
         ttk.Checkbutton(warnings_frame, text="禁用'危险接近'警告", variable=self.app.state.disable_danger_close_var).pack(pady=5, padx=5, anchor="w")
 
+        # Mission log
+        log_frame = ttk.LabelFrame(self, text="任务日志")
+        log_frame.pack(fill="x", expand=True, pady=5)
+        ttk.Label(log_frame, text="存储方式:").pack(side="left", padx=5, pady=5)
+        self.log_backend_var = tk.StringVar(value=self.app.config_manager.get_log_backend())
+        log_backend_combo = ttk.Combobox(log_frame, textvariable=self.log_backend_var, values=("json", "sqlite"), state="readonly", width=10)
+        log_backend_combo.pack(side="left", padx=5, pady=5)
+        log_backend_combo.bind("<<ComboboxSelected>>", self.on_log_backend_selected)
+        ttk.Button(log_frame, text="导出会话...", command=self.app.export_session).pack(side="left", padx=5, pady=5)
+        ttk.Button(log_frame, text="导入会话...", command=self.app.import_session).pack(side="left", padx=5, pady=5)
+
         # Admin
         # --- Admin Mode (Hidden Feature) ---
         # NOTE: The admin mode, advanced targeting system, and this hidden button are internal features.
@@ -86,30 +99,39 @@ class SettingsView(ttk.Frame):
         # Developer
         dev_frame = ttk.LabelFrame(self, text="Developer")
         dev_frame.pack(fill="x", expand=True, pady=5)
-        ttk.Checkbutton(dev_frame, text="Enable Developer Logging", variable=self.app.state.dev_log_enabled).pack(pady=5, padx=5, anchor="w")
+        dev_log_frame = ttk.Frame(dev_frame)
+        dev_log_frame.pack(fill="x", pady=5, padx=5)
+        ttk.Checkbutton(dev_log_frame, text="Enable Developer Logging", variable=self.app.state.dev_log_enabled).pack(side="left")
+        ttk.Button(dev_log_frame, text="查看最近事件...", command=self.show_dev_log).pack(side="left", padx=10)
+
+        frame_timing_frame = ttk.Frame(dev_frame)
+        frame_timing_frame.pack(fill="x", pady=5, padx=5)
+        ttk.Checkbutton(frame_timing_frame, text="显示地图帧时间", variable=self.app.state.frame_timing_enabled, command=self.toggle_frame_timing).pack(side="left")
+        ttk.Button(frame_timing_frame, text="导出帧时间到开发日志", command=self.dump_frame_times).pack(side="left", padx=10)
+
+        map_cache_frame = ttk.Frame(dev_frame)
+        map_cache_frame.pack(fill="x", pady=5, padx=5)
+        ttk.Label(map_cache_frame, text="地图缓存上限 (MB):").pack(side="left")
+        self.map_cache_budget_entry = ttk.Entry(map_cache_frame, width=8)
+        self.map_cache_budget_entry.pack(side="left", padx=5)
+        self.map_cache_budget_entry.insert(0, self.app.config_manager.get_map_cache_budget_mb())
+        ttk.Button(map_cache_frame, text="设置", command=self.set_map_cache_budget).pack(side="left", padx=5)
+        self.map_cache_status_label = ttk.Label(map_cache_frame, text="")
+        self.map_cache_status_label.pack(side="left", padx=10)
+
+        self.refresh_map_list()
+        self.update_map_cache_status()
+        self.apply_theme()
+
+    def apply_theme(self):
+        # Called on creation too, since the tab is built after the theme was first applied
+        colors = self.app.theme_manager.colors
+        self.theme_button.config(text="切换到浅色模式" if self.app.is_dark_mode else "切换到深色模式")
+        self.admin_status_label.config(foreground=colors["admin_fg"])
+        self.hidden_button_label.config(bg=colors["window_bg"])
 
     def on_map_selected(self, event=None):
-        map_name = self.app.state.selected_map_var.get()
-        if not map_name:
-            return
-
-        # Ask for confirmation before changing the map and clearing data
-        if self.app.state.fo_grid_var.get() != "0000000000": # Check if there's existing data
-            if not messagebox.askyesno("更改地图？", "更改地图将清除所有当前任务数据。确定吗？"):
-                # User clicked 'No', so we need to revert the combobox selection
-                # This is a bit tricky as we don't have the 'previous' value directly.
-                # A simple approach is to just return, leaving the selection as is,
-                # but the best UX would be to revert. For now, we'll just stop.
-                # A more robust solution would involve storing the previous map selection.
-                return # Stop the map change
-
-        config = self.app.config_manager.get_map_config(map_name)
-        self.app.state.map_x_max_var.set(config.get('x_max', 1000))
-        self.app.state.map_y_max_var.set(config.get('y_max', 1000))
-        
-        # If user confirmed, or if there was no data, proceed to clear and load
-        self.app.new_mission(confirm=False) # Call new_mission without a second confirmation
-        self.app.load_map_image_and_view()
+        self.app.on_map_selected()
 
     def upload_map(self):
         file_path = filedialog.askopenfilename(filetypes=[("图片文件", "*.png;*.jpg;*.jpeg")])
@@ -131,10 +153,7 @@ class SettingsView(ttk.Frame):
         if password == "admin":
             self.app.state.admin_mode_enabled.set(True)
             self.admin_frame.pack(fill="x", expand=True, pady=5)
-            if self.app.is_dark_mode:
-                self.admin_status_label.config(foreground="#00FF00")
-            else:
-                self.admin_status_label.config(foreground="green")
+            self.admin_status_label.config(foreground=self.app.theme_manager.colors["admin_fg"])
         else:
             self.app.state.admin_mode_enabled.set(False)
             self.admin_frame.pack_forget()
@@ -146,9 +165,67 @@ class SettingsView(ttk.Frame):
         except ValueError:
             messagebox.showerror("错误", "无效距离。请输入数字。")
 
+    def on_log_backend_selected(self, event=None):
+        backend = self.log_backend_var.get()
+        if backend == self.app.config_manager.get_log_backend():
+            return
+        previous = self.app.config_manager.get_log_backend()
+        self.app.config_manager.set_log_backend(backend)
+        try:
+            self.app.mission_log.switch_store()
+        except Exception as e:
+            self.app.config_manager.set_log_backend(previous)
+            self.log_backend_var.set(previous)
+            messagebox.showerror("错误", f"切换存储方式失败: {e}")
+            return
+        messagebox.showinfo("任务日志", f"任务日志已迁移到 {backend} 存储。")
+
+    def set_map_cache_budget(self):
+        try:
+            budget_mb = int(self.map_cache_budget_entry.get())
+            if budget_mb < 0:
+                raise ValueError
+            self.app.set_map_cache_budget(budget_mb)
+        except ValueError:
+            messagebox.showerror("错误", "无效的缓存大小。请输入非负整数。")
+
+    def show_dev_log(self):
+        from ui.dev_log_dialog import DevLogDialog
+        DevLogDialog(self.app, self.app.dev_log, self.app.is_dark_mode)
+
+    def toggle_frame_timing(self):
+        self.app.map_view_widget.set_frame_timing(self.app.state.frame_timing_enabled.get())
+
+    def dump_frame_times(self):
+        frame_timer = self.app.map_view_widget.frame_timer
+        if not frame_timer.stages():
+            messagebox.showinfo("帧时间", "还没有记录帧时间。请先启用\"显示地图帧时间\"并操作地图。")
+            return
+        log_file_path = self.app.dev_log.write_report("map_frame_times", frame_timer.format_report())
+        messagebox.showinfo("帧时间", f"帧时间报告已写入:\n{log_file_path}")
+
+    def update_map_cache_status(self):
+        map_cache = self.app.map_cache
+        used_mb = map_cache.used_bytes / (1024 * 1024)
+        budget_mb = map_cache.budget_bytes / (1024 * 1024)
+        self.map_cache_status_label.config(text=f"已缓存 {len(map_cache)} 张地图, {used_mb:.1f} / {budget_mb:.0f} MB")
+
     def refresh_map_list(self):
         map_files = self.app.config_manager.get_map_list()
         self.map_selection_combo['values'] = map_files
+        self.update_map_info()
+
+    def update_map_info(self):
+        map_name = self.app.state.selected_map_var.get()
+        info = self.app.config_manager.get_map_info(map_name) if map_name else None
+        if info is None:
+            self.map_info_label.config(text="")
+            return
+        parts = [f"{info.width} x {info.height} 像素" if info.width else "无法读取尺寸", f"{info.file_size / (1024 * 1024):.1f} MB"]
+        parts.append("预览已缓存" if info.has_preview else "无缓存预览")
+        if info.sha1:
+            parts.append(f"SHA-1 {info.sha1[:12]}")
+        self.map_info_label.config(text=", ".join(parts))
 
     # def set_title(self):
     #     new_title = self.title_entry.get()
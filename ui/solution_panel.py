@@ -0,0 +1,142 @@
+import tkinter as tk
+from tkinter import ttk
+
+# Display strings of a panel, in the order solution_display returns them
+DISPLAY_FIELDS = (
+    "error",
+    "least_charge", "most_charge",
+    "least_elev", "most_elev",
+    "least_tof", "most_tof",
+    "least_disp", "most_disp",
+    "azimuth", "quick_least", "quick_most",
+)
+
+
+def solution_display(sol):
+    """Formats one gun's solution into the display strings of DISPLAY_FIELDS."""
+    if not isinstance(sol, dict):
+        return ("错误: 无效的解决方案数据",) + ("",) * (len(DISPLAY_FIELDS) - 1)
+    if sol.get('error'):
+        return (f"错误: {sol['error']}",) + ("",) * (len(DISPLAY_FIELDS) - 1)
+    least = sol.get('least_tof', {})
+    most = sol.get('most_tof', {})
+    return (
+        "",
+        f"{least.get('charge', '--')}", f"{most.get('charge', '--')}",
+        f"{least.get('elev', 0.0):.0f} MIL", f"{most.get('elev', 0.0):.0f} MIL",
+        f"{least.get('tof', 0.0):.1f} sec", f"{most.get('tof', 0.0):.1f} sec",
+        f"{least.get('dispersion', 0.0)} m", f"{most.get('dispersion', 0.0)} m",
+        f"{sol.get('azimuth', 0.0):.0f} MIL",
+        f"C-{least.get('charge', '--')}: {least.get('elev', 0.0):.0f} MIL",
+        f"C-{most.get('charge', '--')}: {most.get('elev', 0.0):.0f} MIL",
+    )
+
+
+class SolutionPanel:
+    """
+    The solution notebook tab and quick fire box of one gun.
+
+    The widgets are built once and show their values through StringVars;
+    show() only sets the variables whose text changed since the last
+    solution, and hide() takes the panel out of view without destroying it.
+    """
+    def __init__(self, notebook, quick_fire_frame, theme_manager, gun_index, color):
+        self.notebook = notebook
+        self.gun_index = gun_index
+        self.title = None
+        self.visible = False
+        self.display = None
+        self.vars = {name: tk.StringVar() for name in DISPLAY_FIELDS}
+
+        frame_style = f"Gun{gun_index}.TFrame"
+        label_style = f"Gun{gun_index}.TLabel"
+        bold_label_style = f"Gun{gun_index}.Bold.TLabel"
+        theme_manager.register_style(frame_style, configure={"background": color})
+        theme_manager.register_style(label_style, configure={"background": color, "foreground": "white", "font": ("Consolas", 10)})
+        theme_manager.register_style(bold_label_style, configure={"background": color, "foreground": "white", "font": ("Consolas", 10, "bold")})
+
+        self.tab_frame = ttk.Frame(notebook, style=frame_style)
+        self.tab_error_label = ttk.Label(self.tab_frame, textvariable=self.vars["error"], foreground="red", wraplength=250)
+        self.tab_content = ttk.Frame(self.tab_frame, style=frame_style)
+        self.tab_content.pack(fill="both", expand=True)
+        self._build_tab(self.tab_content, label_style, bold_label_style)
+
+        self.quick_frame = ttk.LabelFrame(quick_fire_frame, text=f"炮 {gun_index + 1}")
+        self.quick_error_label = ttk.Label(self.quick_frame, textvariable=self.vars["error"], foreground="red", wraplength=100)
+        self.quick_content = ttk.Frame(self.quick_frame)
+        self.quick_content.pack(fill="both", expand=True)
+        self._build_quick_fire(self.quick_content)
+
+    def _build_tab(self, frame, label_style, bold_label_style):
+        ttk.Label(frame, text="最短飞行时间", style=bold_label_style).grid(row=0, column=1, padx=5)
+        ttk.Label(frame, text="最长飞行时间", style=bold_label_style).grid(row=0, column=2, padx=5)
+
+        ttk.Label(frame, text="装药 (环):", style=label_style).grid(row=1, column=0, sticky="w", padx=5)
+        ttk.Label(frame, textvariable=self.vars["least_charge"], style=bold_label_style).grid(row=1, column=1, padx=5)
+        ttk.Label(frame, textvariable=self.vars["most_charge"], style=bold_label_style).grid(row=1, column=2, padx=5)
+
+        # The elevation frame has its own highlighting, so we don't apply the tab color here.
+        elevation_frame = ttk.Frame(frame, style="Highlight.TFrame")
+        elevation_frame.grid(row=2, column=0, columnspan=3, sticky="ew", padx=5, pady=2)
+        inner_elevation_frame = ttk.Frame(elevation_frame, style="TFrame")
+        inner_elevation_frame.pack(fill="both", expand=True, padx=1, pady=1)
+        inner_elevation_frame.grid_columnconfigure(1, weight=1)
+        inner_elevation_frame.grid_columnconfigure(2, weight=1)
+        ttk.Label(inner_elevation_frame, text="修正仰角:", style="Highlight.TLabel").grid(row=0, column=0, sticky="w", padx=5, pady=2)
+        ttk.Label(inner_elevation_frame, textvariable=self.vars["least_elev"], style="Highlight.BigBold.TLabel").grid(row=0, column=1)
+        ttk.Label(inner_elevation_frame, textvariable=self.vars["most_elev"], style="Highlight.BigBold.TLabel").grid(row=0, column=2)
+
+        ttk.Label(frame, text="飞行时间:", style=label_style).grid(row=3, column=0, sticky="w", padx=5)
+        ttk.Label(frame, textvariable=self.vars["least_tof"], style=bold_label_style).grid(row=3, column=1, padx=5)
+        ttk.Label(frame, textvariable=self.vars["most_tof"], style=bold_label_style).grid(row=3, column=2, padx=5)
+
+        ttk.Label(frame, text="散布半径:", style=label_style).grid(row=4, column=0, sticky="w", padx=5)
+        ttk.Label(frame, textvariable=self.vars["least_disp"], style=bold_label_style).grid(row=4, column=1, padx=5)
+        ttk.Label(frame, textvariable=self.vars["most_disp"], style=bold_label_style).grid(row=4, column=2, padx=5)
+
+    def _build_quick_fire(self, frame):
+        ttk.Label(frame, text="方位角:").pack(anchor="w")
+        ttk.Label(frame, textvariable=self.vars["azimuth"], style="QuickFire.TLabel").pack(anchor="w")
+        ttk.Label(frame, text="最短飞行时间仰角:").pack(anchor="w")
+        ttk.Label(frame, textvariable=self.vars["quick_least"], style="QuickFire.TLabel").pack(anchor="w")
+        ttk.Label(frame, text="最长飞行时间仰角:").pack(anchor="w")
+        ttk.Label(frame, textvariable=self.vars["quick_most"], style="QuickFire.TLabel").pack(anchor="w")
+
+    def show(self, sol, title):
+        """Shows `sol` in the panel, bringing it into view under the tab `title`."""
+        if not self.visible:
+            # Adding a hidden tab again restores it at its old position
+            self.notebook.add(self.tab_frame, text=title)
+            self.quick_frame.grid(row=0, column=self.gun_index, padx=5, pady=2, sticky="ns")
+            self.visible = True
+        elif title != self.title:
+            self.notebook.tab(self.tab_frame, text=title)
+        self.title = title
+
+        display = solution_display(sol)
+        if display == self.display:
+            return
+        for i, name in enumerate(DISPLAY_FIELDS):
+            if self.display is None or display[i] != self.display[i]:
+                self.vars[name].set(display[i])
+        if self.display is None or bool(display[0]) != bool(self.display[0]):
+            self._show_error(bool(display[0]))
+        self.display = display
+
+    def _show_error(self, has_error):
+        if has_error:
+            self.tab_content.pack_forget()
+            self.tab_error_label.pack(pady=10)
+            self.quick_content.pack_forget()
+            self.quick_error_label.pack(pady=5)
+        else:
+            self.tab_error_label.pack_forget()
+            self.tab_content.pack(fill="both", expand=True)
+            self.quick_error_label.pack_forget()
+            self.quick_content.pack(fill="both", expand=True)
+
+    def hide(self):
+        if self.visible:
+            self.notebook.hide(self.tab_frame)
+            self.quick_frame.grid_remove()
+            self.visible = False
@@ -1,7 +1,9 @@
+import json
 import tkinter as tk
 from tkinter import ttk, filedialog, simpledialog, messagebox
-import json
 from utils import format_grid_10_digit
+from calculations import parse_grid
+from log_archive import ARCHIVE_EXTENSION, KIND_TRP_LIST, write_archive
 
 class TRPSelectDialog(tk.Toplevel):
     def __init__(self, parent, title, valid_trps_data, is_dark_mode):
@@ -85,6 +87,7 @@ class TRPView(ttk.Frame):
     def __init__(self, parent, app):
         super().__init__(parent, padding="10")
         self.app = app
+        self.indexed_trp_keys = [] # keys of this list's TRPs in app.target_index
         self.pack(fill="both", expand=True)
 
         # Input Frame for new TRPs
@@ -143,6 +146,9 @@ class TRPView(ttk.Frame):
         self.detail_name_label.grid(row=2, column=0, padx=5, pady=2, sticky="w")
         self.detail_status_label = ttk.Label(self.details_frame, text="状态: ")
         self.detail_status_label.grid(row=3, column=0, padx=5, pady=2, sticky="w")
+        self.details_frame.config(style="TRPDetails.TLabelFrame")
+        for child in self.details_frame.winfo_children():
+            child.config(style="TRPDetails.TLabel")
 
         # Buttons for list management
         button_frame = ttk.Frame(self)
@@ -152,6 +158,7 @@ class TRPView(ttk.Frame):
         ttk.Button(button_frame, text="清空所有TRP", command=self.clear_all_trps).pack(side="left", padx=5)
         ttk.Button(button_frame, text="计算所有TRP", command=self.calculate_all_trps).pack(side="right", padx=5)
         ttk.Button(button_frame, text="从任务日志加载TRP", command=self.load_trps_from_log).pack(side="right", padx=5)
+        ttk.Button(button_frame, text="导出TRP...", command=self.export_trps).pack(side="right", padx=5)
 
         self.refresh_trp_list() # Initial population
 
@@ -192,7 +199,7 @@ class TRPView(ttk.Frame):
         for item_id in selected_items:
             index = self.trp_tree.index(item_id)
             if 0 <= index < len(self.app.state.trp_input_vars):
-                del self.app.state.trp_input_vars[index]
+                self.app.state.remove_trp(index)
         self.refresh_trp_list()
 
     def clear_all_trps(self):
@@ -205,6 +212,8 @@ class TRPView(ttk.Frame):
         for item in self.trp_tree.get_children():
             self.trp_tree.delete(item)
 
+        self._update_target_index()
+
         # Populate Treeview from state_manager
         for i, trp_vars in enumerate(self.app.state.trp_input_vars):
             status = trp_vars['status'].get()
@@ -223,6 +232,22 @@ class TRPView(ttk.Frame):
         
         # The tags will be configured in apply_theme based on the current theme.
 
+    def _update_target_index(self):
+        """Replaces the TRPs in the app's known target index with the current list."""
+        for key in self.indexed_trp_keys:
+            self.app.target_index.remove(key)
+        self.indexed_trp_keys = []
+        for i, trp_vars in enumerate(self.app.state.trp_input_vars):
+            try:
+                coords = parse_grid(trp_vars['grid'].get())
+            except (ValueError, TypeError):
+                continue
+            if coords == (0, 0):
+                continue # Unset placeholder grid
+            key = ("trp", i)
+            self.app.target_index.insert(key, *coords, {"name": trp_vars['name'].get(), "coords": coords, "source": "trp"})
+            self.indexed_trp_keys.append(key)
+
     def calculate_all_trps(self):
         if not self.app.state.trp_input_vars:
             messagebox.showinfo("无TRP", "请在计算前向列表添加TRP。")
@@ -230,69 +255,41 @@ class TRPView(ttk.Frame):
         self.app.calculate_trps_from_list()
 
     def load_trps_from_log(self):
+        if self.app.import_in_progress():
+            return
         file_path = filedialog.askopenfilename(
-            filetypes=[("JSON files", "*.json"), ("All files", "*.*")],
+            filetypes=[("JSON files", "*.json"), ("JSON Lines files", "*.jsonl"), ("Mission archives", f"*{ARCHIVE_EXTENSION}"), ("All files", "*.*")],
             title="加载任务日志以获取TRP"
         )
         if not file_path:
             return
 
-        try:
-            with open(file_path, 'r') as f:
-                log_data = json.load(f)
-            
-            self.app.state.clear_trps() # Clear existing TRPs before loading new ones
-
-            for entry in log_data:
-                # Determine initial status based on log entry type
-                initial_status = "Loaded"
-                if entry.get("type") == "TRP_BATCH_RESULT":
-                    trp_result = entry.get("data", {})
-                    grid = str(trp_result.get("original_trp_grid", trp_result.get("Target Grid", ""))).replace(" ", "")
-                    elev_str = str(trp_result.get("Target Elevation", "")).replace(" m", "")
-                    name = trp_result.get("TRP Name", "")
-                    initial_status = trp_result.get("Status", "Loaded") # Use status from batch result
-                else:
-                    # Existing mission log entry
-                    grid_raw = entry.get("original_trp_grid") # Prioritize original_trp_grid
-                    if grid_raw is None:
-                        grid_raw = entry.get("calculated_target_grid")
-                        if grid_raw is None:
-                            grid_raw = entry.get("target_grid_str", "")
-                    grid = str(grid_raw).replace(" ", "")
-
-                    elev_raw = entry.get("target_elev")
-                    if elev_raw is None:
-                        elev_raw = entry.get("fo_elev", 100)
-                    elev_str = str(elev_raw).replace(" m", "")
-
-                    name = entry.get("target_name")
-                    if not name:
-                        name = entry.get("fo_id", f"TRP from Log {len(self.app.state.trp_input_vars) + 1}")
-                
-                try:
-                    elev = float(elev_str)
-                except ValueError:
-                    elev = 100
-
-                if grid:
-                    self.app.state.add_trp()
-                    new_trp_vars = self.app.state.get_trp_vars(len(self.app.state.trp_input_vars) - 1)
-                    new_trp_vars['grid'].set(format_grid_10_digit(grid))
-                    new_trp_vars['elev'].set(elev)
-                    new_trp_vars['name'].set(name)
-                    new_trp_vars['status'].set(initial_status) # Set initial status
-                else:
-                    print(f"由于缺少网格数据，跳过日志条目: {entry}")
-                    messagebox.showwarning("加载警告", f"由于缺少网格数据，跳过了日志中的条目: {name}")
+        # The file is read, validated and added in batches by the log import thread
+        self.app.start_log_import('trp', file_path)
 
-            self.refresh_trp_list()
-            messagebox.showinfo("成功", f"从日志文件加载了 {len(self.app.state.trp_input_vars)} 个TRP。")
+    def export_trps(self):
+        if not self.app.state.trp_input_vars:
+            messagebox.showinfo("无TRP", "TRP列表为空。")
+            return
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=ARCHIVE_EXTENSION,
+            filetypes=[("Mission archives", f"*{ARCHIVE_EXTENSION}"), ("JSON files", "*.json"), ("All files", "*.*")],
+            title="导出TRP"
+        )
+        if not file_path:
+            return
 
-        except json.JSONDecodeError:
-            messagebox.showerror("错误", "无效的JSON文件。请选择有效的任务日志。")
+        # Same record layout in both formats, so either file loads back through load_trps_from_log
+        records = [dict(trp.to_dict(), type="TRP") for trp in self.app.state.model.trps]
+        try:
+            if file_path.lower().endswith(ARCHIVE_EXTENSION):
+                write_archive(file_path, KIND_TRP_LIST, records)
+            else:
+                with open(file_path, 'w') as f:
+                    json.dump(records, f, indent=4)
+            messagebox.showinfo("成功", f"已导出 {len(records)} 个TRP。")
         except Exception as e:
-            messagebox.showerror("错误", f"加载TRP时发生错误: {e}")
+            messagebox.showerror("错误", f"导出TRP失败: {e}")
 
     def load_valid_trp_to_main(self):
         all_trps_data = []
@@ -339,35 +336,7 @@ class TRPView(ttk.Frame):
             self.detail_status_label.config(text="状态: ")
             
     def apply_theme(self):
-        # This method will be called by the main app to apply theme changes
-        # Update Treeview colors based on theme
-        if self.app.is_dark_mode:
-            self.app.style.configure("Treeview", background="#3C3C3C", fieldbackground="#3C3C3C")
-            self.app.style.map("Treeview",
-                                background=[("selected", "#4a4a4a")],
-                                foreground=[("selected", "white")]) # Keep selected text white for visibility
-            self.app.style.configure("Treeview.Heading", background="#252526", foreground="#00FF00")
-            # Configure tags for styling in dark mode
-            self.trp_tree.tag_configure('out_of_range', foreground='red')
-            self.trp_tree.tag_configure('valid_solution', foreground='#00FF00') # Vibrant green for dark mode
-            
-            self.app.style.layout("TRPDetails.TLabelFrame", [('TLabelframe.border', {'sticky': 'nswe', 'border': '1', 'children': [('TLabelframe.padding', {'sticky': 'nswe', 'children': [('TLabelframe.label', {'sticky': 'nw'}), ('TLabelframe.contents', {'sticky': 'nswe'})]})]})])
-            self.app.style.configure("TRPDetails.TLabelFrame", background="#252526", bordercolor="#3C3C3C", relief="solid")
-            self.app.style.configure("TRPDetails.TLabelFrame.Label", background="#252526", foreground="#00FF00", font=("Consolas", 10, "bold"))
-            self.app.style.configure("TRPDetails.TLabel", background="#252526", foreground="#00FF00", font=("Consolas", 10))
-            self.app.update_idletasks() # Force update to ensure style is registered
-            self.details_frame.config(style="TRPDetails.TLabelFrame")
-            for child in self.details_frame.winfo_children():
-                if isinstance(child, ttk.Label):
-                    child.config(style="TRPDetails.TLabel")
-        else:
-            self.app.style.layout("TRPDetails.TLabelFrame", [('TLabelframe.border', {'sticky': 'nswe', 'border': '1', 'children': [('TLabelframe.padding', {'sticky': 'nswe', 'children': [('TLabelframe.label', {'sticky': 'nw'}), ('TLabelframe.contents', {'sticky': 'nswe'})]})]})])
-            self.app.style.configure("TRPDetails.TLabelFrame", background="SystemButtonFace", bordercolor="SystemButtonFace", relief="solid")
-            self.app.style.configure("TRPDetails.TLabelFrame.Label", background="SystemButtonFace", foreground="black", font=("Consolas", 10, "bold"))
-            self.app.style.configure("TRPDetails.TLabel", background="SystemButtonFace", foreground="black", font=("Consolas", 10))
-            self.app.update_idletasks() # Force update to ensure style is registered
-            self.details_frame.config(style="TRPDetails.TLabelFrame")
-            for child in self.details_frame.winfo_children():
-                if isinstance(child, ttk.Label):
-                    child.config(style="TRPDetails.TLabel")
-        self.refresh_trp_list() # Refresh to apply new colors
\ No newline at end of file
+        # The Treeview and TRPDetails styles are part of the theme palettes; only the row tags are per view
+        colors = self.app.theme_manager.colors
+        self.trp_tree.tag_configure('out_of_range', foreground=colors["trp_out_of_range_fg"])
+        self.trp_tree.tag_configure('valid_solution', foreground=colors["trp_valid_fg"])
@@ -0,0 +1,162 @@
+from tkinter import ttk
+
+# Row height (pixels) assumed until a row has been drawn and can be measured
+DEFAULT_ROW_HEIGHT = 20
+
+
+class VirtualTreeview(ttk.Frame):
+    """
+    A Treeview that only materializes the rows in view.
+
+    The rows live in the caller's data source: `get_row(position)` returns
+    (iid, values, tags) for any position in [0, row_count). Only the visible
+    window plus `overscan` rows below it exist as Treeview items. The
+    scrollbar and the mouse wheel move the window over the data source, and
+    moving it by a few rows deletes and inserts just the rows that left or
+    entered the window. Appending rows past the window inserts nothing.
+
+    Selection is tracked by iid, so rows that scroll out of the window and
+    back in stay selected.
+    """
+    def __init__(self, parent, columns, get_row, overscan=5, **tree_options):
+        super().__init__(parent)
+        self.get_row = get_row
+        self.overscan = overscan
+        self.row_count = 0
+        self.top = 0
+        self._start = 0 # first materialized position
+        self._iids = [] # iids of the materialized positions, in display order
+        self._selected = set()
+        self._row_height = None
+        self._header_height = None
+
+        self.tree = ttk.Treeview(self, columns=columns, yscrollcommand=self._on_tree_scrolled, **tree_options)
+        self.tree.pack(side="left", fill="both", expand=True)
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self._on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y")
+
+        self.tree.bind("<Configure>", lambda event: self._render())
+        self.tree.bind("<<TreeviewSelect>>", self._on_select)
+        self.tree.bind("<MouseWheel>", self._on_mousewheel)
+        self.tree.bind("<Button-4>", lambda event: self._scroll_and_break(-3))
+        self.tree.bind("<Button-5>", lambda event: self._scroll_and_break(3))
+        self.tree.bind("<Up>", self._on_key_up)
+        self.tree.bind("<Prior>", lambda event: self._scroll_and_break(-self.visible_rows()))
+        self.tree.bind("<Next>", lambda event: self._scroll_and_break(self.visible_rows()))
+
+    def refresh(self, row_count):
+        """Rebuilds the window after arbitrary changes to the data source."""
+        self.row_count = row_count
+        self._selected.clear()
+        self._clear_window()
+        self._render()
+
+    def rows_appended(self, count):
+        """Registers `count` new rows at the end of the data source."""
+        self.row_count += count
+        self._render()
+
+    def selection(self):
+        """Returns the iids of all selected rows, including rows outside the window."""
+        return tuple(self._selected)
+
+    def scroll(self, rows):
+        self.scroll_to(self.top + rows)
+
+    def scroll_to(self, position):
+        self.top = position
+        self._render()
+
+    def visible_rows(self):
+        if self._iids and self._row_height is None:
+            bbox = self.tree.bbox(self._iids[0])
+            if bbox:
+                self._header_height, self._row_height = bbox[1], bbox[3]
+        row_height = self._row_height or DEFAULT_ROW_HEIGHT
+        header_height = self._header_height if self._header_height is not None else row_height
+        return max(1, (self.tree.winfo_height() - header_height) // row_height)
+
+    def _render(self):
+        visible = self.visible_rows()
+        self.top = max(0, min(self.top, self.row_count - visible))
+        start, end = self.top, min(self.row_count, self.top + visible + self.overscan)
+        old_start, old_end = self._start, self._start + len(self._iids)
+
+        if end <= old_start or start >= old_end:
+            self._clear_window()
+            old_start = old_end = start
+        else:
+            # Drop rows that left the window at either edge
+            if start > old_start:
+                self.tree.delete(*self._iids[:start - old_start])
+                del self._iids[:start - old_start]
+            if end < old_end:
+                self.tree.delete(*self._iids[end - old_start:])
+                del self._iids[end - old_start:]
+
+        # Insert rows that entered the window at either edge
+        for position in range(min(old_start, end) - 1, start - 1, -1):
+            self._iids.insert(0, self._insert_row(position, 0))
+        for position in range(max(old_end, start), end):
+            self._iids.append(self._insert_row(position, "end"))
+        self._start = start
+
+        self.tree.yview_moveto(0)
+        if self.row_count:
+            self.scrollbar.set(start / self.row_count, min(1.0, (start + visible) / self.row_count))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def _insert_row(self, position, index):
+        iid, values, tags = self.get_row(position)
+        self.tree.insert("", index, iid=iid, values=values, tags=tags)
+        if iid in self._selected:
+            self.tree.selection_add(iid)
+        return iid
+
+    def _clear_window(self):
+        if self._iids:
+            self.tree.delete(*self._iids)
+        self._iids = []
+        self._start = self.top
+
+    def _on_select(self, event=None):
+        current = set(self.tree.selection())
+        if current and str(self.tree.cget("selectmode")) == "browse":
+            self._selected = current
+            return
+        # Selection changes only concern materialized rows, keep the rest as they were
+        window = set(self._iids)
+        self._selected = (self._selected - window) | (current & window)
+
+    def _on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self.scroll_to(int(float(amount) * self.row_count))
+        elif unit == "pages":
+            self.scroll(int(amount) * self.visible_rows())
+        else:
+            self.scroll(int(amount))
+
+    def _on_tree_scrolled(self, first, last):
+        # The Treeview scrolls itself when keyboard focus moves into the overscan rows.
+        # Fold that into the window position so the widget itself always stays at the top.
+        shift = round(float(first) * len(self._iids))
+        if shift:
+            self.tree.yview_moveto(0)
+            self.scroll(shift)
+
+    def _on_key_up(self, event):
+        # Moving up from the first materialized row has to pull the previous row into the window
+        if not self._iids or self.tree.focus() != self._iids[0] or self.top == 0:
+            return None
+        self.scroll(-1)
+        self.tree.focus(self._iids[0])
+        self.tree.selection_set(self._iids[0])
+        return "break"
+
+    def _on_mousewheel(self, event):
+        return self._scroll_and_break(-3 if event.delta > 0 else 3)
+
+    def _scroll_and_break(self, rows):
+        self.scroll(rows)
+        return "break"
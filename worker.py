@@ -1,4 +1,5 @@
 import queue
+import time
 import traceback
 import math # Import math for calculations
 from ballistics import MILS_PER_REVOLUTION # Import MILS_PER_REVOLUTION
@@ -22,6 +23,7 @@ def worker_thread(task_queue, result_queue, app):
         if task is None:  # Sentinel value to exit the thread
             break
 
+        started = time.perf_counter()
         try:
             result = process_task(task)
             result_queue.put(result)
@@ -39,6 +41,7 @@ def worker_thread(task_queue, result_queue, app):
                 traceback.print_exc()
                 result_queue.put(e)
         finally:
+            app.dev_log.event("timing", "calculation %s took %.1f ms", task['mission_type'], (time.perf_counter() - started) * 1000)
             # Always generate the event, even if an exception occurred
             app.event_generate("<<CalculationFinished>>")
             task_queue.task_done()